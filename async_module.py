@@ -0,0 +1,285 @@
+# async_module.py
+#
+# asyncio interface for web backends (badge kiosks, door controllers):
+#
+#   recognizer = AsyncRecognizer(FaceRecognitionModule(), log_sink=AsyncLogSink(FaceDatabaseLogger()))
+#   async with recognizer:
+#       faces = await recognizer.recognize(jpeg_bytes, timeout=2.0)  # [(box, name, distance)]
+#       await recognizer.enroll("Harsh", frame)
+#
+# Concurrent recognize() calls are coalesced: the batcher waits up to max_wait
+# for more requests and sends up to max_batch frames through one
+# recognize_faces_in_frames() call (one detector pass per frame, one embedding
+# forward pass for all faces). Model calls run on a bounded thread pool; while
+# every worker is busy requests wait in a bounded queue, and callers either
+# wait for room (backpressure) or, with wait=False, get Overloaded at once.
+# A request that times out or is cancelled before its batch starts is dropped
+# from the batch; one that is already running finishes and its result is discarded.
+#
+#   python async_module.py --stub --clients 200   # self-check with the stub model, no camera or DeepFace
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from cooldown_module import LogCooldown
+from metrics_module import metrics
+
+
+class Overloaded(RuntimeError):
+    """The request queue is full and the caller asked not to wait."""
+
+
+def decode_image(image):
+    """Accept a BGR numpy frame or encoded image bytes (JPEG/PNG upload). Returns a BGR frame or None."""
+    if isinstance(image, np.ndarray):
+        return image
+    return cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class AsyncLogSink:
+    """Logs recognized names with the shared cooldown, off the event loop."""
+
+    def __init__(self, logger, cooldown=None):
+        self.logger = logger
+        self.cooldown = cooldown or LogCooldown()
+
+    def _log(self, faces):
+        logged = 0
+        for box, name, distance in faces:
+            if name != "Unknown" and self.cooldown.allow(name):
+                self.logger.log_recognition(name)
+                logged += 1
+        return logged
+
+    async def __call__(self, faces):
+        """Log one recognize() result. Returns how many names were logged."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._log, faces)
+
+
+class AsyncRecognizer:
+    def __init__(self, face_recog, max_batch=16, max_wait=0.005, max_pending=64, workers=1,
+                 timeout=5.0, check_quality=False, log_sink=None):
+        """
+        face_recog: FaceRecognitionModule or RecognitionClient (anything with
+                    recognize_faces_in_frames and enroll_face)
+        max_batch: Most frames sent through the model together
+        max_wait: Seconds the batcher waits for more requests once one arrived
+        max_pending: Requests that may wait for a worker; more callers wait (or get Overloaded)
+        workers: Model calls running at the same time
+        timeout: Default per-request timeout in seconds (None waits forever)
+        check_quality: Skip embedding low-quality faces (reported as Unknown)
+        log_sink: Optional async callable given every recognize() result, e.g. AsyncLogSink
+        """
+        self.face_recog = face_recog
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.workers = workers
+        self.timeout = timeout
+        self.check_quality = check_quality
+        self.log_sink = log_sink
+
+        self.requests = 0
+        self.batches = 0
+        self.batched_frames = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+        self._executor = None
+        self._queue = None
+        self._slots = None
+        self._batcher = None
+        self._tasks = set()
+
+    # ---------------- Lifecycle ----------------
+    async def start(self):
+        if self._batcher is not None:
+            return self
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="async-recognition")
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        return self
+
+    async def close(self):
+        """Stop batching, fail waiting requests and wait for running batches to finish."""
+        if self._batcher is None:
+            return
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            frame, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("AsyncRecognizer closed"))
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._batcher = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # ---------------- API ----------------
+    async def recognize(self, image, timeout=None, wait=True):
+        """
+        Recognize every face in a BGR frame or encoded image.
+        Returns [(box, name, distance)]. Raises asyncio.TimeoutError after `timeout`
+        seconds (default: the recognizer's timeout) and Overloaded if wait=False
+        and the queue is full.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        self.requests += 1
+        metrics.inc("async_requests_total")
+        try:
+            return await asyncio.wait_for(self._submit(image, wait), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            metrics.inc("async_timeouts_total")
+            raise
+
+    async def _submit(self, image, wait):
+        await self.start()
+        loop = asyncio.get_running_loop()
+        frame = image if isinstance(image, np.ndarray) else await loop.run_in_executor(None, decode_image, image)
+        if frame is None or frame.size == 0:
+            raise ValueError("Could not decode image")
+
+        future = loop.create_future()
+        if wait:
+            await self._queue.put((frame, future))
+        else:
+            try:
+                self._queue.put_nowait((frame, future))
+            except asyncio.QueueFull:
+                self.rejected += 1
+                metrics.inc("async_rejected_total")
+                raise Overloaded(f"{self.max_pending} recognition requests already waiting")
+        return await future  # cancelling the caller cancels the future, so the batcher skips it
+
+    async def enroll(self, person_name, image, file_name=None, timeout=None):
+        """Enroll a face (runs on the model workers). Returns True if a face was found and enrolled."""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        frame = await loop.run_in_executor(None, decode_image, image)
+        if frame is None:
+            raise ValueError("Could not decode image")
+        call = loop.run_in_executor(self._executor, self.face_recog.enroll_face, person_name, frame, file_name)
+        return await asyncio.wait_for(call, self.timeout if timeout is None else timeout)
+
+    # ---------------- Batching ----------------
+    async def _batch_loop(self):
+        while True:
+            # Take a worker slot first: while all workers are busy, requests pile up in
+            # the queue and go out together as one batch when a slot frees up
+            await self._slots.acquire()
+            try:
+                batch = [await self._queue.get()]
+                if self.max_wait > 0 and self._queue.qsize() < self.max_batch - 1:
+                    await asyncio.sleep(self.max_wait)
+                while len(batch) < self.max_batch and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+            except BaseException:
+                self._slots.release()
+                raise
+
+            batch = [(frame, future) for frame, future in batch if not future.done()]  # timed out / cancelled
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _recognize_batch(self, frames):
+        return self.face_recog.recognize_faces_in_frames(frames, check_quality=self.check_quality)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            started = time.perf_counter()
+            results = await loop.run_in_executor(self._executor, self._recognize_batch,
+                                                 [frame for frame, future in batch])
+            metrics.observe("async_batch_seconds", time.perf_counter() - started)
+            self.batches += 1
+            self.batched_frames += len(batch)
+            metrics.set_gauge("async_batch_size", len(batch))
+            for (frame, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+                if self.log_sink is not None:
+                    self._spawn(self.log_sink(result))
+        except Exception as e:
+            for frame, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_frames / self.batches if self.batches else 0.0,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "waiting": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+# ------------------- Self-check -------------------
+async def _self_check(face_recog, clients, timeout):
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(8)]
+    async with AsyncRecognizer(face_recog, timeout=timeout) as recognizer:
+        print("Enrolled:", await recognizer.enroll("Async_Test", frames[0], "Async_Test.jpg"))
+        started = time.perf_counter()
+        results = await asyncio.gather(*(recognizer.recognize(frames[i % len(frames)]) for i in range(clients)),
+                                       return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        errors = [r for r in results if isinstance(r, Exception)]
+        print(f"{clients} concurrent requests in {elapsed * 1000:.0f} ms, {len(errors)} errors")
+        print("First result:", results[0])
+
+        ok, encoded = cv2.imencode(".jpg", frames[0])
+        print("From JPEG bytes:", await recognizer.recognize(encoded.tobytes()))
+        try:
+            await recognizer.recognize(frames[1], timeout=1e-6)
+        except asyncio.TimeoutError:
+            print("Timeout raised as expected")
+        print(recognizer.stats())
+    if hasattr(face_recog, "remove_person"):
+        face_recog.remove_person("Async_Test")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exercise the async recognition API")
+    parser.add_argument("--stub", action="store_true", help="Use the stub detector/embedder in a temporary database")
+    parser.add_argument("--clients", type=int, default=100, help="Concurrent recognize() calls")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.stub:
+        import tempfile
+        from face_recognition_module import FaceRecognitionModule
+        face_recog = FaceRecognitionModule(database_path=tempfile.mkdtemp(prefix="async_check_"),
+                                           detector="stub", embedder="stub", cache_dir=None)
+    else:
+        from recognition_service import connect_recognizer
+        face_recog = connect_recognizer()
+    asyncio.run(_self_check(face_recog, args.clients, args.timeout))
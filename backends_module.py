@@ -0,0 +1,346 @@
+# backends_module.py
+#
+# Pluggable face detectors and embedders for FaceRecognitionModule.
+#
+# Detectors:  detect(frame) -> [(box, face)], box = (x, y, w, h) in frame
+#             pixels, face = aligned BGR crop (uint8, or float 0-1)
+# Embedders:  embed(faces) -> (n, dim) float32 array, one row per face
+#
+# Both have a `name` that identifies the model; the embedder name is what the
+# gallery and the embedding cache are tagged with, so embeddings from
+# different models are never mixed.
+#
+#   deepface    DeepFace detectors / Keras models (the default, heaviest)
+#   yunet       OpenCV DNN YuNet detector (ONNX, ~1 MB) with eye alignment
+#   haar        OpenCV Haar cascade (bundled with OpenCV, no alignment)
+#   onnx        Any ONNX embedding model through ONNX Runtime, incl. INT8 files
+#   opencv-dnn  Any embedding model cv2.dnn can read (ONNX, Torch, Caffe)
+#   stub        Deterministic, model-free detector/embedder for tests
+#
+# Backends are chosen with a spec "detector[:arg]+embedder[:arg]", e.g.
+#   deepface:opencv+deepface:VGG-Face
+#   yunet:models/face_detection_yunet_2023mar.onnx+onnx:models/w600k_mbf_int8.onnx
+#   stub+stub
+#
+#   python backends_module.py quantize models/arcface.onnx models/arcface_int8.onnx
+
+import os
+import sys
+import threading
+import cv2
+import numpy as np
+
+DEFAULT_BACKEND = "deepface:opencv+deepface:VGG-Face"
+
+
+def _to_uint8(face):
+    face = np.asarray(face)
+    if face.dtype != np.uint8:
+        face = (np.clip(face, 0, 1) * 255).astype(np.uint8)
+    return face
+
+
+# ------------------- Detectors -------------------
+class DeepFaceDetector:
+    def __init__(self, detector_backend="opencv", align=True):
+        from deepface import DeepFace
+        self._deepface = DeepFace
+        self.detector_backend = detector_backend
+        self.align = align
+        self.name = f"deepface:{detector_backend}" + ("" if align else ":noalign")
+
+    def detect(self, frame):
+        faces = self._deepface.extract_faces(img_path=frame, detector_backend=self.detector_backend,
+                                             enforce_detection=False, align=self.align)
+        h, w = frame.shape[:2]
+        detections = []
+        for face in faces:
+            area = face["facial_area"]
+            box = (int(area["x"]), int(area["y"]), int(area["w"]), int(area["h"]))
+            # With enforce_detection=False DeepFace returns the whole frame when nothing is found
+            if face.get("confidence", 1) <= 0 or box == (0, 0, w, h):
+                continue
+            detections.append((box, face["face"][:, :, ::-1]))  # DeepFace returns RGB
+        return detections
+
+
+class YuNetDetector:
+    """OpenCV's YuNet face detector (cv2.FaceDetectorYN). Faces are rotated so the eyes are level."""
+
+    def __init__(self, model_path="models/face_detection_yunet_2023mar.onnx", score_threshold=0.7, margin=0.1):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet model not found: {model_path}")
+        self.model_path = model_path
+        self.margin = margin
+        self.name = f"yunet:{os.path.basename(model_path)}"
+        self._detector = cv2.FaceDetectorYN_create(model_path, "", (320, 320), score_threshold)
+        self._size = (320, 320)
+        self._lock = threading.Lock()
+
+    def detect(self, frame):
+        h, w = frame.shape[:2]
+        with self._lock:
+            if self._size != (w, h):
+                self._detector.setInputSize((w, h))
+                self._size = (w, h)
+            ok, faces = self._detector.detect(frame)
+        if faces is None:
+            return []
+        detections = []
+        for row in faces:
+            x, y, bw, bh = (int(v) for v in row[:4])
+            x, y = max(0, x), max(0, y)
+            bw, bh = min(bw, w - x), min(bh, h - y)
+            if bw <= 0 or bh <= 0:
+                continue
+            right_eye, left_eye = row[4:6], row[6:8]
+            detections.append(((x, y, bw, bh), self._align(frame, (x, y, bw, bh), left_eye, right_eye)))
+        return detections
+
+    def _align(self, frame, box, left_eye, right_eye):
+        """Rotate a padded crop around the eye centre so the eyes are horizontal, then cut the box out."""
+        x, y, w, h = box
+        pad = int(max(w, h) * (0.25 + self.margin))
+        x1, y1 = max(0, x - pad), max(0, y - pad)
+        region = frame[y1:min(frame.shape[0], y + h + pad), x1:min(frame.shape[1], x + w + pad)]
+        dx, dy = left_eye[0] - right_eye[0], left_eye[1] - right_eye[1]
+        angle = np.degrees(np.arctan2(dy, dx))
+        centre = ((left_eye[0] + right_eye[0]) / 2 - x1, (left_eye[1] + right_eye[1]) / 2 - y1)
+        rotation = cv2.getRotationMatrix2D(centre, angle, 1.0)
+        rotated = cv2.warpAffine(region, rotation, (region.shape[1], region.shape[0]), flags=cv2.INTER_LINEAR)
+        mx, my = int(w * self.margin), int(h * self.margin)
+        cx1, cy1 = max(0, x - x1 - mx), max(0, y - y1 - my)
+        return rotated[cy1:cy1 + h + 2 * my, cx1:cx1 + w + 2 * mx]
+
+
+class HaarDetector:
+    """OpenCV Haar cascade: very cheap, frontal faces only, no alignment."""
+
+    def __init__(self, cascade="haarcascade_frontalface_default.xml", scale_factor=1.1, min_neighbors=5,
+                 min_size=40):
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise ImportError("Haar cascades are not in this OpenCV build (moved out of the OpenCV 5 core)")
+        path = cascade if os.path.exists(cascade) else os.path.join(cv2.data.haarcascades, cascade)
+        self._cascade = cv2.CascadeClassifier(path)
+        if self._cascade.empty():
+            raise FileNotFoundError(f"Haar cascade not found: {cascade}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.name = f"haar:{os.path.basename(path)}"
+
+    def detect(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        boxes = self._cascade.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                               minSize=(self.min_size, self.min_size))
+        return [((int(x), int(y), int(w), int(h)), frame[y:y + h, x:x + w]) for x, y, w, h in boxes]
+
+
+class StubDetector:
+    """Deterministic detector for tests: one centred square face unless the frame is (nearly) blank."""
+
+    name = "stub"
+
+    def __init__(self, min_std=5.0):
+        self.min_std = min_std
+
+    def detect(self, frame):
+        if frame is None or frame.size == 0 or float(frame.std()) < self.min_std:
+            return []
+        h, w = frame.shape[:2]
+        size = int(min(h, w) * 0.6)
+        x, y = (w - size) // 2, (h - size) // 2
+        return [((x, y, size, size), frame[y:y + size, x:x + size])]
+
+
+# ------------------- Embedders -------------------
+class DeepFaceEmbedder:
+    """DeepFace Keras model, run directly in batches; falls back to DeepFace.represent per face."""
+
+    def __init__(self, model_name="VGG-Face"):
+        from deepface import DeepFace
+        self._deepface = DeepFace
+        self.model_name = model_name
+        self.name = model_name  # plain model name, as stored by earlier galleries
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        """Build the recognition model once and return (keras model, (height, width))."""
+        if self._model is None:
+            client = self._deepface.build_model(self.model_name)
+            keras_model = getattr(client, "model", client)
+            target_h, target_w = keras_model.input_shape[1:3]
+            self._model = (keras_model, (target_h, target_w))
+        return self._model
+
+    @staticmethod
+    def prepare_face(face, target_size):
+        """Letterbox a BGR face crop to the model input size, scaled to 0-1 (as DeepFace does)."""
+        face = np.asarray(face)
+        if face.dtype == np.uint8:
+            face = face.astype(np.float32) / 255.0
+        target_h, target_w = target_size
+        h, w = face.shape[:2]
+        scale = min(target_h / h, target_w / w)
+        new_h, new_w = max(1, int(h * scale)), max(1, int(w * scale))
+        resized = cv2.resize(face.astype(np.float32), (new_w, new_h))
+        out = np.zeros((target_h, target_w, 3), dtype=np.float32)
+        top, left = (target_h - new_h) // 2, (target_w - new_w) // 2
+        out[top:top + new_h, left:left + new_w] = resized
+        return out
+
+    def embed(self, faces):
+        try:
+            keras_model, target_size = self._get_model()
+            batch = np.stack([self.prepare_face(face, target_size) for face in faces])
+            with self._lock:
+                return np.asarray(keras_model(batch, training=False).numpy(), dtype=np.float32)
+        except Exception as e:
+            print("Batched embedding failed, embedding one by one:", e)
+        return np.stack([self._represent(face) for face in faces])
+
+    def _represent(self, face):
+        results = self._deepface.represent(img_path=_to_uint8(face), model_name=self.model_name,
+                                           detector_backend="skip", enforce_detection=False)
+        return np.asarray(results[0]["embedding"], dtype=np.float32)
+
+
+class OnnxEmbedder:
+    """
+    ONNX Runtime embedder (e.g. ArcFace / MobileFaceNet exports, or their INT8
+    versions from quantize_onnx). Input is resized to input_size, converted to RGB
+    and normalised as (pixel - mean) / std, in NCHW layout unless nhwc=True.
+    """
+
+    def __init__(self, model_path, input_size=(112, 112), mean=127.5, std=127.5, rgb=True, nhwc=False,
+                 threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The onnx backend needs onnxruntime: pip install onnxruntime")
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self._session.get_inputs()[0]
+        self._input_name = model_input.name
+        self._fixed_batch = isinstance(model_input.shape[0], int) and model_input.shape[0] == 1
+        self.input_size = input_size
+        self.mean, self.std, self.rgb, self.nhwc = mean, std, rgb, nhwc
+        self.name = f"onnx:{os.path.splitext(os.path.basename(model_path))[0]}"
+
+    def _prepare(self, faces):
+        batch = []
+        for face in faces:
+            face = cv2.resize(_to_uint8(face), self.input_size)
+            if self.rgb:
+                face = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
+            batch.append((face.astype(np.float32) - self.mean) / self.std)
+        batch = np.stack(batch)
+        return batch if self.nhwc else np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+
+    def embed(self, faces):
+        batch = self._prepare(faces)
+        if self._fixed_batch:
+            outputs = [self._session.run(None, {self._input_name: batch[i:i + 1]})[0] for i in range(len(batch))]
+            return np.concatenate(outputs).astype(np.float32).reshape(len(faces), -1)
+        return self._session.run(None, {self._input_name: batch})[0].astype(np.float32).reshape(len(faces), -1)
+
+
+class OpenCVDnnEmbedder:
+    """Embedding model loaded with cv2.dnn.readNet (e.g. OpenFace nn4.small2.v1.t7 or an ONNX export)."""
+
+    def __init__(self, model_path, input_size=(96, 96), scale=1 / 255.0, mean=(0, 0, 0), swap_rb=True):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Embedding model not found: {model_path}")
+        self._net = cv2.dnn.readNet(model_path)
+        self.input_size = input_size
+        self.scale, self.mean, self.swap_rb = scale, mean, swap_rb
+        self.name = f"opencv-dnn:{os.path.splitext(os.path.basename(model_path))[0]}"
+        self._lock = threading.Lock()  # cv2.dnn nets are not thread-safe
+
+    def embed(self, faces):
+        blob = cv2.dnn.blobFromImages([_to_uint8(f) for f in faces], self.scale, self.input_size,
+                                      self.mean, swapRB=self.swap_rb, crop=False)
+        with self._lock:
+            self._net.setInput(blob)
+            return np.asarray(self._net.forward(), dtype=np.float32).reshape(len(faces), -1)
+
+
+class StubEmbedder:
+    """Deterministic embedder for tests: a fixed random projection of a 16x16 grayscale thumbnail."""
+
+    def __init__(self, dim=128, seed=0):
+        self.dim = dim
+        self.name = f"stub:{dim}"
+        self._projection = np.random.default_rng(seed).standard_normal((256, dim)).astype(np.float32)
+
+    def embed(self, faces):
+        thumbs = []
+        for face in faces:
+            face = _to_uint8(face)
+            gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY) if face.ndim == 3 else face
+            thumb = cv2.resize(gray, (16, 16), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+            thumbs.append(thumb - thumb.mean())
+        return np.stack(thumbs) @ self._projection
+
+
+# ------------------- Registry -------------------
+DETECTORS = {
+    "deepface": DeepFaceDetector,
+    "yunet": YuNetDetector,
+    "haar": HaarDetector,
+    "stub": StubDetector,
+}
+
+EMBEDDERS = {
+    "deepface": DeepFaceEmbedder,
+    "onnx": OnnxEmbedder,
+    "opencv-dnn": OpenCVDnnEmbedder,
+    "stub": StubEmbedder,
+}
+
+
+def _create(registry, kind, spec, **kwargs):
+    name, _, arg = spec.partition(":")
+    if name not in registry:
+        raise ValueError(f"Unknown {kind} backend: {name} (choose from {', '.join(registry)})")
+    if not arg:
+        return registry[name](**kwargs)
+    if name == "stub":
+        arg = float(arg) if kind == "detector" else int(arg)  # stub:<min_std> / stub:<dim>
+    return registry[name](arg, **kwargs)
+
+
+def create_detector(spec, **kwargs):
+    """Create a detector from "name[:arg]", e.g. "deepface:retinaface" or "yunet:models/yunet.onnx"."""
+    return _create(DETECTORS, "detector", spec, **kwargs)
+
+
+def create_embedder(spec, **kwargs):
+    """Create an embedder from "name[:arg]", e.g. "deepface:Facenet" or "onnx:models/arcface_int8.onnx"."""
+    return _create(EMBEDDERS, "embedder", spec, **kwargs)
+
+
+def create_backends(spec=DEFAULT_BACKEND):
+    """Parse "detector+embedder" and return (detector, embedder)."""
+    detector_spec, _, embedder_spec = spec.partition("+")
+    if not embedder_spec:
+        raise ValueError(f"Backend spec must be 'detector+embedder', got: {spec}")
+    return create_detector(detector_spec), create_embedder(embedder_spec)
+
+
+def quantize_onnx(model_path, output_path):
+    """Write a dynamically INT8-quantised copy of an ONNX model (weights in int8)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+    print(f"Wrote {output_path} ({os.path.getsize(model_path) / 1e6:.1f} MB -> "
+          f"{os.path.getsize(output_path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "quantize":
+        quantize_onnx(sys.argv[2], sys.argv[3])
+    else:
+        print("Usage: python backends_module.py quantize <model.onnx> <model_int8.onnx>")
@@ -0,0 +1,273 @@
+# batch_recognition.py
+#
+# Headless, resumable recognition over recorded video files and image folders.
+#
+#   python batch_recognition.py footage/site1/ --workers 4 --frame-skip 10
+#   python batch_recognition.py door.mp4 --recorded-at "2025-11-29 08:00:00"
+#
+# Work is produced lazily by a generator (video chunks of --chunk-frames frames,
+# image batches of --image-batch files) and consumed by a multiprocessing pool
+# in which every worker loads the model once. Every finished task (its video
+# chunk or image keys and the log rows it produced) is appended to a checkpoint
+# journal before its rows are logged, so an interrupted run picks up where it
+# stopped without losing or repeating log rows; the journal is compacted at
+# start and end. Matches are written to the recognition log in bulk, at most
+# one row per person per --cooldown seconds of footage.
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+import cv2
+
+from database_module import FaceDatabaseLogger
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".m4v", ".mpg", ".mpeg", ".ts")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Set in each worker process by _init_worker
+_face_recog = None
+_batch_size = 8
+
+
+# ------------------- Work Generation -------------------
+def iter_files(paths):
+    """Yield video and image files from the given files/folders (folders are walked recursively)."""
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, dirs, files in os.walk(path):
+                dirs.sort()
+                for file in sorted(files):
+                    yield os.path.join(folder, file)
+        else:
+            yield path
+
+
+def image_key(path):
+    """Checkpoint key of one image file."""
+    return f"image:{path}"
+
+
+def iter_tasks(paths, chunk_frames, image_batch, recorded_at=None, done=()):
+    """
+    Lazily yield the tasks that are not finished in `done` (checkpoint keys):
+    ("video", keys, path, start_frame, end_frame, start_time, fps) or ("images", keys, [(path, time), ...]).
+    keys has one entry per video chunk or per image, so resuming with a different
+    --image-batch or after files were added neither repeats nor skips an image.
+    """
+    images = []
+    for path in iter_files(paths):
+        ext = os.path.splitext(path)[1].lower()
+        if ext in IMAGE_EXTENSIONS:
+            if image_key(path) in done:
+                continue
+            images.append((path, os.path.getmtime(path)))
+            if len(images) >= image_batch:
+                yield ("images", [image_key(p) for p, when in images], images)
+                images = []
+        elif ext in VIDEO_EXTENSIONS:
+            cap = cv2.VideoCapture(path)
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            cap.release()
+            if total <= 0:
+                print(f"Skipping {path}: cannot read frame count")
+                continue
+            if recorded_at is not None:
+                start_time = recorded_at.timestamp()
+            else:
+                # Assume the file was closed when the recording ended
+                start_time = os.path.getmtime(path) - total / fps
+            for start in range(0, total, chunk_frames):
+                end = min(total, start + chunk_frames)
+                key = f"{path}:{start}-{end}"
+                if key not in done:
+                    yield ("video", [key], path, start, end, start_time, fps)
+    if images:
+        yield ("images", [image_key(p) for p, when in images], images)
+
+
+# ------------------- Workers -------------------
+def _init_worker(database_path, batch_size, backend=None):
+    global _face_recog, _batch_size
+    from backends_module import create_backends
+    from face_recognition_module import FaceRecognitionModule
+    detector, embedder = create_backends(backend) if backend else (None, None)
+    _face_recog = FaceRecognitionModule(database_path=database_path, detector=detector, embedder=embedder)
+    _batch_size = batch_size
+
+
+def _recognize(frames, times, source, matches, use_cache):
+    if not frames:
+        return
+    for faces, when in zip(_face_recog.recognize_faces_in_frames(frames, use_cache=use_cache), times):
+        for box, name, distance in faces:
+            if name != "Unknown":
+                matches.append((source, name, when, distance))
+
+
+def _run_task(task):
+    """Process one task in a worker. Returns (keys, frames processed, [(source, name, time, distance)])."""
+    kind, keys = task[0], task[1]
+    matches, processed = [], 0
+    frames, times = [], []
+
+    if kind == "video":
+        path, start, end, start_time, fps, frame_skip = task[2:]
+        cap = cv2.VideoCapture(path)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for index in range(start, end):
+            if index % frame_skip != 0:
+                if not cap.grab():  # skip without decoding
+                    break
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+            times.append(start_time + index / fps)
+            processed += 1
+            if len(frames) >= _batch_size:
+                _recognize(frames, times, path, matches, use_cache=False)  # video frames never repeat
+                frames, times = [], []
+        cap.release()
+        _recognize(frames, times, path, matches, use_cache=False)
+    else:
+        for path, when in task[2]:
+            frame = cv2.imread(path)
+            if frame is None:
+                continue
+            frames.append(frame)
+            times.append(when)
+            processed += 1
+            if len(frames) >= _batch_size:
+                _recognize(frames, times, "images", matches, use_cache=True)
+                frames, times = [], []
+        _recognize(frames, times, "images", matches, use_cache=True)
+
+    return keys, processed, matches
+
+
+# ------------------- Checkpoints -------------------
+class CheckpointJournal:
+    """
+    Append-only progress file, one JSON line per finished task:
+        {"keys": [...], "buckets": [[source, name, bucket], ...], "entries": [[name, timestamp], ...]}
+    A line is written before the task's rows go to the log, so after a crash only the
+    last line's entries can be missing from the log; replay_entries() holds them for a
+    replay that skips rows already logged. compact() folds the journal into one line.
+    """
+
+    def __init__(self, path):
+        """path: journal file ('' or None keeps progress in memory only)"""
+        self.path = path
+        self.done = set()     # finished task keys
+        self.buckets = set()  # (source, name, cooldown bucket) already logged
+        self.replay_entries = []
+        self._file = None
+        if path and os.path.exists(path):
+            self._read()
+
+    def _read(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # torn last line: the crash came before that task's rows were logged
+                self.done.update(record.get("keys", record.get("done", [])))  # "done": older single-object files
+                self.buckets.update(tuple(bucket) for bucket in record.get("buckets", []))
+                self.replay_entries = [(name, datetime.fromtimestamp(when)) for name, when in record.get("entries", [])]
+
+    def record(self, keys, buckets, entries):
+        """Durably append a finished task (call before logging its entries)."""
+        self.done.update(keys)
+        self.buckets.update(buckets)
+        if not self.path:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps({"keys": list(keys), "buckets": [list(b) for b in buckets],
+                                     "entries": [[name, when.timestamp()] for name, when in entries]}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def compact(self):
+        """Atomically rewrite the journal as a single line."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"keys": sorted(self.done), "buckets": sorted(list(b) for b in self.buckets)}, f)
+            f.write("\n")
+        os.replace(tmp_path, self.path)
+        self.replay_entries = []
+
+
+# ------------------- Main -------------------
+def main():
+    parser = argparse.ArgumentParser(description="Offline face recognition over videos and image folders")
+    parser.add_argument("paths", nargs="+", help="Video files, image files or folders")
+    parser.add_argument("--database", default="faces_database", help="Face database folder")
+    parser.add_argument("--backend", help="Detector+embedder spec (see backends_module), default DeepFace VGG-Face")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--frame-skip", type=int, default=5, help="Process every Nth video frame")
+    parser.add_argument("--chunk-frames", type=int, default=1500, help="Video frames per task")
+    parser.add_argument("--image-batch", type=int, default=64, help="Images per task")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames per model forward pass")
+    parser.add_argument("--cooldown", type=float, default=5.0, help="Seconds of footage between log rows per person")
+    parser.add_argument("--recorded-at", help="Start time of the video(s), 'YYYY-MM-DD HH:MM:SS' (default: from file time)")
+    parser.add_argument("--checkpoint", default="batch_checkpoint.json", help="Progress journal for resuming ('' to disable)")
+    args = parser.parse_args()
+
+    recorded_at = datetime.strptime(args.recorded_at, "%Y-%m-%d %H:%M:%S") if args.recorded_at else None
+    logger = FaceDatabaseLogger()
+    journal = CheckpointJournal(args.checkpoint)
+    done = journal.done
+    if done:
+        print(f"Resuming: {len(done)} video chunks and images already finished")
+    if journal.replay_entries:
+        replayed = logger.log_batch(journal.replay_entries, skip_logged=True)
+        print(f"Replayed {replayed} log rows of the last task before the interruption")
+    journal.compact()
+
+    def pending_tasks():
+        # The pool reads tasks on its own thread: check against a snapshot of the checkpoint
+        for task in iter_tasks(args.paths, args.chunk_frames, args.image_batch, recorded_at, frozenset(done)):
+            yield task + (args.frame_skip,) if task[0] == "video" else task
+
+    logged_buckets = journal.buckets  # (source, name, cooldown bucket): order-independent de-duplication
+    total_frames, total_logged = 0, 0
+    started = time.time()
+
+    ctx = multiprocessing.get_context("spawn")  # TensorFlow is not fork-safe
+    with ctx.Pool(args.workers, initializer=_init_worker, initargs=(args.database, args.batch_size, args.backend)) as pool:
+        for keys, processed, matches in pool.imap_unordered(_run_task, pending_tasks()):
+            entries, buckets = [], set()
+            for source, name, when, distance in sorted(matches, key=lambda m: m[2]):
+                bucket = (source, name, int(when // args.cooldown))
+                if bucket not in logged_buckets and bucket not in buckets:
+                    buckets.add(bucket)
+                    entries.append((name, datetime.fromtimestamp(when)))
+            journal.record(keys, buckets, entries)  # first, so a crash before the log write is replayed
+            total_logged += logger.log_batch(entries)
+            total_frames += processed
+
+            elapsed = time.time() - started
+            label = keys[0] if len(keys) == 1 else f"{keys[0]} (+{len(keys) - 1} images)"
+            print(f"{label}: {processed} frames, {len(entries)} logged | "
+                  f"total {total_frames} frames, {total_frames / max(elapsed, 1e-6):.1f} fps")
+
+    journal.compact()
+    logger.close()
+    print(f"Finished: {total_frames} frames, {total_logged} log rows in {time.time() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# benchmark_backends.py
+#
+# Latency, throughput and identification accuracy of detector/embedder backends
+# (see backends_module) on a local labelled image set.
+#
+# Usage:
+#   python benchmark_backends.py labelled_faces/ \
+#       --backend deepface:opencv+deepface:VGG-Face \
+#       --backend yunet:models/face_detection_yunet_2023mar.onnx+onnx:models/w600k_mbf.onnx \
+#       --backend yunet:models/face_detection_yunet_2023mar.onnx+onnx:models/w600k_mbf_int8.onnx
+#
+# The image set is either one folder per person (labelled_faces/Harsh/1.jpg) or
+# flat files named like the face database (Harsh.jpg, Harsh_2.jpg). The first
+# image of every person is enrolled; all other images are queries. Accuracy is
+# rank-1 identification: the nearest enrolled face has the right name. Queries
+# in which no face is detected count as misses.
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from backends_module import create_backends
+from face_recognition_module import IMAGE_EXTENSIONS, FaceGallery
+
+
+def load_labelled_images(root):
+    """Return {label: [image paths]} sorted by path."""
+    people = defaultdict(list)
+    for folder, dirs, files in os.walk(root):
+        dirs.sort()
+        for file in sorted(files):
+            if not file.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if os.path.abspath(folder) != os.path.abspath(root):
+                label = os.path.basename(folder)
+            else:
+                label = re.sub(r"_\d+$", "", os.path.splitext(file)[0])
+            people[label].append(os.path.join(folder, file))
+    return dict(people)
+
+
+def largest_face(detections):
+    if len(detections) == 0:
+        return None
+    box, face = max(detections, key=lambda d: d[0][2] * d[0][3])
+    return face
+
+
+def run_backend(spec, people, images, batch_size, warmup=2):
+    detector, embedder = create_backends(spec)
+    paths = [path for label in sorted(people) for path in people[label]]
+
+    # Warm up (model build / first-call allocation is not part of the measurement)
+    for path in paths[:warmup]:
+        face = largest_face(detector.detect(images[path]))
+        if face is not None:
+            embedder.embed([face])
+
+    detect_times, faces = [], {}
+    start = time.perf_counter()
+    for path in paths:
+        t0 = time.perf_counter()
+        faces[path] = largest_face(detector.detect(images[path]))
+        detect_times.append(time.perf_counter() - t0)
+
+    found = [path for path in paths if faces[path] is not None]
+    embeddings, embed_time = {}, 0.0
+    for i in range(0, len(found), batch_size):
+        batch = found[i:i + batch_size]
+        t0 = time.perf_counter()
+        vectors = embedder.embed([faces[path] for path in batch])
+        embed_time += time.perf_counter() - t0
+        embeddings.update(zip(batch, vectors))
+    total_time = time.perf_counter() - start
+
+    gallery = FaceGallery(threshold=2.0)  # rank-1 identification: always report the nearest name
+    queries = []
+    for label, label_paths in people.items():
+        if label_paths[0] in embeddings:
+            gallery.add(label, embeddings[label_paths[0]], source=label_paths[0])
+        queries.extend((label, path) for path in label_paths[1:])
+
+    correct = 0
+    present = [(label, path) for label, path in queries if path in embeddings]
+    if present and gallery.count:
+        names, distances = gallery.match_batch([embeddings[path] for label, path in present])
+        correct = sum(name == label for name, (label, path) in zip(names, present))
+
+    detect_ms = 1000.0 * np.array(detect_times)
+    return {
+        "backend": spec,
+        "detector": detector.name,
+        "embedder": embedder.name,
+        "images": len(paths),
+        "detection_rate": len(found) / len(paths) if paths else 0.0,
+        "detect_ms_p50": float(np.percentile(detect_ms, 50)) if len(detect_ms) else 0.0,
+        "detect_ms_p95": float(np.percentile(detect_ms, 95)) if len(detect_ms) else 0.0,
+        "embed_ms_per_face": 1000.0 * embed_time / len(found) if found else 0.0,
+        "images_per_s": len(paths) / total_time if total_time > 0 else 0.0,
+        "queries": len(queries),
+        "rank1_accuracy": correct / len(queries) if queries else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detector/embedder backends")
+    parser.add_argument("images", help="Labelled image folder")
+    parser.add_argument("--backend", action="append", help="Detector+embedder spec (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Faces per embedding batch")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    people = load_labelled_images(args.images)
+    images = {}
+    for paths in people.values():
+        for path in paths:
+            image = cv2.imread(path)
+            if image is not None:
+                images[path] = image
+    people = {label: [p for p in paths if p in images] for label, paths in people.items()}
+    people = {label: paths for label, paths in people.items() if paths}
+    print(f"{len(people)} people, {len(images)} images")
+
+    results = []
+    print(f"{'backend':<60}{'detected':>9}{'det p50':>9}{'det p95':>9}{'emb/face':>10}{'img/s':>8}{'rank-1':>8}")
+    for spec in args.backend or ["deepface:opencv+deepface:VGG-Face"]:
+        try:
+            result = run_backend(spec, people, images, args.batch_size)
+        except Exception as e:
+            print(f"{spec}: error:", e)
+            continue
+        results.append(result)
+        print(f"{spec[:59]:<60}{result['detection_rate']:>9.2%}{result['detect_ms_p50']:>9.1f}"
+              f"{result['detect_ms_p95']:>9.1f}{result['embed_ms_per_face']:>10.1f}"
+              f"{result['images_per_s']:>8.1f}{result['rank1_accuracy']:>8.2%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmark_index.py
+#
+# Recall@1 vs. latency benchmark for the gallery indexes in index_module.
+#
+# Usage:
+#   python benchmark_index.py --size 100000 --dim 512
+#   python benchmark_index.py --gallery faces_database/gallery.fgal
+#   python benchmark_index.py --size 50000 --single     # per-frame latency
+#
+# Without --gallery a synthetic gallery is generated: `size` identities, each
+# with `per_identity` noisy samples around an identity centre (like the
+# MAX_CAPTURE photos per employee). Queries are fresh noisy samples of random
+# identities. Ground truth is the exact (flat) nearest neighbour.
+#
+# By default all queries go in one batch, which favours the flat index (one
+# matrix product). --single times them one at a time, as the recognition loop
+# matches a frame's few faces; that is where the ANN indexes pay off. "hnsw"
+# uses hnswlib when it is installed and the pure-Python graph otherwise.
+#
+# Pure-Python HNSW, default synthetic gallery, --single --queries 200, M=16, ef_search=50:
+#   size     flat ms/query   hnsw ms/query   hnsw build   hnsw recall@1
+#   5000         0.32            0.58           6 s          0.995
+#   20000        1.21            0.71          32 s          1.000
+#   50000        2.97            0.85          85 s          0.980
+
+import argparse
+import time
+import numpy as np
+
+from gallery_format_module import read_gallery
+from index_module import INDEX_TYPES, create_index
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_gallery(size, dim, per_identity, noise, num_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    identities = max(1, size // per_identity)
+    centres = normalize(rng.standard_normal((identities, dim)))
+    owners = np.repeat(np.arange(identities), per_identity)[:size]
+    vectors = normalize(centres[owners] + noise * rng.standard_normal((len(owners), dim)) / np.sqrt(dim))
+    query_owners = rng.integers(0, identities, num_queries)
+    queries = normalize(centres[query_owners] + noise * rng.standard_normal((num_queries, dim)) / np.sqrt(dim))
+    return vectors, queries
+
+
+def gallery_from_file(path, num_queries, noise, seed=0):
+    data = read_gallery(path)
+    vectors = normalize(data["embeddings"][data["active"]])
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(vectors), num_queries)
+    dim = vectors.shape[1]
+    queries = normalize(vectors[picks] + noise * rng.standard_normal((num_queries, dim)) / np.sqrt(dim))
+    return vectors, queries
+
+
+def build(index_type, params, vectors):
+    index = create_index(index_type, **params)
+    start = time.perf_counter()
+    index.add(vectors, np.arange(len(vectors)))
+    return index, time.perf_counter() - start
+
+
+def measure(index, vectors, queries, truth, single=False):
+    start = time.perf_counter()
+    if single:
+        ids = np.concatenate([index.search(vectors, query[None], k=1)[0] for query in queries])
+    else:
+        ids, sims = index.search(vectors, queries, k=1)
+    elapsed = time.perf_counter() - start
+    recall = float(np.mean(ids[:, 0] == truth))
+    return recall, 1000.0 * elapsed / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gallery indexes (recall@1 vs. latency)")
+    parser.add_argument("--gallery", help="Use the embeddings of an existing gallery.fgal instead of synthetic data")
+    parser.add_argument("--size", type=int, default=100000, help="Synthetic gallery size (embeddings)")
+    parser.add_argument("--dim", type=int, default=512, help="Synthetic embedding dimension")
+    parser.add_argument("--per-identity", type=int, default=3, help="Synthetic samples per identity")
+    parser.add_argument("--noise", type=float, default=0.6, help="Query/sample noise level")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--nlist", type=int, default=1024, help="IVF cells")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64], help="IVF nprobe values to try")
+    parser.add_argument("--M", type=int, default=16, help="HNSW links per node")
+    parser.add_argument("--ef-construction", type=int, default=100, help="HNSW build beam width")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 50, 128], help="HNSW ef_search values to try")
+    parser.add_argument("--skip", nargs="*", default=[], choices=["ivf", "hnsw"], help="Index types to skip")
+    parser.add_argument("--single", action="store_true", help="Search one query at a time (per-frame latency)")
+    args = parser.parse_args()
+
+    if args.gallery:
+        vectors, queries = gallery_from_file(args.gallery, args.queries, args.noise)
+    else:
+        vectors, queries = synthetic_gallery(args.size, args.dim, args.per_identity, args.noise, args.queries)
+    print(f"Gallery: {len(vectors)} x {vectors.shape[1]}, queries: {len(queries)}"
+          f"{' one at a time' if args.single else ' in one batch'}, HNSW: {INDEX_TYPES['hnsw'].__name__}")
+
+    truth = np.argmax(queries @ vectors.T, axis=1)
+
+    # (index type, build params, search parameter name, values to sweep)
+    configs = [("flat", {}, None, [None])]
+    if "ivf" not in args.skip:
+        configs.append(("ivf", {"nlist": args.nlist}, "nprobe", args.nprobe))
+    if "hnsw" not in args.skip:
+        configs.append(("hnsw", {"M": args.M, "ef_construction": args.ef_construction},
+                        "ef_search", args.ef_search))
+
+    print(f"{'index':<8}{'params':<40}{'build (s)':>12}{'recall@1':>10}{'ms/query':>10}")
+    for index_type, params, search_param, values in configs:
+        index, build_time = build(index_type, params, vectors)
+        for value in values:
+            shown = dict(params)
+            if search_param:
+                setattr(index, search_param, value)
+                shown[search_param] = value
+            recall, latency_ms = measure(index, vectors, queries, truth, args.single)
+            param_str = ", ".join(f"{k}={v}" for k, v in shown.items())
+            print(f"{index_type:<8}{param_str:<40}{build_time:>12.2f}{recall:>10.3f}{latency_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# benchmark_pipeline.py
+#
+# Replays recorded frames through every stage of the recognition pipeline
+# without a camera and reports per-stage latency percentiles, throughput and
+# peak memory, across gallery sizes and frame resolutions.
+#
+# Usage:
+#   python benchmark_pipeline.py --video recordings/door.mp4 --output run.json
+#   python benchmark_pipeline.py --images faces_database --backend stub+stub
+#   python benchmark_pipeline.py --video door.mp4 --compare baseline.json
+#
+# Stages (per frame):
+#   decode   JPEG bytes -> BGR frame (what a USB/IP camera stream costs)
+#   detect   detector backend; backends that align faces do it here
+#   align    margin re-crop of every face box from the full frame (the tracking path)
+#   embed    one batched embedder call for all faces of the frame
+#   match    gallery search (flat index) against `size` synthetic identities
+#   log      FaceDatabaseLogger.log_recognition for every matched face
+#   render   the GUIs' display path: display_module.VideoSurface prepare(), draw,
+#            show() (in-place BGR->RGBA into its buffer, PhotoImage.paste on a
+#            hidden Tk window; without a display the paste is left out)
+#
+# Without --video/--images, synthetic frames are used (only meaningful with
+# the stub backend, since real detectors find no faces in them).
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from backends_module import DEFAULT_BACKEND, create_backends
+from database_module import FaceDatabaseLogger
+from display_module import VideoSurface
+from face_recognition_module import IMAGE_EXTENSIONS, FaceGallery, FaceRecognitionModule
+
+STAGES = ("decode", "detect", "align", "embed", "match", "log", "render")
+RESOLUTIONS = {"640x480": (640, 480), "1280x720": (1280, 720)}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unavailable)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024.0 * 1024.0)
+    except ImportError:
+        return None
+
+
+def load_frames(video=None, images=None, limit=100):
+    """Read up to `limit` source frames from a video file or an image folder (or make synthetic ones)."""
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(video)
+        while len(frames) < limit:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    elif images:
+        for file in sorted(os.listdir(images)):
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(images, file))
+                if frame is not None:
+                    frames.append(frame)
+            if len(frames) >= limit:
+                break
+    else:
+        rng = np.random.default_rng(0)
+        for i in range(limit):
+            frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+            cv2.ellipse(frame, (320, 240), (90, 120), 0, 0, 360, (150, 160, 190), -1)
+            frames.append(np.clip(frame + rng.normal(0, 8, frame.shape), 0, 255).astype(np.uint8))
+    if not frames:
+        raise ValueError("No frames to replay")
+    return frames
+
+
+def encode_frames(frames, size):
+    """Resize source frames to the target resolution and JPEG-encode them (decode is then measured)."""
+    encoded = []
+    for frame in frames:
+        resized = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        ok, data = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        encoded.append(data)
+    return encoded
+
+
+def synthetic_gallery(size, dim, seed=0):
+    """A gallery of `size` random identities, one embedding each (filled directly; add() is per person)."""
+    rng = np.random.default_rng(seed)
+    gallery = FaceGallery()
+    gallery._buffer = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, 10000):
+        chunk = rng.standard_normal((min(10000, size - start), dim)).astype(np.float32)
+        gallery._buffer[start:start + len(chunk)] = gallery.normalize(chunk)
+    gallery.count = size
+    gallery.labels = np.array([f"person_{i}" for i in range(size)])
+    gallery.sources = np.array([f"person_{i}.jpg" for i in range(size)])
+    gallery.active = np.ones(size, dtype=bool)
+    gallery.rebuild_index()
+    return gallery
+
+
+def hidden_tk_root():
+    """A withdrawn Tk root for the render stage, or None without a display."""
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"No Tk display ({e}); the render stage leaves out PhotoImage.paste")
+        return None
+    root.withdraw()
+    return root
+
+
+def create_surface(root):
+    """VideoSurface the GUIs display with; without a Tk root it only fills its buffers."""
+    if root is None:
+        return VideoSurface(None)
+    import tkinter as tk
+    return VideoSurface(tk.Label(root))
+
+
+def render(surface, frame, faces):
+    """Same work as a GUI display tick: draw on the surface's scratch frame and show it."""
+    canvas = surface.prepare(frame)
+    for (x, y, w, h), name in faces:
+        cv2.rectangle(canvas, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.putText(canvas, name, (x, max(0, y - 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+    surface.show(canvas)
+
+
+def run_config(encoded, detector, embedder, gallery, logger, surface, warmup=3):
+    timings = {stage: [] for stage in STAGES}
+    faces_seen = 0
+    for i, data in enumerate(encoded):
+        marks = [time.perf_counter()]
+        frame = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        marks.append(time.perf_counter())
+        detections = detector.detect(frame)
+        marks.append(time.perf_counter())
+        faces = [np.ascontiguousarray(FaceRecognitionModule.crop_face(frame, box)) for box, face in detections]
+        marks.append(time.perf_counter())
+        embeddings = embedder.embed(faces) if faces else []
+        marks.append(time.perf_counter())
+        names = gallery.match_batch(embeddings)[0] if len(embeddings) else []
+        marks.append(time.perf_counter())
+        for name in names:
+            logger.log_recognition(name)
+        marks.append(time.perf_counter())
+        render(surface, frame, [(box, name) for (box, face), name in zip(detections, names)])
+        marks.append(time.perf_counter())
+
+        if i >= warmup:
+            faces_seen += len(faces)
+            for stage, start, end in zip(STAGES, marks, marks[1:]):
+                timings[stage].append(1000.0 * (end - start))
+    return timings, faces_seen
+
+
+def summarize(timings, faces_seen):
+    total = np.sum([timings[stage] for stage in STAGES], axis=0)
+    result = {"frames": len(total), "faces": faces_seen, "stages": {}}
+    for stage, values in list(timings.items()) + [("total", total)]:
+        values = np.asarray(values)
+        result["stages"][stage] = {
+            "mean_ms": float(values.mean()),
+            "p50_ms": float(np.percentile(values, 50)),
+            "p95_ms": float(np.percentile(values, 95)),
+            "p99_ms": float(np.percentile(values, 99)),
+        }
+    result["fps"] = 1000.0 / float(total.mean()) if total.mean() > 0 else 0.0
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def print_result(label, result):
+    print(f"\n== {label}: {result['frames']} frames, {result['faces']} faces, "
+          f"{result['fps']:.1f} fps, peak RSS {result['peak_rss_mb'] or 0:.0f} MB")
+    print(f"{'stage':<8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for stage, s in result["stages"].items():
+        print(f"{stage:<8}{s['mean_ms']:>9.2f}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}")
+
+
+def compare(results, baseline_path):
+    """Print the change in total p95 and fps against an earlier run."""
+    with open(baseline_path) as f:
+        baseline = {r["config"]: r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get(result["config"])
+        if old is None:
+            continue
+        new_p95, old_p95 = result["stages"]["total"]["p95_ms"], old["stages"]["total"]["p95_ms"]
+        change = 100.0 * (new_p95 - old_p95) / old_p95 if old_p95 else 0.0
+        print(f"{result['config']:<24} total p95 {old_p95:8.2f} -> {new_p95:8.2f} ms ({change:+.1f}%), "
+              f"fps {old['fps']:.1f} -> {result['fps']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the recognition pipeline")
+    parser.add_argument("--video", help="Recorded video to replay")
+    parser.add_argument("--images", help="Folder of images to replay")
+    parser.add_argument("--frames", type=int, default=100, help="Frames to replay per configuration")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, help="Detector+embedder spec (see backends_module)")
+    parser.add_argument("--gallery-sizes", type=int, nargs="+", default=[1, 1000, 100000],
+                        help="Synthetic gallery sizes (identities)")
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.images, args.frames)
+    detector, embedder = create_backends(args.backend)
+    dim = int(np.asarray(embedder.embed([np.zeros((112, 112, 3), dtype=np.uint8)])).shape[1])
+    print(f"Backend {detector.name} + {embedder.name} ({dim}-d), {len(frames)} source frames")
+
+    log_dir = tempfile.mkdtemp(prefix="benchmark_log_")
+    logger = FaceDatabaseLogger(db_file=os.path.join(log_dir, "benchmark.db"),
+                                csv_file=os.path.join(log_dir, "none.csv"))
+
+    root = hidden_tk_root()
+    results = []
+    for size in sorted(args.gallery_sizes):
+        gallery = synthetic_gallery(size, dim)
+        for resolution in args.resolutions:
+            encoded = encode_frames(frames, RESOLUTIONS[resolution])
+            surface = create_surface(root)  # sized by the first frame, like the GUIs
+            timings, faces_seen = run_config(encoded, detector, embedder, gallery, logger, surface)
+            result = summarize(timings, faces_seen)
+            result["render_display"] = "tk" if root is not None else "buffers only"
+            result.update({"config": f"{size}@{resolution}", "gallery_size": size, "resolution": resolution})
+            results.append(result)
+            print_result(result["config"], result)
+        del gallery
+    logger.close()
+    if root is not None:
+        root.destroy()
+
+    report = {
+        "backend": args.backend,
+        "detector": detector.name,
+        "embedder": embedder.name,
+        "source": args.video or args.images or "synthetic",
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpus": os.cpu_count(), "numpy": np.__version__, "opencv": cv2.__version__},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
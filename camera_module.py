@@ -1,17 +1,29 @@
 # camera_module_ui.py
 
 import cv2
-from face_recognition_module import FaceRecognitionModule
+from recognition_service import connect_recognizer
 from database_module import FaceDatabaseLogger
-import time
+from cooldown_module import LogCooldown
+from tracker_module import TrackingRecognizer
+from motion_module import MotionGate, guide_rect
+from quality_module import QualityScorer
+from scaling_module import AdaptiveScaler
+from metrics_module import metrics
 
 # Initialize face recognition and logger
-face_recog = FaceRecognitionModule()
+face_recog = connect_recognizer()  # shared service; the model is not loaded in this process
 logger = FaceDatabaseLogger()
-
-# To avoid repeated logging for the same face within a few seconds
-recently_logged = {}
-LOG_COOLDOWN = 5  # seconds
+metrics.serve_from_env()  # FACE_METRICS=1 / FACE_METRICS_PORT, see metrics_module
+# Track faces across frames so the recognition model only runs on new or changed faces
+# (and only on crops that are good enough to recognize). Detection runs on a downscaled
+# copy of the guide rectangle; faces are recognized from the full 1280x720 frame.
+scaler = AdaptiveScaler(roi=lambda w, h: [guide_rect(w, h)])
+tracking = TrackingRecognizer(face_recog, quality=QualityScorer(), scaler=scaler)
+# Skip detection while nothing moves inside the guide rectangle
+gate = MotionGate(roi=lambda w, h: [guide_rect(w, h)])
+
+# To avoid repeated logging for the same face within a few seconds (shared with the GUIs)
+cooldown = LogCooldown()
 
 # Open webcam
 cap = cv2.VideoCapture(0)  # 0 is default camera
@@ -23,19 +35,27 @@ if not cap.isOpened():
     exit()
 
 print("Camera started. Press 'q' to quit.")
+name = "Unknown"
 
 while True:
-    ret, frame = cap.read()
+    with metrics.timer("capture"):
+        ret, frame = cap.read()
     if not ret:
         print("Failed to grab frame.")
         break
-
-    # Save frame temporarily to recognize
-    temp_file = "temp_frame.jpg"
-    cv2.imwrite(temp_file, frame)
-
-    # Recognize face
-    name = face_recog.recognize_face(temp_file)
+    metrics.inc("frames_captured_total")
+
+    # Recognize the largest tracked face directly from the in-memory frame
+    # (while the scene is static the previous name is shown but not logged again)
+    recognized = gate.changed(frame)
+    if not recognized:
+        metrics.inc("frames_gated_total")
+    else:
+        with metrics.timer("recognize"):
+            faces = tracking.process(frame)
+        name = "Unknown"
+        if len(faces) > 0:
+            track_id, box, name = max(faces, key=lambda f: f[1][2] * f[1][3])
 
     # ------------------ UI Improvements ------------------
     # Draw a rectangle in the center as guide
@@ -58,16 +78,14 @@ while True:
     cv2.rectangle(frame, (text_x-5, text_y-25), (text_x + text_size[0]+5, text_y+5), (0,0,0), -1)
     cv2.putText(frame, subtitle, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
-    # Log face if not logged recently
-    current_time = time.time()
-    if name != "Unknown":
-        last_logged = recently_logged.get(name, 0)
-        if current_time - last_logged > LOG_COOLDOWN:
-            logger.log_recognition(name)
-            recently_logged[name] = current_time
+    # Log face if it was recognized in this frame and not logged recently (by this or any other recognizer)
+    if recognized and name != "Unknown" and cooldown.allow(name):
+        logger.log_recognition(name)
 
     # Show frame
-    cv2.imshow("Face Recognition", frame)
+    metrics.draw_overlay(frame)  # debug overlay, only when metrics are enabled
+    with metrics.timer("render"):
+        cv2.imshow("Face Recognition", frame)
 
     # Quit on 'q' key
     if cv2.waitKey(1) & 0xFF == ord('q'):
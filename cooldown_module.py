@@ -0,0 +1,126 @@
+# cooldown_module.py
+#
+# Duplicate-logging cooldown shared by every recognizer on the machine.
+#
+# A person recognized on consecutive frames should be logged once per cooldown,
+# not once per frame, and not once per process: the GUIs, camera_module and the
+# multi-camera runner may all be watching the same door. LogCooldown keeps the
+# last log time per name in a small SQLite table (WAL), so it also survives
+# restarts, and decides with one atomic upsert whether a name is due:
+#
+#   cooldown = LogCooldown()
+#   if name != "Unknown" and cooldown.allow(name):
+#       logger.log_recognition(name)
+#
+# A per-process copy of the last known log times answers repeat sightings
+# within the cooldown without touching the database. Expired entries are
+# evicted once per cooldown period (time buckets), and both the table and the
+# local copy are capped at max_entries.
+
+import sqlite3
+import threading
+import time
+
+COOLDOWN_DB_FILE = "recognition_cooldown.db"
+LOG_COOLDOWN = 5  # seconds
+
+
+class LogCooldown:
+    def __init__(self, db_file=COOLDOWN_DB_FILE, cooldown=LOG_COOLDOWN, max_entries=10000):
+        """
+        db_file: SQLite file shared by every process (None keeps the cooldown in this process only)
+        cooldown: Seconds during which a name is not logged again
+        max_entries: Upper bound on remembered names (oldest are dropped first)
+        """
+        self.db_file = db_file
+        self.cooldown = cooldown
+        self.max_entries = max_entries
+        self._seen = {}  # name -> last log time known to this process (from any process)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_eviction = 0.0
+
+        if self.db_file:
+            conn = self._connect()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cooldown (
+                    name TEXT PRIMARY KEY,
+                    logged_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cooldown_logged_at ON cooldown (logged_at)")
+
+    def _connect(self):
+        """One connection per thread, in autocommit mode (every statement is its own transaction)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------- Check-and-set ----------------
+    def allow(self, name, now=None):
+        """
+        Return True if `name` should be logged now, and record that it was.
+        Returns False while any process has logged the name within the cooldown.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._seen.get(name)
+            if last is not None and now - last <= self.cooldown:
+                return False
+            if not self.db_file:
+                self._remember(name, now)
+                return True
+
+        allowed, last = True, now
+        try:
+            conn = self._connect()
+            # Insert, or take over an expired entry; a live entry is left alone (rowcount 0)
+            cursor = conn.execute(
+                "INSERT INTO cooldown (name, logged_at) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET logged_at = excluded.logged_at "
+                "WHERE excluded.logged_at - cooldown.logged_at > ?", (name, now, self.cooldown))
+            if cursor.rowcount == 0:
+                row = conn.execute("SELECT logged_at FROM cooldown WHERE name = ?", (name,)).fetchone()
+                allowed, last = False, row[0] if row else now
+        except sqlite3.Error as e:
+            print("Cooldown store error:", e)  # fall back to this process's view, never stop logging
+
+        with self._lock:
+            self._remember(name, last)
+        return allowed
+
+    def _remember(self, name, logged_at):
+        self._seen[name] = max(logged_at, self._seen.get(name, 0.0))
+        if logged_at >= self._next_eviction or len(self._seen) > self.max_entries:
+            self._evict(logged_at)
+
+    # ---------------- Eviction ----------------
+    def _evict(self, now):
+        """Drop entries whose cooldown has passed (called at most once per cooldown period)."""
+        self._next_eviction = now + self.cooldown
+        expired = now - self.cooldown
+        self._seen = {name: t for name, t in self._seen.items() if t > expired}
+        if len(self._seen) > self.max_entries:
+            newest = sorted(self._seen.items(), key=lambda item: item[1])[-self.max_entries:]
+            self._seen = dict(newest)
+
+        if not self.db_file:
+            return
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM cooldown WHERE logged_at <= ?", (expired,))
+            conn.execute("DELETE FROM cooldown WHERE name IN "
+                         "(SELECT name FROM cooldown ORDER BY logged_at DESC LIMIT -1 OFFSET ?)",
+                         (self.max_entries,))
+        except sqlite3.Error as e:
+            print("Cooldown eviction error:", e)
+
+    def clear(self):
+        with self._lock:
+            self._seen.clear()
+        if self.db_file:
+            self._connect().execute("DELETE FROM cooldown")
@@ -2,29 +2,409 @@
 
 import os
 import csv
+import queue
+import sqlite3
+import threading
+import time
+import atexit
 from datetime import datetime
 
+from metrics_module import metrics
+
 
 class FaceDatabaseLogger:
-    def __init__(self, log_file="recognized_faces.csv"):
-        self.log_file = log_file
-        # Create CSV file with headers if it doesn't exist
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, mode='w', newline='') as f:
+    def __init__(self, db_file="recognized_faces.db", csv_file="recognized_faces.csv",
+                 flush_interval=1.0, flush_size=200, max_queue=10000):
+        """
+        db_file: SQLite database holding the recognition log (WAL mode)
+        csv_file: CSV export path, kept for compatibility with the old log format.
+                  On first run its existing rows are imported into the database.
+        flush_interval: Seconds between background flushes
+        flush_size: Flush early once this many rows are waiting
+        """
+        self.db_file = db_file
+        self.csv_file = csv_file
+        self.log_file = csv_file
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.dropped = 0
+
+        new_database = not os.path.exists(self.db_file)
+        conn = self._connect()
+        self._create_schema(conn)
+        if new_database and os.path.exists(self.csv_file):
+            self._import_csv(conn, self.csv_file)
+        conn.close()
+
+        # Rows wait here and are written in batches by the flusher thread
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="log-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # ---------------- Schema ----------------
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _create_schema(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS recognitions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                date TEXT NOT NULL,
+                time TEXT NOT NULL,
+                timestamp REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_recognitions_name ON recognitions (name, timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_recognitions_timestamp ON recognitions (timestamp)")
+        # Covering index for per-day first-in/last-out attendance
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_recognitions_day ON recognitions (date, name, time)")
+        conn.commit()
+
+    @staticmethod
+    def _row(name, when):
+        return (name, when.strftime("%Y-%m-%d"), when.strftime("%H:%M:%S"), when.timestamp())
+
+    def _import_csv(self, conn, path):
+        rows = []
+        with open(path, newline='') as f:
+            for record in csv.reader(f):
+                if len(record) < 3 or record[0] in ("", "Name"):
+                    continue  # skip the header and blank ",," rows
+                try:
+                    when = datetime.strptime(f"{record[1]} {record[2]}", "%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    continue
+                rows.append(self._row(record[0], when))
+        conn.executemany("INSERT INTO recognitions (name, date, time, timestamp) VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+        print(f"Imported {len(rows)} rows from {path}")
+
+    # ---------------- Logging ----------------
+    def log_recognition(self, name):
+        """
+        Log a recognized face with timestamp. Only queues the row; it is written
+        to the database by the background flusher, so this never blocks on disk
+        or the console (count rows with the log_queued_total metric).
+        Rows logged after close() are dropped.
+        """
+        if not name:
+            return
+        if self._stop.is_set():
+            self.dropped += 1
+            metrics.inc("log_dropped_total")
+            return
+        try:
+            self._queue.put_nowait(self._row(name, datetime.now()))
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc("log_dropped_total")
+            return
+        metrics.inc("log_queued_total")
+
+    def log_batch(self, entries, skip_logged=False):
+        """
+        Write many (name, datetime) entries in one transaction, bypassing the queue.
+        Used by offline batch processing where the time comes from the footage.
+        skip_logged: leave out entries already in the log (same name and time), so a
+                     batch that may have been written before a crash can be replayed.
+        Returns the number of rows written.
+        """
+        rows = [self._row(name, when) for name, when in entries if name]
+        if not rows:
+            return 0
+        conn = self._connect()
+        try:
+            with conn:
+                if not skip_logged:
+                    conn.executemany("INSERT INTO recognitions (name, date, time, timestamp) VALUES (?, ?, ?, ?)", rows)
+                    return len(rows)
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT INTO recognitions (name, date, time, timestamp) SELECT ?, ?, ?, ? WHERE NOT EXISTS "
+                    "(SELECT 1 FROM recognitions WHERE name = ? AND timestamp = ?)",
+                    [row + (row[0], row[3]) for row in rows])
+                return conn.total_changes - before
+        finally:
+            conn.close()
+
+    def _flush_loop(self):
+        conn = self._connect()
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    with conn, metrics.timer("log_flush"):
+                        conn.executemany(
+                            "INSERT INTO recognitions (name, date, time, timestamp) VALUES (?, ?, ?, ?)", batch)
+                    metrics.inc("log_rows_written_total", len(batch))
+                except sqlite3.Error as e:
+                    metrics.inc("log_errors_total")
+                    print("Error writing recognition log:", e)
+                metrics.set_gauge("log_queue_depth", self._queue.qsize())
+                for _ in batch:
+                    self._queue.task_done()
+            elif self._stop.is_set():
+                break
+        conn.close()
+
+    def flush(self):
+        """Block until every queued row has been written."""
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and self._flusher.is_alive():
+                self._queue.all_tasks_done.wait(0.1)
+        if not self._flusher.is_alive():
+            self._write_pending()
+
+    def _write_pending(self):
+        """Write rows queued after the flusher stopped (a log call racing close())."""
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not rows:
+            return
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany("INSERT INTO recognitions (name, date, time, timestamp) VALUES (?, ?, ?, ?)", rows)
+            finally:
+                conn.close()
+            metrics.inc("log_rows_written_total", len(rows))
+        except sqlite3.Error as e:
+            metrics.inc("log_errors_total")
+            print("Error writing recognition log:", e)
+        finally:
+            for _ in rows:
+                self._queue.task_done()
+
+    def close(self):
+        """Flush pending rows and stop the background flusher."""
+        if self._stop.is_set():
+            return
+        self.flush()
+        self._stop.set()
+        self._flusher.join()
+        self._write_pending()
+
+    # ---------------- Export ----------------
+    def export_csv(self, path=None):
+        """Write the whole log to a CSV file in the original Name,Date,Time format."""
+        path = path or self.csv_file
+        self.flush()
+        conn = self._connect()
+        try:
+            cursor = conn.execute("SELECT name, date, time FROM recognitions ORDER BY timestamp, id")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, mode='w', newline='') as f:
                 writer = csv.writer(f)
                 writer.writerow(["Name", "Date", "Time"])
+                while True:
+                    rows = cursor.fetchmany(10000)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+            os.replace(tmp_path, path)
+        finally:
+            conn.close()
+        return path
 
-    def log_recognition(self, name):
+
+# ------------------- Log Queries -------------------
+def _to_timestamp(value, end_of_day=False):
+    """Accept None, a unix timestamp, a datetime or a 'YYYY-MM-DD[ HH:MM:SS]' string."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    value = value.strip()
+    if len(value) == 10:
+        value += " 23:59:59" if end_of_day else " 00:00:00"
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp()
+
+
+class RecognitionLog:
+    """
+    Read-only, index-backed queries over the recognition log.
+    Pages use keyset pagination on (timestamp, id), so any page of a
+    10M-row log costs the same as the first one.
+    """
+
+    def __init__(self, db_file="recognized_faces.db"):
+        self.db_file = db_file
+        conn = self._connect()
+        FaceDatabaseLogger._create_schema(conn)  # also adds indexes missing from older databases
+        conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=10)
+
+    @staticmethod
+    def _filters(name, start, end):
+        clauses, params = [], []
+        if name:
+            clauses.append("name = ?")
+            params.append(name)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_to_timestamp(start))
+        if end is not None:
+            clauses.append("timestamp <= ?")
+            params.append(_to_timestamp(end, end_of_day=True))
+        return clauses, params
+
+    def page(self, name=None, start=None, end=None, before=None, after=None, limit=50):
         """
-        Log a recognized face with timestamp.
+        Return up to `limit` rows (id, name, date, time, timestamp), newest first.
+        before=(timestamp, id): the page of older rows following that row.
+        after=(timestamp, id): the page of newer rows preceding that row.
+        With neither cursor this is the newest page.
         """
-        now = datetime.now()
-        date_str = now.strftime("%Y-%m-%d")
-        time_str = now.strftime("%H:%M:%S")
-        with open(self.log_file, mode='a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([name, date_str, time_str])
-        print(f"Logged {name} at {date_str} {time_str}")
+        clauses, params = self._filters(name, start, end)
+        ascending = after is not None
+        if before is not None:
+            clauses.append("(timestamp, id) < (?, ?)")
+            params += [before[0], before[1]]
+        if after is not None:
+            clauses.append("(timestamp, id) > (?, ?)")
+            params += [after[0], after[1]]
+        return self._select(clauses, params, ascending, limit)
+
+    def oldest_page(self, name=None, start=None, end=None, limit=50):
+        """Return the page of oldest rows, newest first."""
+        clauses, params = self._filters(name, start, end)
+        return self._select(clauses, params, True, limit)
+
+    def _select(self, clauses, params, ascending, limit):
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = "ASC" if ascending else "DESC"
+        sql = (f"SELECT id, name, date, time, timestamp FROM recognitions {where} "
+               f"ORDER BY timestamp {order}, id {order} LIMIT ?")
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params + [limit]).fetchall()
+        finally:
+            conn.close()
+        return rows[::-1] if ascending else rows
+
+    def count(self, name=None, start=None, end=None):
+        clauses, params = self._filters(name, start, end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM recognitions {where}", params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def names(self):
+        """Distinct logged names, found by skipping through the name index (one seek per name)."""
+        conn = self._connect()
+        try:
+            return [row[0] for row in conn.execute("""
+                WITH RECURSIVE names(name) AS (
+                    SELECT MIN(name) FROM recognitions
+                    UNION ALL
+                    SELECT (SELECT MIN(name) FROM recognitions WHERE name > names.name) FROM names
+                    WHERE names.name IS NOT NULL
+                )
+                SELECT name FROM names WHERE name IS NOT NULL
+            """)]
+        finally:
+            conn.close()
+
+    def attendance(self, name=None, start_date=None, end_date=None, before=None, after=None, limit=50):
+        """
+        Per-person, per-day attendance: up to `limit` rows of (date, name, first_in, last_out,
+        sightings), newest day first and names in order within a day. Dates are 'YYYY-MM-DD'.
+        Keyset-paginated like page(): before=(date, name) returns the rows following that
+        row, after=(date, name) the rows preceding it. Pages are read from
+        idx_recognitions_day one day at a time, so any page costs the same as the first.
+        """
+        forward = after is None
+        cursor = before if forward else after
+        conn = self._connect()
+        try:
+            if name:
+                rows = self._person_attendance(conn, name, start_date, end_date, cursor, forward, limit)
+            else:
+                rows = self._daily_attendance(conn, start_date, end_date, cursor, forward, limit)
+        finally:
+            conn.close()
+        return rows if forward else rows[::-1]
+
+    @staticmethod
+    def _next_day(conn, day, forward, start_date, end_date):
+        """The closest logged day older (forward) or newer than `day` (None: the newest), within the range."""
+        clauses, params = [], []
+        if day is not None:
+            clauses.append("date < ?" if forward else "date > ?")
+            params.append(day)
+        if start_date:
+            clauses.append("date >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("date <= ?")
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        aggregate = "MAX" if forward else "MIN"
+        return conn.execute(f"SELECT {aggregate}(date) FROM recognitions {where}", params).fetchone()[0]
+
+    def _daily_attendance(self, conn, start_date, end_date, cursor, forward, limit):
+        if cursor is None:
+            day, last_name = self._next_day(conn, None, True, start_date, end_date), None
+        else:
+            day, last_name = cursor
+        order = "ASC" if forward else "DESC"
+        rows = []
+        while day is not None and len(rows) < limit:
+            clauses, params = ["date = ?"], [day]
+            if last_name is not None:
+                clauses.append("name > ?" if forward else "name < ?")
+                params.append(last_name)
+            rows += conn.execute(
+                f"SELECT date, name, MIN(time), MAX(time), COUNT(*) FROM recognitions "
+                f"WHERE {' AND '.join(clauses)} GROUP BY name ORDER BY name {order} LIMIT ?",
+                params + [limit - len(rows)]).fetchall()
+            day, last_name = self._next_day(conn, day, forward, start_date, end_date), None
+        return rows
+
+    @staticmethod
+    def _person_attendance(conn, name, start_date, end_date, cursor, forward, limit):
+        # One row per day for a single person, so the key is just the date
+        clauses, params = ["name = ?"], [name]
+        if start_date:
+            clauses.append("date >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("date <= ?")
+            params.append(end_date)
+        if cursor is not None:
+            clauses.append("date < ?" if forward else "date > ?")
+            params.append(cursor[0])
+        order = "DESC" if forward else "ASC"
+        return conn.execute(
+            f"SELECT date, name, MIN(time), MAX(time), COUNT(*) FROM recognitions "
+            f"WHERE {' AND '.join(clauses)} GROUP BY date ORDER BY date {order} LIMIT ?",
+            params + [limit]).fetchall()
 
 
 # ------------------- Test Code -------------------
@@ -34,3 +414,4 @@ if __name__ == "__main__":
     # Example: log a recognized face
     logger.log_recognition("Harsh")
     logger.log_recognition("Shiv")
+    logger.export_csv()
@@ -0,0 +1,142 @@
+# display_module.py
+#
+# Shared camera display for the Tk GUIs.
+#
+# The old per-GUI code allocated several full-frame copies every tick
+# (frame.copy(), cvtColor, Image.fromarray, a new ImageTk.PhotoImage) and
+# reconfigured the Label each time. VideoSurface instead keeps:
+#   - a preallocated BGR scratch frame the GUI draws its overlays on
+#   - a preallocated RGBA buffer that cvtColor writes into (dst=)
+#   - a PIL image that wraps the RGBA buffer without copying (frombuffer)
+#   - one persistent PhotoImage that is updated with paste()
+# so a displayed frame costs one in-place colour conversion and the blit into Tk.
+#
+# run() drives the display from Tk's event loop at its own adaptive rate: it
+# never exceeds max_fps (the monitor), only redraws when there is a new frame,
+# and backs off when drawing would take more than `budget` of the main thread.
+
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+from metrics_module import metrics
+from pipeline_module import RateCounter
+
+
+class VideoSurface:
+    def __init__(self, widget, size=None, max_fps=60.0, budget=0.5, idle_poll=0.005):
+        """
+        widget: Tk Label (or any widget with an `image` option) the frames are shown in;
+                None fills the buffers without displaying (benchmarks without a display)
+        size: (width, height) to display at; defaults to the size of the first frame
+        max_fps: Upper bound on redraws per second (the monitor refresh rate)
+        budget: Largest fraction of main-thread time the display may use
+        idle_poll: Seconds between checks for a new frame when nothing changed
+        """
+        self.widget = widget
+        self.size = tuple(size) if size else None
+        self.max_fps = max_fps
+        self.budget = budget
+        self.idle_poll = idle_poll
+        self.shown = RateCounter()
+        self.render_time = 0.0  # moving average, seconds per displayed frame
+
+        self._bgr = None
+        self._rgba = None
+        self._image = None
+        self._photo = None
+        self._after_id = None
+        self._running = False
+        if self.size:
+            self._allocate(self.size)
+
+    # ---------------- Buffers ----------------
+    def _allocate(self, size):
+        width, height = size
+        self.size = (width, height)
+        self._bgr = np.empty((height, width, 3), dtype=np.uint8)
+        self._rgba = np.empty((height, width, 4), dtype=np.uint8)
+        # Shares memory with self._rgba: converting into the buffer updates the image
+        self._image = Image.frombuffer("RGBA", (width, height), self._rgba, "raw", "RGBA", 0, 1)
+        if self.widget is not None:
+            self._photo = ImageTk.PhotoImage("RGBA", (width, height))
+            self.widget.configure(image=self._photo)
+            self.widget.image = self._photo  # keep a reference, Tk does not
+
+    def prepare(self, frame):
+        """
+        Copy (and scale, if needed) a BGR frame into the preallocated scratch frame
+        and return it. Draw boxes/names on the result, then pass it to show().
+        The caller's frame is never modified, so workers can keep reading it.
+        """
+        if self.size is None:
+            self._allocate((frame.shape[1], frame.shape[0]))
+        if frame.shape[1::-1] == self.size:
+            np.copyto(self._bgr, frame)
+        else:
+            cv2.resize(frame, self.size, dst=self._bgr, interpolation=cv2.INTER_AREA)
+        return self._bgr
+
+    # ---------------- Display ----------------
+    def show(self, frame):
+        """Display a BGR frame (ideally the one returned by prepare())."""
+        if self.size is None:
+            self._allocate((frame.shape[1], frame.shape[0]))
+        if frame is not self._bgr and frame.shape[1::-1] != self.size:
+            frame = self.prepare(frame)  # only scaling needs the scratch frame
+        with metrics.timer("render"):
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA, dst=self._rgba)
+            if self._photo is not None:
+                self._photo.paste(self._image)
+        self.shown.tick()
+        metrics.inc("frames_rendered_total")
+
+    def run(self, next_frame, after_show=None):
+        """
+        Keep the widget updated from Tk's event loop.
+        next_frame() returns a BGR frame to display, or None when there is nothing new.
+        after_show() is called after every displayed frame (e.g. to update stats).
+        """
+        self._running = True
+        self._next_frame = next_frame
+        self._after_show = after_show
+        self._tick()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass  # widget already destroyed
+            self._after_id = None
+
+    def _tick(self):
+        if not self._running:
+            return
+        started = time.perf_counter()
+        try:
+            frame = self._next_frame()
+            if frame is not None:
+                self.show(frame)
+                if self._after_show is not None:
+                    self._after_show()
+        except Exception as e:
+            print("Display error:", e)
+            frame = None
+
+        if frame is None:
+            delay = self.idle_poll
+        else:
+            cost = time.perf_counter() - started
+            self.render_time = cost if self.render_time == 0.0 else 0.9 * self.render_time + 0.1 * cost
+            # Next frame no sooner than the monitor allows, and late enough to stay within budget
+            interval = max(1.0 / self.max_fps if self.max_fps else 0.0, self.render_time / self.budget)
+            delay = interval - cost
+        self._after_id = self.widget.after(max(1, int(delay * 1000)), self._tick)
+
+    def fps(self):
+        return self.shown.rate()
@@ -0,0 +1,233 @@
+# embedding_cache_module.py
+#
+# Content-addressed embedding cache shared by every process on the machine.
+#
+# An embedding is stored under a hash of the decoded pixels plus the settings
+# that produced it (model, detector, alignment), so re-importing or re-enrolling
+# the same image never runs the model again, whatever its file name.
+#
+# Layout of cache_dir:
+#   index.db          SQLite (WAL) table: key -> (dim, slot, last_used)
+#   vectors_<dim>.f32 float32 matrix, one row per slot, opened with np.memmap
+#
+# Vectors are read straight from the memory map, so processes share the page
+# cache instead of each loading a copy. When the cache is over max_bytes the
+# least recently used entries are evicted and their slots reused.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+EMBEDDING_CACHE_DIR = "embedding_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+MIN_GROW_ROWS = 1024
+
+
+def content_key(image, *settings):
+    """Hash of an image's decoded pixels (shape, dtype, bytes) and the settings used to embed it."""
+    image = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{image.shape}|{image.dtype}|".encode())
+    digest.update(image.data)
+    digest.update("|".join(str(s) for s in settings).encode())
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir=EMBEDDING_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        cache_dir: Folder holding the index and vector files (shared between processes)
+        max_bytes: Size cap for cached vectors; least recently used entries are evicted above it
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.db_file = os.path.join(cache_dir, "index.db")
+        self.hits = 0
+        self.misses = 0
+        self._maps = {}  # dim -> np.memmap
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                slot INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (last_used)")
+        conn.execute("CREATE TABLE IF NOT EXISTS free_slots (dim INTEGER, slot INTEGER, PRIMARY KEY (dim, slot))")
+        # Per-dimension slot allocation and live entry count (avoids scanning entries for the size)
+        conn.execute("CREATE TABLE IF NOT EXISTS files (dim INTEGER PRIMARY KEY, next_slot INTEGER, live INTEGER)")
+        conn.execute("COMMIT")
+
+    def _connect(self):
+        """One connection per thread, in autocommit mode with explicit transactions."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------- Vector Files ----------------
+    def _vector_path(self, dim):
+        return os.path.join(self.cache_dir, f"vectors_{dim}.f32")
+
+    def _map(self, dim, rows_needed, grow=False):
+        """Memory map of the vector file for `dim`, remapped if another process grew it."""
+        vectors = self._maps.get(dim)
+        if vectors is not None and vectors.shape[0] >= rows_needed:
+            return vectors
+
+        path = self._vector_path(dim)
+        row_bytes = dim * 4
+        rows = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+        if rows < rows_needed:
+            if not grow:
+                return None
+            cap_rows = self.max_bytes // row_bytes + 1
+            rows = max(rows_needed, min(max(2 * rows, MIN_GROW_ROWS), cap_rows))
+            with open(path, "ab") as f:
+                f.truncate(rows * row_bytes)
+
+        vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(rows, dim))
+        self._maps[dim] = vectors
+        return vectors
+
+    # ---------------- Lookup ----------------
+    def get_many(self, keys):
+        """Return {key: float32 embedding} for the keys that are cached."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        try:
+            conn = self._connect()
+            located = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                located.update((key, (dim, slot)) for key, dim, slot in conn.execute(
+                    f"SELECT key, dim, slot FROM entries WHERE key IN ({placeholders})", chunk))
+
+            found = {}
+            with self._lock:
+                for key, (dim, slot) in located.items():
+                    vectors = self._map(dim, slot + 1)
+                    if vectors is not None:
+                        found[key] = np.array(vectors[slot])
+
+            if found:
+                # Mark as recently used; an entry evicted (and its slot reused) while we
+                # were reading no longer matches and is dropped from the result.
+                now = time.time()
+                conn.execute("BEGIN IMMEDIATE")
+                for key in list(found):
+                    dim, slot = located[key]
+                    cursor = conn.execute("UPDATE entries SET last_used = ? WHERE key = ? AND slot = ?",
+                                          (now, key, slot))
+                    if cursor.rowcount == 0:
+                        del found[key]
+                conn.execute("COMMIT")
+        except Exception as e:
+            print("Embedding cache read error:", e)
+            self._rollback()
+            return {}
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    # ---------------- Insertion ----------------
+    def put_many(self, items):
+        """Store {key: embedding}. Keys already in the cache are left untouched."""
+        if not items:
+            return
+        try:
+            conn = self._connect()
+            now = time.time()
+            with self._lock:
+                conn.execute("BEGIN IMMEDIATE")  # serialises writers across processes
+                written = set()
+                for key, embedding in items.items():
+                    if embedding is None:
+                        continue
+                    vector = np.asarray(embedding, dtype=np.float32).ravel()
+                    dim = vector.size
+                    if conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone():
+                        continue
+                    self._evict(conn, dim * 4)
+                    slot = self._allocate(conn, dim)
+                    vectors = self._map(dim, slot + 1, grow=True)
+                    vectors[slot] = vector
+                    written.add(dim)
+                    conn.execute("INSERT INTO entries (key, dim, slot, last_used) VALUES (?, ?, ?, ?)",
+                                 (key, dim, slot, now))
+                # Vector data must reach the file before the entries become visible
+                for dim in written:
+                    self._maps[dim].flush()
+                conn.execute("COMMIT")
+        except Exception as e:
+            print("Embedding cache write error:", e)
+            self._rollback()
+
+    def _allocate(self, conn, dim):
+        row = conn.execute("SELECT slot FROM free_slots WHERE dim = ? LIMIT 1", (dim,)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM free_slots WHERE dim = ? AND slot = ?", (dim, row[0]))
+            slot = row[0]
+        else:
+            row = conn.execute("SELECT next_slot FROM files WHERE dim = ?", (dim,)).fetchone()
+            slot = row[0] if row else 0
+            conn.execute("INSERT OR IGNORE INTO files (dim, next_slot, live) VALUES (?, 0, 0)", (dim,))
+            conn.execute("UPDATE files SET next_slot = ? WHERE dim = ?", (slot + 1, dim))
+        conn.execute("UPDATE files SET live = live + 1 WHERE dim = ?", (dim,))
+        return slot
+
+    def _live_bytes(self, conn):
+        return conn.execute("SELECT COALESCE(SUM(dim * live * 4), 0) FROM files").fetchone()[0]
+
+    def _evict(self, conn, incoming_bytes):
+        """Drop least recently used entries until incoming_bytes more fit under max_bytes."""
+        live_bytes = self._live_bytes(conn)
+        while live_bytes + incoming_bytes > self.max_bytes:
+            victims = conn.execute("SELECT key, dim, slot FROM entries ORDER BY last_used LIMIT 64").fetchall()
+            if not victims:
+                return
+            for key, dim, slot in victims:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.execute("INSERT OR IGNORE INTO free_slots (dim, slot) VALUES (?, ?)", (dim, slot))
+                conn.execute("UPDATE files SET live = live - 1 WHERE dim = ?", (dim,))
+                live_bytes -= dim * 4
+                if live_bytes + incoming_bytes <= self.max_bytes:
+                    return
+
+    def _rollback(self):
+        try:
+            self._connect().execute("ROLLBACK")
+        except sqlite3.Error:
+            pass
+
+    # ---------------- Maintenance ----------------
+    def stats(self):
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"entries": entries, "bytes": self._live_bytes(conn),
+                "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        """Remove every entry (the vector files keep their size and are reused)."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM free_slots")
+        conn.execute("UPDATE files SET next_slot = 0, live = 0")
+        conn.execute("COMMIT")
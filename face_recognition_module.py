@@ -1,43 +1,830 @@
 # face_recognition_module.py
 
 import os
-from deepface import DeepFace
+import re
+import secrets
+import threading
+import time
+import cv2
+import numpy as np
+from backends_module import create_detector, create_embedder
+from index_module import SEARCH_PARAMS, create_index, save_index, load_index
+from embedding_cache_module import EMBEDDING_CACHE_DIR, EmbeddingCache, content_key
+from gallery_format_module import read_gallery, write_gallery
+from metrics_module import metrics
+from quality_module import QualityScorer
+from template_module import IdentityTemplates, person_names
 
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+GALLERY_FILE = "gallery.fgal"
+LEGACY_GALLERY_FILE = "gallery.npz"
+DEFAULT_MODEL = "VGG-Face"
+
+# Default match thresholds (distance must be <= threshold to count as a match)
+DEFAULT_THRESHOLDS = {
+    "cosine": 0.68,
+    "euclidean_l2": 1.17,
+}
+
+# save() compacts the gallery once this fraction of its rows are removed faces
+COMPACT_RATIO = 0.25
+
+
+# ------------------- Embedding Gallery -------------------
+class FaceGallery:
+    """
+    In-memory gallery of enrolled face embeddings.
+
+    All embeddings live in one contiguous float32 matrix with L2-normalised rows,
+    with a parallel label array (person name) and source array (image file name).
+    Rows are never moved: removing a face only clears its `active` flag, so a row
+    number is a stable id for the nearest-neighbour index (see index_module).
+    A loaded gallery keeps its matrix memory-mapped until the first add().
+
+    match_level "identity" (default) matches against one template per person
+    (see template_module; max_templates > 1 keeps that many medoids per person);
+    "sample" matches every row separately.
+    """
+
+    def __init__(self, distance_metric="cosine", threshold=None, index_type="flat", index_params=None,
+                 match_level="identity", max_templates=1, compact_ratio=COMPACT_RATIO):
+        if distance_metric not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unsupported distance metric: {distance_metric}")
+        if match_level not in ("identity", "sample"):
+            raise ValueError(f"Unsupported match level: {match_level}")
+        self.distance_metric = distance_metric
+        self.threshold = DEFAULT_THRESHOLDS[distance_metric] if threshold is None else threshold
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.index = create_index(index_type, **self.index_params)
+        self._buffer = np.zeros((0, 0), dtype=np.float32)
+        self.count = 0
+        self.labels = np.array([], dtype=str)
+        self.sources = np.array([], dtype=str)
+        self.active = np.zeros(0, dtype=bool)
+        self.metadata = {}
+        self.match_level = match_level
+        self.max_templates = max_templates
+        self.compact_ratio = compact_ratio
+        self._templates = None  # built on first identity-level match
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    @property
+    def embeddings(self):
+        return self._buffer[:self.count]
+
+    @staticmethod
+    def normalize(embeddings):
+        """Return a float32 copy of the embeddings with L2-normalised rows."""
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(embeddings / norms)
+
+    def _reserve(self, rows, dim):
+        if self.count == 0 and self._buffer.shape[1] != dim:
+            self._buffer = np.zeros((0, dim), dtype=np.float32)
+        if dim != self._buffer.shape[1]:
+            raise ValueError("Embedding dimension does not match the gallery")
+        if self.count + rows > len(self._buffer):
+            capacity = max(self.count + rows, 2 * len(self._buffer), 16)
+            buffer = np.zeros((capacity, dim), dtype=np.float32)
+            buffer[:self.count] = self._buffer[:self.count]
+            self._buffer = buffer
+
+    def add(self, label, embeddings, source=""):
+        """Append one or more embeddings for a person."""
+        embeddings = self.normalize(embeddings)
+        self.add_many([label] * len(embeddings), embeddings, [source] * len(embeddings))
+
+    def add_many(self, labels, embeddings, sources):
+        """Append many rows at once (one label and source per row): one copy of the arrays, one index update."""
+        embeddings = self.normalize(embeddings)
+        rows = embeddings.shape[0]
+        if rows == 0:
+            return
+        self._reserve(rows, embeddings.shape[1])
+        ids = np.arange(self.count, self.count + rows)
+        self._buffer[ids] = embeddings
+        self.count += rows
+        labels = np.asarray(labels).astype(str)
+        self.labels = np.concatenate([self.labels, labels])
+        self.sources = np.concatenate([self.sources, np.asarray(sources).astype(str)])
+        self.active = np.concatenate([self.active, np.ones(rows, dtype=bool)])
+        self.index.add(self.embeddings, ids)
+        if self._templates is not None:
+            for label in np.unique(labels):
+                if not self._templates.add(str(label), embeddings[labels == label]):
+                    self._templates = None
+                    break
+
+    def remove_sources(self, sources):
+        """Deactivate every row that came from one of the given source files."""
+        ids = np.flatnonzero(self.active & np.isin(self.sources, list(sources)))
+        self.active[ids] = False
+        self.index.remove(ids)
+        if len(ids):
+            self._templates = None
+
+    def compact(self):
+        """Drop deactivated rows and rebuild the index (row ids change)."""
+        keep = self.active
+        self._buffer = np.ascontiguousarray(self.embeddings[keep])
+        self.count = len(self._buffer)
+        self.labels = self.labels[keep]
+        self.sources = self.sources[keep]
+        self.active = np.ones(self.count, dtype=bool)
+        self.rebuild_index()
+
+    def rebuild_index(self):
+        self.index = create_index(self.index_type, **self.index_params)
+        self.index.add(self.embeddings, np.flatnonzero(self.active))
+        self._templates = None
+
+    @property
+    def templates(self):
+        """Per-person templates of the active rows (rebuilt lazily after removals or a reload)."""
+        if self._templates is None:
+            self._templates = IdentityTemplates(self.max_templates, self.index_type, self.index_params)
+            self._templates.build(self.embeddings[self.active], self.labels[self.active])
+        return self._templates
+
+    def relabel(self, label_fn):
+        """Apply label_fn to every label. Returns True if any label changed."""
+        labels = np.array([label_fn(label) for label in self.labels.tolist()], dtype=str)
+        if np.array_equal(labels, self.labels):
+            return False
+        self.labels = labels
+        self._templates = None
+        return True
+
+    def _distances(self, similarities):
+        if self.distance_metric == "cosine":
+            return np.maximum(0.0, 1.0 - similarities)  # rounding can push identical vectors below 0
+        return np.sqrt(np.maximum(0.0, 2.0 - 2.0 * similarities))
+
+    def match(self, embedding):
+        """
+        Return (name, distance) of the closest gallery entry.
+        name is "Unknown" if the gallery is empty or the distance exceeds the threshold.
+        """
+        names, distances = self.match_batch(embedding)
+        return names[0], distances[0]
+
+    def match_batch(self, embeddings):
+        """Match several query embeddings at once. Returns (names, distances)."""
+        queries = self.normalize(embeddings)
+        if self.count == 0:
+            return ["Unknown"] * len(queries), [float("inf")] * len(queries)
+
+        if self.match_level == "identity":
+            ids, similarities = self.templates.search(queries)
+            labels = self.templates.names
+        else:
+            ids, similarities = self.index.search(self.embeddings, queries, k=1)
+            ids, similarities, labels = ids[:, 0], similarities[:, 0], self.labels
+        distances = self._distances(similarities)
+
+        names = []
+        for idx, distance in zip(ids, distances):
+            names.append(str(labels[idx]) if idx >= 0 and distance <= self.threshold else "Unknown")
+        return names, [float(d) for d in distances]
+
+    def find_conflicts(self, embeddings, labels, max_distance=None, same_label_distance=None, k=5):
+        """
+        Find enrolled faces that clash with the query embeddings: a different person
+        within max_distance (the same face enrolled under two names), or with
+        same_label_distance the same person within that distance (a near-copy of a
+        photo that is already enrolled). Looks at the k nearest enrolled rows, then
+        at the earlier queries of the same batch.
+        Returns one (label, source, distance) or None per query; source is None for a query.
+        """
+        max_distance = self.threshold if max_distance is None else max_distance
+        same_label_distance = -1.0 if same_label_distance is None else same_label_distance
+        limit = max(max_distance, same_label_distance)
+
+        def clashes(label, other, distance):
+            return distance <= (same_label_distance if other == label else max_distance)
+
+        conflicts = [None] * len(labels)
+        if len(labels) == 0:
+            return conflicts
+        queries = self.normalize(embeddings)
+        if self.count > 0:
+            ids, similarities = self.index.search(self.embeddings, queries, k=k)
+            distances = self._distances(similarities)
+            for i, label in enumerate(labels):
+                for idx, distance in zip(ids[i], distances[i]):
+                    if idx < 0 or distance > limit:
+                        break
+                    if clashes(label, str(self.labels[idx]), distance):
+                        conflicts[i] = (str(self.labels[idx]), str(self.sources[idx]), float(distance))
+                        break
+
+        distances = self._distances(queries @ queries.T)
+        for i in range(len(labels)):
+            for j in range(i):
+                if conflicts[i] is None and conflicts[j] is None and clashes(labels[i], labels[j], distances[i, j]):
+                    conflicts[i] = (labels[j], None, float(distances[i, j]))
+        return conflicts
+
+    def _index_path(self, path):
+        return os.path.splitext(path)[0] + f".{self.index_type}.npz"
+
+    def save(self, path, metadata=None):
+        """
+        Write the gallery to a .fgal file (see gallery_format_module) and its index
+        to an .npz file, atomically replacing previous ones. Both carry the same
+        random generation tag, so load() never pairs a gallery with another
+        save's index. Compacts first once compact_ratio of the rows are removed.
+        """
+        if metadata is not None:
+            self.metadata = dict(metadata)
+        if self.count and 1 - len(self) / self.count > self.compact_ratio:
+            self.compact()
+        generation = secrets.token_hex(8)
+        header = dict(self.metadata, distance_metric=self.distance_metric, index_type=self.index_type,
+                      label_format="person", generation=generation)
+        save_index(self.index, self._index_path(path), generation)
+        write_gallery(path, self.embeddings, self.labels, self.sources, self.active, header)
+
+    def load(self, path):
+        """
+        Load a gallery written with save() (or a legacy .npz gallery).
+        The embedding matrix is memory-mapped; the index is rebuilt if missing.
+        """
+        if path.endswith(".npz"):
+            with np.load(path, allow_pickle=False) as data:
+                self._buffer = np.ascontiguousarray(data["embeddings"], dtype=np.float32)
+                self.labels = data["labels"]
+                self.sources = data["sources"]
+                self.active = data["active"].astype(bool)
+            self.metadata = {}
+        else:
+            # Windows cannot replace a file another process has mapped, so copy there
+            data = read_gallery(path, mmap=os.name != "nt")
+            self._buffer = data["embeddings"]
+            self.labels = data["labels"]
+            self.sources = data["sources"]
+            self.active = data["active"]
+            self.metadata = data["metadata"]
+        self.count = len(self._buffer)
+        self._templates = None
+
+        index_path = self._index_path(path)
+        try:
+            index, generation = load_index(index_path)
+            if not generation or generation != self.metadata.get("generation"):
+                raise ValueError("index belongs to another save of the gallery")
+            if len(index.present) < self.count or not np.array_equal(index.present[:self.count], self.active):
+                raise ValueError("index is out of date")
+            if index.index_type != self.index_type or any(
+                    index.params().get(key) != value for key, value in self.index_params.items()
+                    if key not in SEARCH_PARAMS):
+                raise ValueError("index was built with different settings")
+            for key, value in self.index_params.items():
+                if key in SEARCH_PARAMS:
+                    setattr(index, key, value)
+            self.index = index
+        except Exception:
+            self.rebuild_index()
+
+
+def gallery_file_name(model_name):
+    """Gallery file for a model; the default model keeps the plain name used by older versions."""
+    if model_name == DEFAULT_MODEL:
+        return GALLERY_FILE
+    tag = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+    return f"gallery.{tag}.fgal"
+
+
+# ------------------- Recognition Module -------------------
 class FaceRecognitionModule:
-    def __init__(self, database_path="faces_database"):
+    def __init__(self, database_path="faces_database", model_name=DEFAULT_MODEL,
+                 detector_backend="opencv", distance_metric="cosine", threshold=None,
+                 index_type="flat", index_params=None, cache_dir=EMBEDDING_CACHE_DIR,
+                 detector=None, embedder=None, match_level="identity", max_templates=1):
         """
         database_path: Folder containing known face images
                        Each image file name should be the person's name.
-                       e.g., faces_database/Harsh.jpg
+                       e.g., faces_database/Harsh.jpg (Harsh_1.jpg, Harsh_2.jpg are more images of Harsh)
+        model_name / detector_backend: DeepFace model and detector, used unless
+                       embedder / detector are given
+        detector, embedder: Backend objects or specs from backends_module,
+                       e.g. detector="yunet:models/yunet.onnx", embedder="onnx:models/arcface_int8.onnx"
+        distance_metric: "cosine" or "euclidean_l2"
+        threshold: Maximum distance for a match (defaults per metric)
+        index_type: "flat" (exact), "ivf" or "hnsw" (approximate, for large galleries;
+                    "hnsw" is native with hnswlib installed). Sample-level matching always
+                    uses it; identity-level matching only past template_module.INDEX_MIN_SIZE
+                    people, below which exact template matching is faster
+        index_params: Extra keyword arguments for the index, e.g. {"nprobe": 16}
+        cache_dir: Shared embedding cache folder (None disables the cache)
+        match_level: "identity" matches one template per person, "sample" every image
+        max_templates: Templates per person (1 = centroid, more = medoids; see template_module)
         """
+        if detector is None:
+            detector = f"deepface:{detector_backend}"
+        if embedder is None:
+            embedder = f"deepface:{model_name}"
+        self.detector = create_detector(detector) if isinstance(detector, str) else detector
+        self.embedder = create_embedder(embedder) if isinstance(embedder, str) else embedder
+
         self.database_path = database_path
+        self.model_name = self.embedder.name  # tag stored with the gallery and cached embeddings
+        self.detector_backend = self.detector.name
         if not os.path.exists(database_path):
             os.makedirs(database_path)
 
+        self.gallery_path = os.path.join(database_path, gallery_file_name(self.model_name))
+        self.gallery = FaceGallery(distance_metric=distance_metric, threshold=threshold,
+                                   index_type=index_type, index_params=index_params,
+                                   match_level=match_level, max_templates=max_templates)
+        self.refresh_interval = 1.0  # seconds between checks for gallery changes by other processes
+        self._lock = threading.RLock()
+        self._unsaved = []  # (names, embeddings, file names) added with save=False, kept across reloads
+        self.embedding_cache = EmbeddingCache(cache_dir) if cache_dir else None
+        self.quality = QualityScorer()
+        self._gallery_mtime = None
+        self._last_refresh_check = 0.0
+        self.load_gallery()
+
+    @property
+    def match_threshold(self):
+        """Maximum gallery distance that still counts as a match."""
+        return self.gallery.threshold
+
+    # ---------------- Embeddings ----------------
+    def represent_frame(self, frame):
+        """
+        Return a list of (facial_area, embedding) for every face in a BGR frame.
+        facial_area is a dict with x, y, w, h keys.
+        """
+        detections = self.detect_and_align(frame)
+        embeddings = self.embed_faces([face for box, face in detections])
+        return [({"x": x, "y": y, "w": w, "h": h}, embedding)
+                for ((x, y, w, h), face), embedding in zip(detections, embeddings) if embedding is not None]
+
+    def embed_frame(self, frame, use_cache=False):
+        """
+        Return the embedding of the largest face in the frame, or None.
+        With use_cache, an image whose pixels were embedded before is looked up instead.
+        """
+        key = None
+        if use_cache and self.embedding_cache is not None and getattr(frame, "size", 0) > 0:
+            key = content_key(frame, "frame", self.model_name, self.detector_backend)
+            cached = self.embedding_cache.get_many([key])
+            if key in cached:
+                return cached[key]
+
+        detections = self.detect_and_align(frame)
+        if len(detections) == 0:
+            return None
+        box, face = max(detections, key=lambda d: d[0][2] * d[0][3])
+        embedding = self.embed_faces([face])[0]
+        if key is not None and embedding is not None:
+            self.embedding_cache.put_many({key: embedding})
+        return embedding
+
+    # ---------------- Detection ----------------
+    def detect_and_align(self, frame, scale=1.0, rois=None, realign=True):
+        """
+        Detect every face in a BGR frame once and return [(box, face)], where box is
+        (x, y, w, h) in frame coordinates and face is the aligned BGR crop
+        (uint8 or float 0-1, depending on the detector backend).
+        scale: Detect on a downscaled copy (see scaling_module.AdaptiveScaler)
+        rois: Only detect inside these (x, y, w, h) rectangles of the frame
+        realign: With scale < 1, re-detect each face in a full-resolution crop so the
+                 aligned face has full detail (otherwise only boxes are wanted)
+        """
+        if frame is None or getattr(frame, "size", 0) == 0:
+            return []
+        if scale >= 1.0 and not rois:
+            return self._detect(frame)
+
+        frame_h, frame_w = frame.shape[:2]
+        detections = []
+        for x0, y0, w0, h0 in rois or [(0, 0, frame_w, frame_h)]:
+            x0, y0 = max(0, int(x0)), max(0, int(y0))
+            region = frame[y0:min(frame_h, y0 + int(h0)), x0:min(frame_w, x0 + int(w0))]
+            if region.size == 0:
+                continue
+            small = region
+            if scale < 1.0:
+                size = (max(1, int(round(region.shape[1] * scale))), max(1, int(round(region.shape[0] * scale))))
+                small = cv2.resize(region, size, interpolation=cv2.INTER_AREA)
+            fx, fy = region.shape[1] / float(small.shape[1]), region.shape[0] / float(small.shape[0])
+            for (x, y, w, h), face in self._detect(small):
+                box = (x0 + int(x * fx), y0 + int(y * fy), int(w * fx), int(h * fy))
+                if small is not region and realign:
+                    box, face = self._realign(frame, box)
+                detections.append((box, face))
+        return detections
+
+    def _detect(self, image):
+        metrics.inc("model_calls_total", kind="detect", backend=self.detector_backend)
+        metrics.inc("detect_pixels_total", image.shape[0] * image.shape[1])
+        try:
+            with metrics.timer("detect"):
+                return self.detector.detect(image)
+        except Exception as e:
+            metrics.inc("model_errors_total", kind="detect")
+            print("Face detection error:", e)
+            return []
+
+    def _realign(self, frame, box, margin=0.5):
+        """
+        Re-detect a face found at low resolution in a full-resolution crop around it.
+        Returns (box, aligned face); falls back to a plain crop if the detector misses it.
+        """
+        x1, y1, w, h = box
+        dx, dy = int(w * margin), int(h * margin)
+        frame_h, frame_w = frame.shape[:2]
+        cx, cy = max(0, x1 - dx), max(0, y1 - dy)
+        crop = frame[cy:min(frame_h, y1 + h + dy), cx:min(frame_w, x1 + w + dx)]
+        found = self._detect(crop) if crop.size else []
+        if len(found) == 0:
+            return box, self.crop_face(frame, box)
+        # The face closest to the centre of the crop is the one we were looking at
+        centre = (crop.shape[1] / 2.0, crop.shape[0] / 2.0)
+        (x, y, fw, fh), face = min(found, key=lambda d: (d[0][0] + d[0][2] / 2.0 - centre[0]) ** 2 +
+                                                      (d[0][1] + d[0][3] / 2.0 - centre[1]) ** 2)
+        return (cx + x, cy + y, fw, fh), face
+
+    def detect_faces(self, frame, scale=1.0, rois=None, aligned=False):
+        """
+        Detect faces in a BGR frame without embedding them.
+        Returns a list of (x, y, w, h) boxes in frame coordinates, or with aligned
+        [(box, face)] where face is the full-resolution aligned crop to pass to recognize_crops.
+        scale / rois: see detect_and_align
+        """
+        if aligned:
+            return self.detect_and_align(frame, scale, rois)
+        return [box for box, face in self.detect_and_align(frame, scale, rois, realign=False)]
+
+    @staticmethod
+    def crop_face(frame, box, margin=0.1):
+        """Crop a face box from a frame with a small margin, clipped to the frame."""
+        x, y, w, h = box
+        dx, dy = int(w * margin), int(h * margin)
+        frame_h, frame_w = frame.shape[:2]
+        x1, y1 = max(0, x - dx), max(0, y - dy)
+        x2, y2 = min(frame_w, x + w + dx), min(frame_h, y + h + dy)
+        return frame[y1:y2, x1:x2]
+
+    # ---------------- Batched Embedding ----------------
+    def embed_faces(self, faces, use_cache=False):
+        """
+        Embed a list of face crops (BGR, uint8 or float 0-1) in one batched forward pass
+        of the embedder backend.
+        Returns one embedding (or None for an empty crop) per face.
+        With use_cache, only crops that are not in the embedding cache go through the model.
+        """
+        valid = [i for i, face in enumerate(faces) if face is not None and getattr(face, "size", 0) > 0]
+        embeddings = [None] * len(faces)
+        if not valid:
+            return embeddings
+
+        keys = None
+        if use_cache and self.embedding_cache is not None:
+            keys = {i: content_key(faces[i], "face", self.model_name) for i in valid}
+            cached = self.embedding_cache.get_many(keys.values())
+            for i in valid:
+                embeddings[i] = cached.get(keys[i])
+            valid = [i for i in valid if embeddings[i] is None]
+
+        if valid:
+            self._embed_batch(faces, valid, embeddings)
+            if keys is not None:
+                self.embedding_cache.put_many({keys[i]: embeddings[i] for i in valid if embeddings[i] is not None})
+        return embeddings
+
+    def _embed_batch(self, faces, valid, embeddings):
+        """Fill embeddings[i] for every index in valid with one forward pass."""
+        metrics.inc("model_calls_total", kind="embed", backend=self.model_name)
+        metrics.inc("faces_embedded_total", len(valid))
+        try:
+            with metrics.timer("embed"):
+                outputs = self.embedder.embed([faces[i] for i in valid])
+        except Exception as e:
+            metrics.inc("model_errors_total", kind="embed")
+            print("Face embedding error:", e)
+            return
+        for i, embedding in zip(valid, outputs):
+            embeddings[i] = embedding
+
+    def embed_crop(self, crop):
+        """Embed one already-cropped face (no detection). Returns None on failure."""
+        return self.embed_faces([crop])[0]
+
+    def _match_embeddings(self, embeddings):
+        """Match embeddings that may contain None. Returns (names, distances)."""
+        names = ["Unknown"] * len(embeddings)
+        distances = [float("inf")] * len(embeddings)
+        present = [i for i, e in enumerate(embeddings) if e is not None]
+        if present:
+            matched, matched_distances = self._match_batch([embeddings[i] for i in present])
+            for i, name, distance in zip(present, matched, matched_distances):
+                names[i] = name
+                distances[i] = distance
+        return names, distances
+
+    def recognize_crops(self, frame, boxes, faces=None, check_quality=False):
+        """
+        Recognize the faces at the given boxes of a frame with one batched forward pass.
+        faces: the aligned faces of the boxes (detect_faces(aligned=True)); embedded like
+               recognize_faces_in_frame does. Without them the boxes are cropped
+               unaligned from the frame, which matches the gallery less closely.
+        check_quality: low-quality faces are not embedded (reported as Unknown)
+        Returns (names, distances), one entry per box.
+        """
+        if faces is None:
+            faces = [self.crop_face(frame, box) for box in boxes]
+        faces = self._usable_faces(list(zip(boxes, faces)), check_quality)
+        return self._match_embeddings(self.embed_faces(faces))
+
+    def _usable_faces(self, detections, check_quality):
+        """Aligned faces to embed; with check_quality, low-quality faces become None (reported as Unknown)."""
+        if not check_quality:
+            return [face for box, face in detections]
+        return [face if face is not None and self.quality.is_good(face) else None for box, face in detections]
+
+    def recognize_faces_in_frame(self, frame, check_quality=False, scale=1.0, rois=None):
+        """
+        Two-stage multi-face recognition: detect and align every face once, embed all
+        crops in one batch and match them against the gallery together.
+        check_quality: skip embedding blurry, tiny, badly lit or turned faces
+        scale / rois: detect on a downscaled frame / inside regions only (see detect_and_align);
+                      faces are still embedded from the full-resolution frame
+        Returns [(box, name, distance)] with box = (x, y, w, h); lower distance is better.
+        """
+        detections = self.detect_and_align(frame, scale, rois)
+        if len(detections) == 0:
+            return []
+        embeddings = self.embed_faces(self._usable_faces(detections, check_quality))
+        names, distances = self._match_embeddings(embeddings)
+        return [(box, name, distance) for (box, face), name, distance in zip(detections, names, distances)]
+
+    # ---------------- Gallery ----------------
+    def _database_images(self):
+        return sorted(f for f in os.listdir(self.database_path)
+                      if f.lower().endswith(IMAGE_EXTENSIONS))
+
+    def load_gallery(self):
+        """
+        Load the saved gallery and bring it in sync with the images in database_path.
+        Only images that are new since the last save are embedded. Row labels are
+        kept as stored; only new images get a name derived from their file name.
+        """
+        stored_path = self.gallery_path
+        if not os.path.exists(stored_path) and self.model_name == DEFAULT_MODEL:
+            stored_path = os.path.join(self.database_path, LEGACY_GALLERY_FILE)  # written by an older version
+        relabeled = False
+        previous = {}  # source -> label of a stored gallery that has to be rebuilt
+        if os.path.exists(stored_path):
+            try:
+                self.gallery.load(stored_path)
+                if self.gallery.metadata.get("label_format") != "person":
+                    # Older galleries labelled rows per file (Harsh_1); labels are person names now
+                    relabeled = self.gallery.relabel(person_names(self.gallery.labels.tolist()).get)
+                model = self.gallery.metadata.get("model_name", self.model_name)
+                if model != self.model_name:
+                    previous = dict(zip(self.gallery.sources.tolist(), self.gallery.labels.tolist()))
+                    raise ValueError(f"gallery was built with {model}, not {self.model_name}")
+            except Exception as e:
+                print("Error loading gallery, rebuilding:", e)
+                self.gallery = FaceGallery(self.gallery.distance_metric, self.gallery.threshold,
+                                           self.gallery.index_type, self.gallery.index_params,
+                                           self.gallery.match_level, self.gallery.max_templates)
+
+        images = self._database_images()
+        known = set(str(s) for s in self.gallery.sources[self.gallery.active])
+        removed = known - set(images)
+        added = [f for f in images if f not in known]
+
+        if removed:
+            self.gallery.remove_sources(removed)
+        names = person_names([os.path.splitext(f)[0] for f in images],
+                             set(self.gallery.labels[self.gallery.active].tolist()) | set(previous.values()))
+        for file in added:
+            frame = cv2.imread(os.path.join(self.database_path, file))
+            embedding = self.embed_frame(frame, use_cache=True)
+            if embedding is None:
+                print(f"No face found in {file}, skipping.")
+                continue
+            self.gallery.add(previous.get(file) or names[os.path.splitext(file)[0]], embedding, source=file)
+
+        if removed or added or relabeled or not self.gallery.metadata:  # metadata is empty for new/legacy galleries
+            self._save_gallery()
+        self._gallery_mtime = self._stored_mtime()
+
+    def _stored_mtime(self):
+        try:
+            return os.path.getmtime(self.gallery_path)
+        except OSError:
+            return None
+
+    def refresh_gallery(self, force=False):
+        """
+        Reload the stored gallery if another process (e.g. the enrollment GUI) changed it.
+        Only the gallery file is read; the image folder is not rescanned.
+        """
+        now = time.time()
+        if not force and now - self._last_refresh_check < self.refresh_interval:
+            return
+        self._last_refresh_check = now
+        mtime = self._stored_mtime()
+        if mtime is None or mtime == self._gallery_mtime:
+            return
+        with self._lock:
+            try:
+                self.gallery.load(self.gallery_path)
+                self._gallery_mtime = mtime
+            except Exception as e:
+                print("Error reloading gallery:", e)
+                return
+            for names, embeddings, file_names in self._unsaved:
+                self.gallery.remove_sources(file_names)
+                self.gallery.add_many(names, embeddings, file_names)
+
+    def _save_gallery(self):
+        self.gallery.save(self.gallery_path, {"model_name": self.model_name,
+                                              "detector_backend": self.detector_backend})
+        self._gallery_mtime = self._stored_mtime()
+        self._unsaved = []
+
+    def save_gallery(self):
+        """Write the gallery, merged with whatever other processes saved since it was loaded."""
+        with self._lock:
+            self.refresh_gallery(force=True)
+            self._save_gallery()
+
+    # ---------------- Enrollment ----------------
+    def person_exists(self, person_name):
+        """Check whether a person is enrolled, using the in-memory gallery (no folder scan)."""
+        self.refresh_gallery()
+        with self._lock:
+            labels = self.gallery.labels[self.gallery.active]
+        return person_name.lower() in {str(label).lower() for label in labels}
+
+    def enroll_face(self, person_name, frame, file_name=None):
+        """
+        Enroll one BGR frame of a person: embed it once, save the image to database_path
+        and append the embedding to the live gallery and the stored gallery.
+        Returns True if a face was found and enrolled.
+        """
+        embedding = self.embed_frame(frame, use_cache=True)
+        if embedding is None:
+            print(f"No face found for {person_name}, not enrolled.")
+            return False
+
+        file_name = file_name or f"{person_name}.jpg"
+        save_path = os.path.join(self.database_path, file_name)
+        if not cv2.imwrite(save_path, frame):
+            print(f"Error saving face to {save_path}")
+            return False
+
+        with self._lock:
+            self.refresh_gallery(force=True)
+            self.gallery.remove_sources([file_name])
+            self.gallery.add(person_name, embedding, source=file_name)
+            self._save_gallery()
+        print(f"Enrolled {person_name} ({file_name}).")
+        return True
+
+    def add_embeddings(self, names, embeddings, file_names, save=True):
+        """
+        Add precomputed embeddings of images already copied into database_path (bulk import).
+        With save=False the stored gallery is only written by a later save_gallery(); the
+        rows are re-applied whenever the gallery is reloaded, so enrollments made by other
+        processes in the meantime are merged, not overwritten.
+        """
+        with self._lock:
+            self.refresh_gallery(force=True)
+            self.gallery.add_many(names, embeddings, file_names)
+            self._unsaved.append((list(names), self.gallery.normalize(embeddings), list(file_names)))
+            if save:
+                self._save_gallery()
+
+    def remove_person(self, person_name):
+        """
+        Delete every image of a person and drop their embeddings from the gallery.
+        Images are found by their gallery label; images without a row (no face found)
+        by the name derived from their file name.
+        """
+        wanted = person_name.lower()
+        with self._lock:
+            self.refresh_gallery(force=True)
+            active = self.gallery.active
+            labels = dict(zip(self.gallery.sources[active].tolist(), self.gallery.labels[active].tolist()))
+            sources = [source for source, label in labels.items() if label.lower() == wanted]
+            images = self._database_images()
+            names = person_names([os.path.splitext(f)[0] for f in images], set(labels.values()))
+            files = sources + [f for f in images
+                               if f not in labels and names[os.path.splitext(f)[0]].lower() == wanted]
+            for file in files:
+                try:
+                    os.remove(os.path.join(self.database_path, file))
+                except OSError as e:
+                    print(f"Error removing {file}:", e)
+            self.gallery.remove_sources(sources)
+            self._save_gallery()
+        print(f"Removed {person_name} from database.")
+
+    def reenroll_person(self, person_name, frames):
+        """Replace all of a person's images with the given frames. Returns the number enrolled."""
+        self.remove_person(person_name)
+        enrolled = 0
+        for i, frame in enumerate(frames, start=1):
+            if self.enroll_face(person_name, frame, f"{person_name}_{i}.jpg"):
+                enrolled += 1
+        return enrolled
+
+    # ---------------- Recognition ----------------
+    def _match_batch(self, embeddings):
+        self.refresh_gallery()
+        with self._lock, metrics.timer("match"):
+            names, distances = self.gallery.match_batch(embeddings)
+        if metrics.enabled:
+            unknown = sum(name == "Unknown" for name in names)
+            metrics.inc("faces_recognized_total", len(names) - unknown)
+            metrics.inc("faces_unknown_total", unknown)
+        return names, distances
+
+    def recognize_faces_in_frames(self, frames, use_cache=False, check_quality=False):
+        """
+        Multi-face recognition over several frames (e.g. one per camera): every face
+        from every frame is embedded in a single batched forward pass.
+        use_cache: look face crops up in the embedding cache (worth it for offline
+                   footage that is processed more than once, not for live video)
+        check_quality: skip embedding low-quality faces (see recognize_faces_in_frame)
+        Returns one [(box, name, distance)] list per frame.
+        """
+        per_frame = [self.detect_and_align(frame) for frame in frames]
+        faces = [face for detections in per_frame for face in self._usable_faces(detections, check_quality)]
+        if len(faces) == 0:
+            return [[] for _ in frames]
+        names, distances = self._match_embeddings(self.embed_faces(faces, use_cache))
+
+        results, i = [], 0
+        for detections in per_frame:
+            results.append([(box, names[i + j], distances[i + j]) for j, (box, face) in enumerate(detections)])
+            i += len(detections)
+        return results
+
+    def find_matches(self, frame):
+        """
+        Return the names of every known face found in the given BGR frame.
+        """
+        return [name for box, name, distance in self.recognize_faces_in_frame(frame) if name != "Unknown"]
+
+    def recognize_frame(self, frame):
+        """
+        Recognize the face in a BGR frame (numpy array, as returned by cv2.VideoCapture.read)
+        and return the person's name. If no match is found, return "Unknown".
+        """
+        embedding = self.embed_frame(frame)
+        if embedding is None:
+            return "Unknown"
+        names, distances = self._match_batch([embedding])
+        return names[0]
+
+    def recognize_frames(self, frames):
+        """
+        Recognize a batch of BGR frames (largest face of each), embedding all faces
+        in one forward pass. Returns one name per frame, in order.
+        """
+        faces = []
+        for frame in frames:
+            detections = self.detect_and_align(frame)
+            if len(detections) == 0:
+                faces.append(None)
+            else:
+                box, face = max(detections, key=lambda d: d[0][2] * d[0][3])
+                faces.append(face)
+        names, distances = self._match_embeddings(self.embed_faces(faces))
+        return names
+
     def recognize_face(self, image_path):
         """
-        Compare the given image with the database and return the person's name.
-        If no match is found, return "Unknown".
+        Compare the given image file with the database and return the person's name.
+        Thin wrapper around recognize_frame() kept for file-based callers.
         """
         if not os.path.exists(image_path):
             print(f"Error: {image_path} does not exist!")
             return "Unknown"
 
-        try:
-            results = DeepFace.find(img_path=image_path, db_path=self.database_path, enforce_detection=False)
-            if len(results) > 0 and len(results[0]) > 0:
-                match_path = results[0].iloc[0]['identity']
-                person_name = os.path.splitext(os.path.basename(match_path))[0]
-                return person_name
-            else:
-                return "Unknown"
-        except Exception as e:
-            print("Face recognition error:", e)
+        frame = cv2.imread(image_path)
+        if frame is None:
+            print(f"Error: could not read {image_path}!")
             return "Unknown"
+        return self.recognize_frame(frame)
 
     def add_face_to_database(self, person_name, image_path):
         """
-        Save a new face to the database.
+        Save a new face to the database and add it to the gallery.
         """
         if not os.path.exists(image_path):
             print(f"Error: {image_path} does not exist!")
@@ -49,28 +836,15 @@ class FaceRecognitionModule:
             print(f"{person_name} already exists in database, skipping.")
             return
 
-        try:
-            with open(image_path, "rb") as f_src:
-                with open(save_path, "wb") as f_dst:
-                    f_dst.write(f_src.read())
-            print(f"Saved {person_name} to database.")
-        except Exception as e:
-            print("Error saving face:", e)
+        frame = cv2.imread(image_path)
+        if frame is None:
+            print(f"Error: could not read {image_path}!")
+            return
+        self.enroll_face(person_name, frame, f"{person_name}{ext}")
 
 
 # ------------------- Dynamic Folder Import -------------------
 if __name__ == "__main__":
-    # Initialize the face recognition module
-    face_recog = FaceRecognitionModule()
-
-    # Automatically add all images from faces_to_add/
-    faces_folder = "faces_to_add"
-    if os.path.exists(faces_folder):
-        for file in os.listdir(faces_folder):
-            if file.lower().endswith((".jpg", ".png")):
-                person_name = os.path.splitext(file)[0]  # Use file name as person name
-                image_path = os.path.join(faces_folder, file)
-                face_recog.add_face_to_database(person_name, image_path)
-    else:
-        print(f"Folder '{faces_folder}' does not exist. Create it and put face images there.")
-
+    # Enroll every photo in faces_to_add/ in parallel (see import_faces.py for the options)
+    from import_faces import main
+    main()
@@ -0,0 +1,127 @@
+# gallery_format_module.py
+#
+# Versioned binary gallery file (.fgal), designed to be memory-mapped.
+#
+#   offset 0     magic b"FGAL", format version (uint32), header length (uint32)
+#   offset 12    JSON header: metadata (model, detector, metric, ...) and section offsets,
+#                space-padded to HEADER_SIZE
+#   HEADER_SIZE  float32 embedding matrix, count x dim, little endian
+#   ...          label table:  uint32 offsets (count + 1) then UTF-8 bytes
+#   ...          source table: same layout
+#   ...          tombstone bitmap: 1 bit per row, set = deleted
+#
+# The embedding matrix starts on a page boundary and is opened with np.memmap,
+# so loading costs the same for 10 or 100k faces and every process shares the
+# OS page cache. Files are written to a temporary name and swapped in with
+# os.replace, so readers see either the old or the new gallery, never a mix.
+
+import json
+import os
+import struct
+import time
+import numpy as np
+
+GALLERY_MAGIC = b"FGAL"
+GALLERY_VERSION = 1
+HEADER_SIZE = 4096
+_PREFIX = struct.Struct("<4sII")
+
+
+def _align(offset, alignment=64):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _encode_strings(values):
+    """String table: uint32 end offsets (with a leading 0) followed by the UTF-8 blob."""
+    encoded = [str(v).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return offsets.tobytes() + b"".join(encoded)
+
+
+def _decode_strings(buffer, count):
+    offsets = np.frombuffer(buffer, dtype="<u4", count=count + 1)
+    blob = bytes(buffer[4 * (count + 1):])
+    return np.array([blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)], dtype=str)
+
+
+def write_gallery(path, embeddings, labels, sources, active, metadata=None):
+    """Write a gallery file and atomically replace `path` with it."""
+    embeddings = np.ascontiguousarray(embeddings, dtype="<f4")
+    count = len(embeddings)
+    dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+
+    label_table = _encode_strings(labels)
+    source_table = _encode_strings(sources)
+    tombstones = np.packbits(~np.asarray(active, dtype=bool), bitorder="little").tobytes()
+
+    sections = {}
+    offset = HEADER_SIZE
+    for name, size in (("embeddings", embeddings.nbytes), ("labels", len(label_table)),
+                       ("sources", len(source_table)), ("tombstones", len(tombstones))):
+        sections[name] = [offset, size]
+        offset = _align(offset + size)
+
+    header = dict(metadata or {})
+    header.update({"count": count, "dim": dim, "saved": time.time(), "sections": sections})
+    header_bytes = json.dumps(header).encode("utf-8")
+    if _PREFIX.size + len(header_bytes) > HEADER_SIZE:
+        raise ValueError("Gallery metadata is too large")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(GALLERY_MAGIC, GALLERY_VERSION, len(header_bytes)))
+        f.write(header_bytes.ljust(HEADER_SIZE - _PREFIX.size, b" "))
+        for name, data in (("embeddings", embeddings.tobytes()), ("labels", label_table),
+                           ("sources", source_table), ("tombstones", tombstones)):
+            f.seek(sections[name][0])
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    """Return the JSON header of a gallery file (metadata and section table)."""
+    with open(path, "rb") as f:
+        magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != GALLERY_MAGIC:
+            raise ValueError(f"{path} is not a gallery file")
+        if version > GALLERY_VERSION:
+            raise ValueError(f"{path} uses gallery format v{version}, newer than supported v{GALLERY_VERSION}")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    header["version"] = version
+    return header
+
+
+def read_gallery(path, mmap=True):
+    """
+    Open a gallery file. Returns a dict with metadata, embeddings (read-only
+    memmap, or an in-memory copy with mmap=False), labels, sources and active.
+    """
+    header = read_header(path)
+    count, dim = header["count"], header["dim"]
+    sections = header["sections"]
+
+    with open(path, "rb") as f:
+        def section(name):
+            offset, size = sections[name]
+            f.seek(offset)
+            return f.read(size)
+
+        labels = _decode_strings(section("labels"), count)
+        sources = _decode_strings(section("sources"), count)
+        deleted = np.unpackbits(np.frombuffer(section("tombstones"), dtype=np.uint8),
+                                count=count, bitorder="little").astype(bool)
+        if count == 0 or dim == 0:
+            embeddings = np.zeros((0, dim), dtype=np.float32)
+        elif mmap:
+            embeddings = np.memmap(path, dtype="<f4", mode="r", offset=sections["embeddings"][0], shape=(count, dim))
+        else:
+            f.seek(sections["embeddings"][0])
+            embeddings = np.fromfile(f, dtype="<f4", count=count * dim).reshape(count, dim)
+
+    metadata = {k: v for k, v in header.items() if k != "sections"}
+    return {"metadata": metadata, "embeddings": embeddings, "labels": labels,
+            "sources": sources, "active": ~deleted}
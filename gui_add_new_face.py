@@ -2,16 +2,20 @@
 
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image, ImageTk
 import cv2
-import os
-from face_recognition_module import FaceRecognitionModule
-from deepface import DeepFace
+import time
+from recognition_service import connect_recognizer
+from display_module import VideoSurface
+from quality_module import QualityScorer
+from motion_module import guide_rect
+from scaling_module import AdaptiveScaler
 
 # ---------------- Initialize ----------------
-face_recog = FaceRecognitionModule()
-capture_count = 0
+face_recog = connect_recognizer()  # shared service; the model is not loaded in this process
+quality = QualityScorer()
+scaler = AdaptiveScaler(roi=lambda w, h: [guide_rect(w, h)])  # detect around the guide rectangle only
 MAX_CAPTURE = 3  # number of photos per employee
+BURST_FRAMES = 20  # frames grabbed per capture; the best MAX_CAPTURE are enrolled
 current_detected_name = "Unknown"
 
 # ---------------- GUI Setup ----------------
@@ -53,44 +57,53 @@ cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
 
 # ----------------- Functions ----------------
 def capture_image():
-    """Capture image(s) for new employee"""
-    global capture_count
+    """Capture a short burst and enroll the sharpest, most frontal frames of the new employee"""
     employee_name = name_entry.get().strip()
     if employee_name == "":
         messagebox.showwarning("Input Error", "Please enter employee name.")
         return
 
     # Check if employee already exists
-    existing_files = os.listdir(face_recog.database_path)
-    for f in existing_files:
-        if f.lower().startswith(employee_name.lower() + "_") or f.lower() == employee_name.lower() + ".jpg":
-            messagebox.showinfo("Duplicate Entry", f"Employee '{employee_name}' already exists!")
-            return
+    if face_recog.person_exists(employee_name):
+        messagebox.showinfo("Duplicate Entry", f"Employee '{employee_name}' already exists!")
+        return
 
-    capture_count += 1
-    filename = f"{employee_name}_{capture_count}.jpg"
-    save_path = os.path.join(face_recog.database_path, filename)
+    status_var.set("Capturing... look at the camera and hold still")
+    root.update_idletasks()
+
+    frames, boxes = [], []
+    for _ in range(BURST_FRAMES):
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        faces = face_recog.detect_faces(frame)
+        frames.append(frame)
+        boxes.append(max(faces, key=lambda b: b[2] * b[3]) if faces else None)
+
+    picks = quality.pick_best(frames, boxes, MAX_CAPTURE)
+    if not picks:
+        status_var.set("No clear face captured, please try again (face the camera, good lighting)")
+        return
 
-    ret, frame = cap.read()
-    if ret:
-        cv2.imwrite(save_path, frame)
-        status_var.set(f"Captured {capture_count}/{MAX_CAPTURE} images for {employee_name}")
-    else:
-        status_var.set("Failed to capture image!")
+    # Embed once and add straight to the live gallery
+    enrolled = 0
+    for number, (index, scores) in enumerate(picks, start=1):
+        if face_recog.enroll_face(employee_name, frames[index], f"{employee_name}_{number}.jpg"):
+            enrolled += 1
+    if enrolled == 0:
+        status_var.set("No face detected, please try again!")
+        return
 
-    if capture_count >= MAX_CAPTURE:
-        status_var.set(f"Finished capturing {MAX_CAPTURE} images for {employee_name}")
-        capture_count = 0
-        name_entry.delete(0, tk.END)
-        add_button.pack_forget()  # hide button after done
+    status_var.set(f"Enrolled {enrolled} images for {employee_name} (best of {len(frames)} frames)")
+    name_entry.delete(0, tk.END)
+    add_button.pack_forget()  # hide button after done
 
-def update_frame():
-    """Update camera feed in GUI and perform face recognition"""
+def next_frame():
+    """Read the camera, recognize the face and return the frame to display (None if no frame)"""
     global current_detected_name
     ret, frame = cap.read()
     if not ret:
-        camera_canvas.after(10, update_frame)
-        return
+        return None
 
     # Draw guide rectangle
     h, w, _ = frame.shape
@@ -100,38 +113,29 @@ def update_frame():
     cv2.rectangle(frame, top_left, bottom_right, (0, 0, 255), 2)
 
     # ----------------- Face Recognition ----------------
-    temp_file = "temp_frame.jpg"
-    small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-    cv2.imwrite(temp_file, small_frame)
-
-    try:
-        results = DeepFace.find(img_path=temp_file, db_path=face_recog.database_path, enforce_detection=False)
-        if len(results) > 0 and len(results[0]) > 0:
-            match_path = results[0].iloc[0]['identity']
-            person_name = os.path.splitext(os.path.basename(match_path))[0]
-            current_detected_name = person_name
-            subtitle_var.set(f"Existing Employee: {person_name}")
-            if add_button.winfo_ismapped():
-                add_button.pack_forget()  # hide add button if face exists
-        else:
-            current_detected_name = "Unknown"
-            subtitle_var.set("New Employee: Enter Name and Click 'Capture Image'")
-            if not add_button.winfo_ismapped():
-                add_button.pack(side=tk.LEFT, padx=10)  # show button for new employee
-    except:
+    # Detect at an adaptive resolution (distant faces are not lost to a fixed resize),
+    # recognize from the full-resolution frame
+    scale, rois = scaler.plan(w, h)
+    started = time.perf_counter()
+    detections = face_recog.detect_faces(frame, scale, rois, aligned=True)
+    scaler.update([box for box, face in detections], time.perf_counter() - started)  # detection time only
+    person_name = "Unknown"
+    if detections:
+        box, face = max(detections, key=lambda d: d[0][2] * d[0][3])  # only the largest face is checked
+        [person_name], _ = face_recog.recognize_crops(frame, [box], [face])
+
+    if person_name != "Unknown":
+        current_detected_name = person_name
+        subtitle_var.set(f"Existing Employee: {person_name}")
+        if add_button.winfo_ismapped():
+            add_button.pack_forget()  # hide add button if face exists
+    else:
         current_detected_name = "Unknown"
         subtitle_var.set("New Employee: Enter Name and Click 'Capture Image'")
         if not add_button.winfo_ismapped():
-            add_button.pack(side=tk.LEFT, padx=10)
-
-    # Convert frame to ImageTk
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    img = Image.fromarray(frame_rgb)
-    imgtk = ImageTk.PhotoImage(image=img)
-    camera_canvas.imgtk = imgtk
-    camera_canvas.configure(image=imgtk)
+            add_button.pack(side=tk.LEFT, padx=10)  # show button for new employee
 
-    camera_canvas.after(10, update_frame)
+    return frame  # our own frame from cap.read(), shown without another copy
 
 # ----------------- Buttons ----------------
 btn_frame = tk.Frame(root)
@@ -143,15 +147,17 @@ btn_frame = tk.Frame(root)
 btn_frame.pack(pady=10)
 
 add_button = tk.Button(btn_frame, text="Capture Image", font=("Helvetica", 12), width=20, command=capture_image)
-# Initially hidden, will appear dynamically in update_frame()
+# Initially hidden, will appear dynamically in next_frame()
 
 btn_quit = tk.Button(btn_frame, text="Quit", font=("Helvetica", 12), width=20, command=quit)
 btn_quit.pack(side=tk.LEFT, padx=10)
 
 # ----------------- Start Camera ----------------
-update_frame()
+surface = VideoSurface(camera_canvas)
+surface.run(next_frame)
 root.mainloop()
 
 # Release camera
+surface.stop()
 cap.release()
 cv2.destroyAllWindows()
@@ -1,20 +1,24 @@
 # gui_live_recognition.py
 
 import tkinter as tk
-from tkinter import messagebox
-from tkinter import ttk
-from PIL import Image, ImageTk
 import cv2
-import threading
-import time
-import os
 
-from face_recognition_module import FaceRecognitionModule
+from recognition_service import connect_recognizer
 from database_module import FaceDatabaseLogger
+from cooldown_module import LogCooldown
+from display_module import VideoSurface
+from log_viewer_module import open_log_viewer
+from motion_module import MotionGate, guide_rect
+from metrics_module import metrics
+from pipeline_module import RecognitionPipeline
+from quality_module import QualityScorer
+from scaling_module import AdaptiveScaler
+from tracker_module import TrackingRecognizer
 
 # ---------------- Initialize Modules ----------------
-face_recog = FaceRecognitionModule()
+face_recog = connect_recognizer()  # shared service; the model is not loaded in this process
 logger = FaceDatabaseLogger()
+metrics.serve_from_env()  # FACE_METRICS=1 / FACE_METRICS_PORT, see metrics_module
 
 # ---------------- GUI Setup ----------------
 root = tk.Tk()
@@ -36,53 +40,70 @@ subtitle_var.set("Instructions: Keep your face straight in front of the camera")
 subtitle_label = tk.Label(root, textvariable=subtitle_var, font=("Helvetica", 12), fg="blue")
 subtitle_label.pack(pady=5)
 
-# ----------------- Logging Variables ----------------
-recently_logged = {}
-LOG_COOLDOWN = 5  # seconds
+# Pipeline stats
+stats_var = tk.StringVar()
+stats_label = tk.Label(root, textvariable=stats_var, font=("Helvetica", 9), fg="gray")
+stats_label.pack()
+
+# ----------------- Logging Cooldown ----------------
+cooldown = LogCooldown()  # shared with the other recognizers, survives restarts
 
 # ----------------- Functions ----------------
 def add_new_employee():
     """Capture new employee face"""
     import subprocess
-    subprocess.Popen(["python", "add_new_face.py"])
+    import sys
+    subprocess.Popen([sys.executable, "gui_add_new_face.py"])
 
 def view_logs():
-    """Show recognition logs"""
-    try:
-        with open("recognized_faces.csv", "r") as f:
-            logs = f.read()
-        log_window = tk.Toplevel(root)
-        log_window.title("Recognition Logs")
-        text = tk.Text(log_window, width=80, height=25)
-        text.pack(padx=10, pady=10)
-        text.insert(tk.END, logs)
-    except FileNotFoundError:
-        messagebox.showinfo("Logs", "No logs found yet.")
+    """Show recognition logs (paginated, only visible rows are loaded)"""
+    logger.flush()
+    open_log_viewer(root)
 
 # ----------------- Camera Feed ----------------
 cap = cv2.VideoCapture(0)
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
 cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
 
-def update_frame():
-    """Update camera frame inside GUI"""
-    ret, frame = cap.read()
-    if not ret:
-        camera_canvas.after(10, update_frame)
-        return
-
-    # ----------------- Face Recognition -----------------
-    temp_file = "temp_frame.jpg"
-    cv2.imwrite(temp_file, frame)
-    name = face_recog.recognize_face(temp_file)
-
-    # Log recognized face
-    current_time = time.time()
-    if name != "Unknown":
-        last_logged = recently_logged.get(name, 0)
-        if current_time - last_logged > LOG_COOLDOWN:
-            logger.log_recognition(name)
-            recently_logged[name] = current_time
+def log_result(frame_id, name):
+    """Log recognized face (runs on the recognition worker thread)"""
+    if name != "Unknown" and cooldown.allow(name):
+        logger.log_recognition(name)
+
+# Faces are tracked every frame; the recognition model only runs on new or changed tracks,
+# and only once the face is sharp and frontal enough. Detection only looks around the
+# guide rectangle, at the lowest resolution that still finds the face.
+scaler = AdaptiveScaler(roi=lambda w, h: [guide_rect(w, h)])
+tracking = TrackingRecognizer(face_recog, quality=QualityScorer(), scaler=scaler)
+
+def recognize(frame):
+    """Return the name of the largest tracked face (runs on the recognition worker thread)"""
+    faces = tracking.process(frame)
+    if len(faces) == 0:
+        return "Unknown"
+    track_id, box, name = max(faces, key=lambda f: f[1][2] * f[1][3])
+    return name
+
+# Only detect when something moves inside the guide rectangle
+gate = MotionGate(roi=lambda w, h: [guide_rect(w, h)])
+
+# Capture and recognition run in background threads; the display surface only renders
+pipeline = RecognitionPipeline(cap, recognize, num_workers=1, on_result=log_result, gate=gate)
+surface = VideoSurface(camera_canvas)
+last_rendered_id = 0
+
+def next_frame():
+    """Newest camera frame with the latest recognition result drawn on it (None if nothing new)"""
+    global last_rendered_id
+    frame_id, frame = pipeline.latest_frame()
+    if frame is None or frame_id == last_rendered_id:
+        return None
+    last_rendered_id = frame_id
+
+    result_id, name = pipeline.latest_result()
+    if name is None:
+        name = "..."
+    frame = surface.prepare(frame)  # preallocated copy; workers may still be reading the original
 
     # Draw rectangle guide in center
     h, w, _ = frame.shape
@@ -95,15 +116,12 @@ def update_frame():
     cv2.putText(frame, name, (top_left[0], top_left[1]-10),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
 
-    # Convert frame to ImageTk for Tkinter
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    img = Image.fromarray(frame_rgb)
-    imgtk = ImageTk.PhotoImage(image=img)
-    camera_canvas.imgtk = imgtk
-    camera_canvas.configure(image=imgtk)
+    metrics.draw_overlay(frame)  # debug overlay, only when metrics are enabled
+    return frame
 
-    # Call the function again after 10ms
-    camera_canvas.after(10, update_frame)
+def frame_shown():
+    pipeline.rendered.tick()
+    stats_var.set(f"{pipeline.stats_text()} | Model calls {tracking.model_calls}")
 
 # ----------------- Buttons ----------------
 btn_frame = tk.Frame(root)
@@ -119,9 +137,12 @@ btn_quit = tk.Button(btn_frame, text="Quit", font=("Helvetica", 12), width=20, c
 btn_quit.grid(row=0, column=2, padx=10)
 
 # ----------------- Start Camera Feed ----------------
-update_frame()
+pipeline.start()
+surface.run(next_frame, after_show=frame_shown)
 root.mainloop()
 
 # Release camera
+surface.stop()
+pipeline.stop()
 cap.release()
 cv2.destroyAllWindows()
@@ -1,29 +1,28 @@
 # gui_main.py
 
 import tkinter as tk
-from tkinter import messagebox
 import subprocess
+import sys
+from log_viewer_module import open_log_viewer
+from recognition_service import start_service, stop_service_when_idle
 
 # Functions for button actions
 def add_new_employee():
     # Calls the add_new_face.py script
-    subprocess.Popen(["python", "gui_add_new_face.py"])
+    subprocess.Popen([sys.executable, "gui_add_new_face.py"])
 
 def start_recognition():
     # Calls the camera_module_ui.py script
-    subprocess.Popen(["python", "gui_live_recognition.py"])
+    subprocess.Popen([sys.executable, "gui_live_recognition.py"])
 
 def view_logs():
-    try:
-        with open("recognized_faces.csv", "r") as f:
-            logs = f.read()
-        log_window = tk.Toplevel(root)
-        log_window.title("Recognition Logs")
-        text = tk.Text(log_window, width=60, height=20)
-        text.pack(padx=10, pady=10)
-        text.insert(tk.END, logs)
-    except FileNotFoundError:
-        messagebox.showinfo("Logs", "No logs found yet.")
+    # Paginated viewer over the SQLite log; only visible rows are loaded
+    open_log_viewer(root)
+
+# ----------------- Recognition Service -----------------
+# Load the model once in a shared background process while the menu is open;
+# every screen launched from here connects to it instead of loading its own copy.
+service = start_service()
 
 # ----------------- GUI -----------------
 root = tk.Tk()
@@ -50,3 +49,6 @@ footer_label = tk.Label(root, text="Ensure good lighting and a clear face", font
 footer_label.pack(side=tk.BOTTOM, pady=20)
 
 root.mainloop()
+
+# Stop the shared service once the screens started from the menu have closed too
+stop_service_when_idle(service)
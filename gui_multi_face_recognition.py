@@ -1,19 +1,22 @@
 # gui_multi_face_recognition.py
 
 import tkinter as tk
-from tkinter import messagebox
-from PIL import Image, ImageTk
 import cv2
-import threading
 import time
-import os
-from deepface import DeepFace
-from face_recognition_module import FaceRecognitionModule
+from recognition_service import connect_recognizer
 from database_module import FaceDatabaseLogger
+from cooldown_module import LogCooldown
+from display_module import VideoSurface
+from log_viewer_module import open_log_viewer
+from motion_module import MotionGate
+from metrics_module import metrics
+from pipeline_module import RecognitionPipeline
+from scaling_module import AdaptiveScaler
 
 # ---------------- Initialize Modules ----------------
-face_recog = FaceRecognitionModule()
+face_recog = connect_recognizer()  # shared service; the model is not loaded in this process
 logger = FaceDatabaseLogger()
+metrics.serve_from_env()  # FACE_METRICS=1 / FACE_METRICS_PORT, see metrics_module
 
 # ---------------- GUI Setup ----------------
 root = tk.Tk()
@@ -35,85 +38,86 @@ subtitle_var.set("Instructions: Keep faces straight in front of the camera")
 subtitle_label = tk.Label(root, textvariable=subtitle_var, font=("Helvetica", 12), fg="blue")
 subtitle_label.pack(pady=5)
 
-# ----------------- Logging Variables ----------------
-recently_logged = {}
-LOG_COOLDOWN = 5  # seconds
+# Pipeline stats
+stats_var = tk.StringVar()
+stats_label = tk.Label(root, textvariable=stats_var, font=("Helvetica", 9), fg="gray")
+stats_label.pack()
+
+# ----------------- Logging Cooldown ----------------
+cooldown = LogCooldown()  # shared with the other recognizers, survives restarts
 
 # ----------------- Functions ----------------
 def add_new_employee():
     """Capture new employee face"""
     import subprocess
-    subprocess.Popen(["python", "add_new_face.py"])
+    import sys
+    subprocess.Popen([sys.executable, "gui_add_new_face.py"])
 
 def view_logs():
-    """Show recognition logs"""
-    try:
-        with open("recognized_faces.csv", "r") as f:
-            logs = f.read()
-        log_window = tk.Toplevel(root)
-        log_window.title("Recognition Logs")
-        text = tk.Text(log_window, width=80, height=25)
-        text.pack(padx=10, pady=10)
-        text.insert(tk.END, logs)
-    except FileNotFoundError:
-        messagebox.showinfo("Logs", "No logs found yet.")
+    """Show recognition logs (paginated, only visible rows are loaded)"""
+    logger.flush()
+    open_log_viewer(root)
 
 # ----------------- Camera Feed ----------------
 cap = cv2.VideoCapture(0)
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
 cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
 
-def update_frame():
-    """Update camera frame inside GUI with multi-face recognition"""
-    ret, frame = cap.read()
-    if not ret:
-        camera_canvas.after(10, update_frame)
-        return
-
-    # Resize for faster processing
-    small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-
-    # ----------------- Multi-face Recognition -----------------
-    temp_file = "temp_frame.jpg"
-    cv2.imwrite(temp_file, small_frame)
-
-    try:
-        results = DeepFace.find(img_path=temp_file, db_path=face_recog.database_path, enforce_detection=False)
-        recognized_faces = []
-        if len(results) > 0 and len(results[0]) > 0:
-            for idx, row in results[0].iterrows():
-                match_path = row['identity']
-                person_name = os.path.splitext(os.path.basename(match_path))[0]
-                recognized_faces.append(person_name)
-    except:
-        recognized_faces = []
+# Detection resolution follows the size of the faces in view; embedding uses the full frame
+scaler = AdaptiveScaler()
+
+def recognize_faces(frame):
+    """Multi-face recognition: [(box, name, distance)] per face (runs on a recognition worker thread)"""
+    scale, rois = scaler.plan(frame.shape[1], frame.shape[0])
+    started = time.perf_counter()
+    detections = face_recog.detect_faces(frame, scale, rois, aligned=True)
+    boxes = [box for box, face in detections]
+    scaler.update(boxes, time.perf_counter() - started)  # detection time only
+    if not detections:
+        return []
+    names, distances = face_recog.recognize_crops(frame, boxes, [face for box, face in detections],
+                                                  check_quality=True)  # low-quality faces are not embedded
+    return list(zip(boxes, names, distances))
+
+def log_result(frame_id, recognized_faces):
+    """Log recognized faces (runs on the recognition worker thread)"""
+    for box, name, distance in recognized_faces:
+        if name != "Unknown" and cooldown.allow(name):
+            logger.log_recognition(name)
+
+# Only detect when something moves in the frame
+gate = MotionGate()
+
+# Capture and recognition run in background threads; the display surface only renders
+pipeline = RecognitionPipeline(cap, recognize_faces, num_workers=1, on_result=log_result, gate=gate)
+surface = VideoSurface(camera_canvas)
+last_rendered_id = 0
+
+def next_frame():
+    """Newest camera frame with the latest multi-face results drawn on it (None if nothing new)"""
+    global last_rendered_id
+    frame_id, frame = pipeline.latest_frame()
+    if frame is None or frame_id == last_rendered_id:
+        return None
+    last_rendered_id = frame_id
+
+    result_id, recognized_faces = pipeline.latest_result()
+    recognized_faces = recognized_faces or []
+    frame = surface.prepare(frame)  # preallocated copy; workers may still be reading the original
 
     # ---------------- Draw Rectangles & Names ----------------
-    h, w, _ = frame.shape
-    for i, name in enumerate(recognized_faces):
-        # Simple layout: offset rectangles for multiple faces
-        top_left = (50, 50 + i*100)
-        bottom_right = (250, 150 + i*100)
-        cv2.rectangle(frame, top_left, bottom_right, (0, 0, 255), 2)
-        cv2.putText(frame, name, (top_left[0], top_left[1]-10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-        # Logging
-        current_time = time.time()
-        if name != "Unknown":
-            last_logged = recently_logged.get(name, 0)
-            if current_time - last_logged > LOG_COOLDOWN:
-                logger.log_recognition(name)
-                recently_logged[name] = current_time
-
-    # Convert frame to ImageTk for Tkinter
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    img = Image.fromarray(frame_rgb)
-    imgtk = ImageTk.PhotoImage(image=img)
-    camera_canvas.imgtk = imgtk
-    camera_canvas.configure(image=imgtk)
-
-    camera_canvas.after(10, update_frame)
+    for (x, y, w, h), name, distance in recognized_faces:
+        color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        cv2.putText(frame, name, (x, max(0, y - 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+
+    metrics.draw_overlay(frame)  # debug overlay, only when metrics are enabled
+    return frame
+
+def frame_shown():
+    pipeline.rendered.tick()
+    stats_var.set(pipeline.stats_text())
 
 # ----------------- Buttons ----------------
 btn_frame = tk.Frame(root)
@@ -129,9 +133,12 @@ btn_quit = tk.Button(btn_frame, text="Quit", font=("Helvetica", 12), width=20, c
 btn_quit.grid(row=0, column=2, padx=10)
 
 # ----------------- Start Camera Feed ----------------
-update_frame()
+pipeline.start()
+surface.run(next_frame, after_show=frame_shown)
 root.mainloop()
 
 # Release camera
+surface.stop()
+pipeline.stop()
 cap.release()
 cv2.destroyAllWindows()
@@ -0,0 +1,306 @@
+# import_faces.py
+#
+# Parallel bulk enrollment from a folder of photos (e.g. an HR export for a new site).
+#
+#   python import_faces.py                       # faces_to_add/ -> faces_database/
+#   python import_faces.py hr_export/ --workers 8 --report import_report.csv
+#   python import_faces.py hr_export/ --backend yunet+onnx:models/arcface_int8.onnx
+#
+# Person names come from file names (Harsh.jpg, Harsh_2.jpg -> Harsh; a "_<n>"
+# suffix is only dropped next to Harsh.jpg, other Harsh_<n> photos or an enrolled
+# Harsh, so a lone Agent_7.jpg is Agent_7) or, for photos in a sub-folder, from
+# the folder name (hr_export/Harsh/001.jpg -> Harsh, stored as Harsh_1.jpg,
+# Harsh_2.jpg, ...). The name is stored as the gallery label.
+#
+# A process pool decodes, detects, quality-checks and embeds the photos in
+# chunks of --chunk-size; every worker loads the models once and embeds a chunk
+# in one forward pass. Photos are identified by the embedding cache's content
+# key (a hash of the decoded pixels), so a photo whose pixels are already
+# enrolled for that person, or that appeared earlier in the import, is skipped
+# whatever its file name, and re-running an import takes its embeddings from
+# the shared cache instead of the model.
+#
+# The main process then checks each new face against the gallery (including
+# the faces imported so far) and the rest of its chunk, and flags faces that
+# are enrolled under a different name, or near-copies of a photo the same
+# person already has, instead of enrolling them. Accepted photos are copied
+# into the database folder and the gallery is written once, at the end (or
+# when interrupted), merged with anything the GUIs or the recognition service
+# enrolled while the import ran.
+
+import argparse
+import csv
+import multiprocessing
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+from embedding_cache_module import EMBEDDING_CACHE_DIR, EmbeddingCache, content_key
+from face_recognition_module import DEFAULT_MODEL, IMAGE_EXTENSIONS, FaceRecognitionModule
+from template_module import person_names
+
+# Near-copies of an enrolled photo of the same person: this fraction of the match threshold
+NEAR_DUPLICATE_FRACTION = 0.1
+
+# Set in each worker process by _init_worker
+_detector = None
+_embedder = None
+_quality = None
+_cache = None
+
+
+# ------------------- Planning -------------------
+def plan_imports(folder, database_path, known=()):
+    """
+    Decide the database file of every photo under folder.
+    known: names of enrolled people (file names like Harsh_2.jpg join them).
+    Returns (plan, skipped): plan is [(source path, person name, database file)],
+    skipped is [(source path, person name, database file, reason)].
+    """
+    taken = {f.lower() for f in os.listdir(database_path)} if os.path.isdir(database_path) else set()
+    next_index = {}
+    plan, skipped = [], []
+
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        relative = os.path.relpath(root, folder)
+        folder_name = None if relative == "." else relative.split(os.sep)[0]
+        if folder_name is None:
+            names = person_names([os.path.splitext(f)[0] for f in files
+                                  if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS], known)
+        for file in sorted(files):
+            stem, ext = os.path.splitext(file)
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+            source = os.path.join(root, file)
+
+            if folder_name is None:
+                name, target = names[stem], file
+                if target.lower() in taken:
+                    skipped.append((source, name, target, "file name already in database"))
+                    continue
+            else:
+                name = folder_name
+                i = next_index.get(name.lower(), 1)
+                target = f"{name}_{i}{ext.lower()}"
+                while any(f"{name}_{i}{e}".lower() in taken for e in IMAGE_EXTENSIONS):
+                    i += 1
+                    target = f"{name}_{i}{ext.lower()}"
+                next_index[name.lower()] = i + 1
+            taken.add(target.lower())
+            plan.append((source, name, target))
+    return plan, skipped
+
+
+def enrolled_files(gallery, database_path, names):
+    """Image files in the database that are enrolled under one of the given person names."""
+    wanted = {name.lower() for name in names}
+    active = gallery.active
+    return [os.path.join(database_path, source)
+            for source, label in sorted(zip(gallery.sources[active].tolist(), gallery.labels[active].tolist()))
+            if label.lower() in wanted]
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ------------------- Workers -------------------
+def _init_worker(detector_spec, embedder_spec, check_quality, cache_dir):
+    global _detector, _embedder, _quality, _cache
+    from backends_module import create_detector, create_embedder
+    from quality_module import QualityScorer
+    _detector = create_detector(detector_spec)
+    _embedder = create_embedder(embedder_spec)
+    _quality = QualityScorer() if check_quality else None
+    _cache = EmbeddingCache(cache_dir) if cache_dir else None
+
+
+def _frame_key(frame):
+    """Same key FaceRecognitionModule.embed_frame caches whole images under."""
+    return content_key(frame, "frame", _embedder.name, _detector.name)
+
+
+def _content_keys(paths):
+    """Content keys of already enrolled images. Returns [(path, key or None)]."""
+    keys = []
+    for path in paths:
+        frame = cv2.imread(path)
+        keys.append((path, _frame_key(frame) if frame is not None else None))
+    return keys
+
+
+def _process_chunk(items):
+    """
+    Decode, detect, quality-check and embed one chunk of (source, name, target) in a worker.
+    Returns [(source, name, target, content key, embedding or None, status)].
+    """
+    results, decoded = [], []
+    for source, name, target in items:
+        frame = cv2.imread(source)
+        if frame is None:
+            results.append((source, name, target, None, None, "unreadable"))
+        else:
+            decoded.append(((source, name, target), frame, _frame_key(frame)))
+
+    cached = _cache.get_many([key for item, frame, key in decoded]) if _cache is not None else {}
+    faces, accepted = [], []
+    for item, frame, key in decoded:
+        if key in cached:
+            results.append(item + (key, cached[key], "ok"))
+            continue
+        try:
+            detections = _detector.detect(frame)
+        except Exception as e:
+            results.append(item + (key, None, f"detection error: {e}"))
+            continue
+        if len(detections) == 0:
+            results.append(item + (key, None, "no face"))
+            continue
+        box, face = max(detections, key=lambda d: d[0][2] * d[0][3])  # the subject, not a bystander
+        if _quality is not None and not _quality.is_good(face):
+            results.append(item + (key, None, "low quality"))
+            continue
+        faces.append(face)
+        accepted.append((item, key))
+
+    if faces:
+        try:
+            embeddings = _embedder.embed(faces)
+        except Exception as e:
+            return results + [item + (key, None, f"embedding error: {e}") for item, key in accepted]
+        embeddings = [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+        if _cache is not None:
+            _cache.put_many({key: embedding for (item, key), embedding in zip(accepted, embeddings)})
+        for (item, key), embedding in zip(accepted, embeddings):
+            results.append(item + (key, embedding, "ok"))
+    return results
+
+
+# ------------------- Main -------------------
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-enroll a folder of face photos")
+    parser.add_argument("folder", nargs="?", default="faces_to_add", help="Folder of photos (sub-folders = person names)")
+    parser.add_argument("--database", default="faces_database", help="Face database folder")
+    parser.add_argument("--backend", help="Detector+embedder spec (see backends_module), default DeepFace VGG-Face")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--chunk-size", type=int, default=32, help="Photos per task (one embedding forward pass)")
+    parser.add_argument("--no-quality-check", action="store_true", help="Enroll blurry, small or badly lit faces too")
+    parser.add_argument("--duplicate-distance", type=float,
+                        help="Flag faces this close to another person's (default: the match threshold)")
+    parser.add_argument("--near-duplicate-distance", type=float,
+                        help="Flag faces this close to a photo the same person already has "
+                             f"(default: {NEAR_DUPLICATE_FRACTION} x the match threshold)")
+    parser.add_argument("--allow-duplicates", action="store_true", help="Enroll flagged faces anyway")
+    parser.add_argument("--cache-dir", default=EMBEDDING_CACHE_DIR, help="Shared embedding cache ('' to disable)")
+    parser.add_argument("--report", help="CSV file with the outcome of every photo")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        print(f"Folder '{args.folder}' does not exist. Create it and put face images there.")
+        return
+
+    if args.backend:
+        detector_spec, _, embedder_spec = args.backend.partition("+")
+        if not embedder_spec:
+            parser.error(f"--backend must be 'detector+embedder', got: {args.backend}")
+    else:
+        detector_spec, embedder_spec = "deepface:opencv", f"deepface:{DEFAULT_MODEL}"
+    face_recog = FaceRecognitionModule(database_path=args.database, detector=detector_spec, embedder=embedder_spec,
+                                       cache_dir=args.cache_dir or None)
+    gallery = face_recog.gallery
+    max_distance = face_recog.match_threshold if args.duplicate_distance is None else args.duplicate_distance
+    near_distance = (NEAR_DUPLICATE_FRACTION * face_recog.match_threshold
+                     if args.near_duplicate_distance is None else args.near_duplicate_distance)
+
+    plan, skipped = plan_imports(args.folder, args.database, set(gallery.labels[gallery.active].tolist()))
+    outcomes = [(source, name, target, "skipped", reason) for source, name, target, reason in skipped]
+    print(f"{len(plan)} photos to import, {len(skipped)} file names already in the database")
+    if not plan:
+        return
+
+    counts = {"enrolled": 0, "skipped": len(skipped), "duplicate": 0, "rejected": 0}
+    processed = 0
+    started = time.time()
+    ctx = multiprocessing.get_context("spawn")  # TensorFlow is not fork-safe
+    try:
+        with ctx.Pool(args.workers, initializer=_init_worker,
+                      initargs=(detector_spec, embedder_spec, not args.no_quality_check, args.cache_dir or None)) as pool:
+            # Content keys of the photos the imported people already have
+            known = {}  # content key -> database file (or source photo earlier in this import)
+            existing = enrolled_files(gallery, args.database, {name for source, name, target in plan})
+            for keys in pool.imap_unordered(_content_keys, chunks(existing, args.chunk_size)):
+                known.update((key, os.path.basename(path)) for path, key in keys if key is not None)
+
+            for results in pool.imap_unordered(_process_chunk, chunks(plan, args.chunk_size)):
+                processed += len(results)
+                ok = []
+                for source, name, target, key, embedding, status in results:
+                    if key is not None and key in known:
+                        counts["skipped"] += 1
+                        outcomes.append((source, name, target, "skipped", f"same image as {known[key]}"))
+                        continue
+                    if key is not None:
+                        known[key] = source
+                    if embedding is None:
+                        counts["rejected"] += 1
+                        outcomes.append((source, name, target, "rejected", status))
+                    else:
+                        ok.append((source, name, target, embedding))
+
+                conflicts = [None] * len(ok)
+                if ok and not args.allow_duplicates:
+                    conflicts = gallery.find_conflicts(np.stack([r[3] for r in ok]), [r[1] for r in ok],
+                                                       max_distance, near_distance)
+
+                names, embeddings, files = [], [], []
+                for (source, name, target, embedding), conflict in zip(ok, conflicts):
+                    if conflict is not None:
+                        other, other_file, distance = conflict
+                        counts["duplicate"] += 1
+                        kind = "near-copy of" if other == name else "looks like"
+                        detail = f"{kind} {other} ({other_file or 'same chunk'}), distance {max(0.0, distance):.3f}"
+                        outcomes.append((source, name, target, "duplicate", detail))
+                        print(f"Flagged {source}: {detail}")
+                        continue
+                    try:
+                        shutil.copyfile(source, os.path.join(args.database, target))
+                    except OSError as e:
+                        counts["rejected"] += 1
+                        outcomes.append((source, name, target, "rejected", f"copy error: {e}"))
+                        continue
+                    names.append(name)
+                    embeddings.append(embedding)
+                    files.append(target)
+                    outcomes.append((source, name, target, "enrolled", ""))
+                if names:
+                    face_recog.add_embeddings(names, np.stack(embeddings), files, save=False)
+                    counts["enrolled"] += len(names)
+
+                elapsed = time.time() - started
+                rate = processed / max(elapsed, 1e-6)
+                print(f"{processed}/{len(plan)} photos | {counts['enrolled']} enrolled, "
+                      f"{counts['skipped']} skipped, {counts['duplicate']} flagged, {counts['rejected']} rejected | "
+                      f"{rate:.1f} photos/s, ETA {(len(plan) - processed) / max(rate, 1e-6):.0f}s")
+    finally:
+        # Copied files and gallery rows go out together, also when interrupted
+        if counts["enrolled"]:
+            face_recog.save_gallery()
+
+    if args.report:
+        with open(args.report, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["source", "name", "file", "status", "detail"])
+            writer.writerows(outcomes)
+    elapsed = time.time() - started
+    print(f"Finished: {counts['enrolled']} enrolled, {counts['skipped']} already enrolled, "
+          f"{counts['duplicate']} flagged as duplicates, {counts['rejected']} rejected in {elapsed:.1f}s "
+          f"({processed / max(elapsed, 1e-6):.1f} photos/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,557 @@
+# index_module.py
+
+import heapq
+import math
+import os
+import tempfile
+import numpy as np
+
+try:
+    import hnswlib  # optional native HNSW (pip install hnswlib), used for "hnsw" when installed
+except ImportError:
+    hnswlib = None
+
+# All indexes work on L2-normalised float32 vectors and rank by inner product
+# (cosine similarity). They never copy the vectors themselves: the gallery owns
+# the embedding matrix and passes it in, the index only keeps its own structure
+# (tombstones, inverted lists, graph links) keyed by stable integer ids, where
+# an id is the row of the vector in the gallery matrix.
+
+
+def _top_k(similarities, k):
+    """Row-wise top-k of a (queries, candidates) similarity matrix, best first."""
+    k = min(k, similarities.shape[1])
+    if k == 1:
+        best = np.argmax(similarities, axis=1)[:, None]
+    else:
+        best = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(similarities, best, axis=1), axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+    return best, np.take_along_axis(similarities, best, axis=1)
+
+
+def _empty_result(num_queries, k):
+    return np.full((num_queries, k), -1, dtype=np.int64), np.full((num_queries, k), -np.inf, dtype=np.float32)
+
+
+def _grow(array, size, fill):
+    if len(array) >= size:
+        return array
+    grown = np.full(max(size, 2 * len(array)), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class FlatIndex:
+    """Exact brute-force search: one matrix product over every live vector."""
+
+    index_type = "flat"
+
+    def __init__(self):
+        self.present = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return int(self.present.sum())
+
+    def params(self):
+        return {}
+
+    def add(self, vectors, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        self.present = _grow(self.present, int(ids.max()) + 1, False)
+        self.present[ids] = True
+
+    def remove(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.present[ids[ids < len(self.present)]] = False
+
+    def search(self, vectors, queries, k=1):
+        """Return (ids, similarities), each of shape (queries, k). Missing results are -1 / -inf."""
+        queries = np.atleast_2d(queries)
+        n = min(len(vectors), len(self.present))
+        if n == 0 or not self.present[:n].any():
+            return _empty_result(len(queries), k)
+
+        similarities = queries @ vectors[:n].T
+        similarities[:, ~self.present[:n]] = -np.inf
+        ids, sims = _top_k(similarities, k)
+        ids = ids.astype(np.int64)
+        ids[~np.isfinite(sims)] = -1
+        return _pad(ids, sims, k)
+
+    def state(self):
+        return {"present": self.present}
+
+    @classmethod
+    def from_state(cls, data, params):
+        index = cls(**params)
+        index.present = data["present"].astype(bool)
+        return index
+
+
+def _pad(ids, sims, k):
+    if ids.shape[1] == k:
+        return ids, sims.astype(np.float32)
+    pad_ids, pad_sims = _empty_result(len(ids), k)
+    pad_ids[:, :ids.shape[1]] = ids
+    pad_sims[:, :sims.shape[1]] = sims
+    return pad_ids, pad_sims
+
+
+class IVFIndex:
+    """
+    Inverted-file index: vectors are partitioned by spherical k-means into nlist
+    cells and a query only scans the nprobe cells whose centroids are closest.
+    Until enough vectors exist to train the quantizer it behaves like a flat index.
+    """
+
+    index_type = "ivf"
+
+    def __init__(self, nlist=256, nprobe=8, min_train_per_list=39, max_train_per_list=256,
+                 kmeans_iters=20, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_per_list = min_train_per_list
+        self.max_train_per_list = max_train_per_list
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.present = np.zeros(0, dtype=bool)
+        self.assignments = np.zeros(0, dtype=np.int32)  # cell of each id, -1 if unassigned
+        self.centroids = None
+        self._lists = []
+        self._list_arrays = {}
+
+    def __len__(self):
+        return int(self.present.sum())
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def params(self):
+        return {"nlist": self.nlist, "nprobe": self.nprobe,
+                "min_train_per_list": self.min_train_per_list,
+                "max_train_per_list": self.max_train_per_list,
+                "kmeans_iters": self.kmeans_iters, "seed": self.seed}
+
+    # ---------------- Training ----------------
+    def _assign(self, vectors, chunk=16384):
+        cells = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk):
+            cells[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ self.centroids.T, axis=1)
+        return cells
+
+    def train(self, vectors):
+        """Fit the coarse quantizer on the live vectors and reassign every id."""
+        live = np.flatnonzero(self.present[:len(vectors)])
+        nlist = min(self.nlist, len(live))
+        if nlist == 0:
+            return
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(live), nlist * self.max_train_per_list)
+        sample = vectors[np.sort(rng.choice(live, sample_size, replace=False))]
+
+        self.centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            cells = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, cells, sample)
+            counts = np.bincount(cells, minlength=nlist)
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.centroids = (sums / norms).astype(np.float32)
+
+        self.assignments = np.full(len(self.present), -1, dtype=np.int32)
+        self.assignments[live] = self._assign(vectors[live])
+        self._rebuild_lists()
+
+    def _rebuild_lists(self):
+        self._lists = [[] for _ in range(0 if self.centroids is None else len(self.centroids))]
+        for idx in np.flatnonzero((self.assignments >= 0) & self.present[:len(self.assignments)]):
+            self._lists[self.assignments[idx]].append(int(idx))
+        self._list_arrays = {}
+
+    # ---------------- Updates ----------------
+    def add(self, vectors, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        size = int(ids.max()) + 1
+        self.present = _grow(self.present, size, False)
+        self.assignments = _grow(self.assignments, size, -1)
+        self.present[ids] = True
+
+        if not self.is_trained:
+            if len(self) >= self.nlist * self.min_train_per_list:
+                self.train(vectors)
+            return
+
+        cells = self._assign(vectors[ids])
+        self.assignments[ids] = cells
+        for idx, cell in zip(ids.tolist(), cells.tolist()):
+            self._lists[cell].append(idx)
+            self._list_arrays.pop(cell, None)
+
+    def remove(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[ids < len(self.present)]
+        self.present[ids] = False
+        if self.is_trained:
+            for idx in ids.tolist():
+                cell = self.assignments[idx]
+                if cell >= 0:
+                    self._lists[cell].remove(idx)
+                    self._list_arrays.pop(int(cell), None)
+                    self.assignments[idx] = -1
+
+    # ---------------- Search ----------------
+    def _list_array(self, cell):
+        array = self._list_arrays.get(cell)
+        if array is None:
+            array = np.asarray(self._lists[cell], dtype=np.int64)
+            self._list_arrays[cell] = array
+        return array
+
+    def search(self, vectors, queries, k=1):
+        queries = np.atleast_2d(queries)
+        if not self.is_trained:
+            return FlatIndex.search(self, vectors, queries, k)
+
+        ids, sims = _empty_result(len(queries), k)
+        nprobe = min(self.nprobe, len(self.centroids))
+        centroid_sims = queries @ self.centroids.T
+        probes, _ = _top_k(centroid_sims, nprobe)
+        for row, query in enumerate(queries):
+            candidates = np.concatenate([self._list_array(int(c)) for c in probes[row]])
+            if len(candidates) == 0:
+                continue
+            cand_sims = vectors[candidates] @ query
+            best, best_sims = _top_k(cand_sims[None, :], k)
+            ids[row, :best.shape[1]] = candidates[best[0]]
+            sims[row, :best.shape[1]] = best_sims[0]
+        return ids, sims
+
+    def state(self):
+        state = {"present": self.present, "assignments": self.assignments}
+        if self.is_trained:
+            state["centroids"] = self.centroids
+        return state
+
+    @classmethod
+    def from_state(cls, data, params):
+        index = cls(**params)
+        index.present = data["present"].astype(bool)
+        index.assignments = data["assignments"].astype(np.int32)
+        if "centroids" in data:
+            index.centroids = data["centroids"].astype(np.float32)
+            index._rebuild_lists()
+        return index
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small-world graph. Each vector is linked to its M
+    nearest neighbours (2*M on the bottom layer) on a random number of layers;
+    a query greedily descends the layers and does a beam search of width
+    ef_search on the bottom one. Deletions are tombstones: removed nodes are
+    still used for navigation but never returned.
+
+    Pure-Python fallback for when hnswlib is not installed (see HnswlibIndex):
+    every visited node costs interpreter work, so at 512-d a build takes 1-2 ms
+    per vector (90 s for 50k) and a query 0.6-0.9 ms. It only beats the flat
+    index for single queries above roughly 10-20k vectors (benchmark_index.py
+    --single); install hnswlib for large galleries.
+    """
+
+    index_type = "hnsw"
+
+    def __init__(self, M=16, ef_construction=100, ef_search=50, seed=0):
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.seed = seed
+        self.level_mult = 1.0 / math.log(max(M, 2))
+        self.rng = np.random.default_rng(seed)
+        self.present = np.zeros(0, dtype=bool)
+        self.levels = np.zeros(0, dtype=np.int8)  # top layer of each node, -1 if not inserted
+        self.links = []  # one dict per layer: node -> list of neighbour ids
+        self.entry_point = -1
+        self.max_level = -1
+
+    def __len__(self):
+        return int(self.present.sum())
+
+    def params(self):
+        return {"M": self.M, "ef_construction": self.ef_construction,
+                "ef_search": self.ef_search, "seed": self.seed}
+
+    def _search_layer(self, vectors, query, entry_points, ef, level):
+        """Beam search on one layer. Returns a min-heap of (similarity, id) of size <= ef."""
+        visited = set(entry_points)
+        entry_sims = (vectors[entry_points] @ query).tolist()
+        candidates = [(-s, e) for s, e in zip(entry_sims, entry_points)]
+        heapq.heapify(candidates)
+        results = [(s, e) for s, e in zip(entry_sims, entry_points)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        layer = self.links[level]
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if -neg_sim < results[0][0] and len(results) >= ef:
+                break
+            neighbours = [n for n in layer.get(node, ()) if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            for sim, n in zip((vectors[neighbours] @ query).tolist(), neighbours):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, n))
+                    heapq.heappush(results, (sim, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return results
+
+    def _insert(self, vectors, node):
+        level = min(int(-math.log(1.0 - self.rng.random()) * self.level_mult), 127)
+        self.levels[node] = level
+        while len(self.links) <= level:
+            self.links.append({})
+        for layer in range(level + 1):
+            self.links[layer][node] = []
+
+        if self.entry_point < 0:
+            self.entry_point, self.max_level = node, level
+            return
+
+        query = vectors[node]
+        entry_points = [self.entry_point]
+        for layer in range(self.max_level, level, -1):
+            entry_points = [max(self._search_layer(vectors, query, entry_points, 1, layer))[1]]
+
+        for layer in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(vectors, query, entry_points, self.ef_construction, layer)
+            max_links = self.M0 if layer == 0 else self.M
+            neighbours = [n for s, n in heapq.nlargest(max_links, found) if n != node]
+            self.links[layer][node] = neighbours
+            for n in neighbours:
+                links = self.links[layer][n]
+                links.append(node)
+                if len(links) > max_links:
+                    sims = vectors[links] @ vectors[n]
+                    keep = np.argsort(-sims)[:max_links]
+                    self.links[layer][n] = [links[i] for i in keep]
+            entry_points = [n for s, n in found]
+
+        if level > self.max_level:
+            self.entry_point, self.max_level = node, level
+
+    def add(self, vectors, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        size = int(ids.max()) + 1
+        self.present = _grow(self.present, size, False)
+        self.levels = _grow(self.levels, size, -1)
+        for node in ids.tolist():
+            if self.levels[node] >= 0:
+                # Re-adding a tombstoned id: its links are still in the graph
+                self.present[node] = True
+                continue
+            self._insert(vectors, node)
+            self.present[node] = True
+
+    def remove(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.present[ids[ids < len(self.present)]] = False
+
+    def search(self, vectors, queries, k=1):
+        queries = np.atleast_2d(queries)
+        ids, sims = _empty_result(len(queries), k)
+        if self.entry_point < 0:
+            return ids, sims
+
+        ef = max(self.ef_search, k)
+        for row, query in enumerate(queries):
+            entry_points = [self.entry_point]
+            for layer in range(self.max_level, 0, -1):
+                entry_points = [max(self._search_layer(vectors, query, entry_points, 1, layer))[1]]
+            found = self._search_layer(vectors, query, entry_points, ef, 0)
+            live = [(s, n) for s, n in heapq.nlargest(len(found), found) if self.present[n]][:k]
+            for col, (sim, node) in enumerate(live):
+                ids[row, col] = node
+                sims[row, col] = sim
+        return ids, sims
+
+    def state(self):
+        nodes, layers, neighbours = [], [], []
+        for layer, links in enumerate(self.links):
+            for node, node_links in links.items():
+                nodes.extend([node] * len(node_links))
+                layers.extend([layer] * len(node_links))
+                neighbours.extend(node_links)
+        return {"present": self.present, "levels": self.levels,
+                "edge_node": np.asarray(nodes, dtype=np.int64),
+                "edge_layer": np.asarray(layers, dtype=np.int16),
+                "edge_neighbour": np.asarray(neighbours, dtype=np.int64),
+                "entry": np.array([self.entry_point, self.max_level], dtype=np.int64)}
+
+    @classmethod
+    def from_state(cls, data, params):
+        index = cls(**params)
+        index.present = data["present"].astype(bool)
+        index.levels = data["levels"].astype(np.int8)
+        index.entry_point, index.max_level = (int(v) for v in data["entry"])
+        index.links = [{} for _ in range(index.max_level + 1)]
+        for node in np.flatnonzero(index.levels >= 0).tolist():
+            for layer in range(int(index.levels[node]) + 1):
+                index.links[layer][node] = []
+        for node, layer, n in zip(data["edge_node"].tolist(), data["edge_layer"].tolist(),
+                                  data["edge_neighbour"].tolist()):
+            index.links[layer][node].append(n)
+        # Continue the level sequence rather than replaying the original one
+        index.rng = np.random.default_rng([index.seed, len(index.levels)])
+        return index
+
+
+class HnswlibIndex:
+    """
+    HNSWIndex backed by hnswlib's C++ graph, with the same parameters and ids.
+    Used for "hnsw" when hnswlib is installed. Unlike the other indexes it keeps
+    its own copy of the vectors (hnswlib owns its storage). Removed ids are
+    marked deleted in the graph; adding them again restores them with the
+    vector passed in.
+    """
+
+    index_type = "hnsw"
+
+    def __init__(self, M=16, ef_construction=100, ef_search=50, seed=0):
+        if hnswlib is None:
+            raise ImportError("HnswlibIndex needs hnswlib: pip install hnswlib")
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.seed = seed
+        self.present = np.zeros(0, dtype=bool)
+        self.inserted = np.zeros(0, dtype=bool)  # ids in the graph, live or marked deleted
+        self._graph = None
+
+    def __len__(self):
+        return int(self.present.sum())
+
+    def params(self):
+        return {"M": self.M, "ef_construction": self.ef_construction,
+                "ef_search": self.ef_search, "seed": self.seed}
+
+    def _reserve(self, dim, count):
+        if self._graph is None:
+            self._graph = hnswlib.Index(space="ip", dim=dim)  # distance = 1 - inner product
+            self._graph.init_index(max_elements=max(count, 1024), ef_construction=self.ef_construction,
+                                   M=self.M, random_seed=self.seed)
+        elif count > self._graph.get_max_elements():
+            self._graph.resize_index(max(count, 2 * self._graph.get_max_elements()))
+
+    def add(self, vectors, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        size = int(ids.max()) + 1
+        self.present = _grow(self.present, size, False)
+        self.inserted = _grow(self.inserted, size, False)
+        self._reserve(vectors.shape[1], int(self.inserted.sum() + np.sum(~self.inserted[ids])))
+        # An id already in the graph is un-deleted and gets the current vector
+        self._graph.add_items(np.ascontiguousarray(vectors[ids], dtype=np.float32), ids)
+        self.inserted[ids] = True
+        self.present[ids] = True
+
+    def remove(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[ids < len(self.present)]
+        for node in ids[self.present[ids]].tolist():
+            self._graph.mark_deleted(node)
+        self.present[ids] = False
+
+    def search(self, vectors, queries, k=1):
+        queries = np.atleast_2d(queries)
+        ids, sims = _empty_result(len(queries), k)
+        live = min(k, len(self))
+        if live == 0:
+            return ids, sims
+        self._graph.set_ef(max(self.ef_search, live))
+        labels, distances = self._graph.knn_query(np.ascontiguousarray(queries, dtype=np.float32), k=live)
+        ids[:, :live] = labels
+        sims[:, :live] = 1.0 - distances
+        return ids, sims
+
+    def state(self):
+        state = {"present": self.present, "inserted": self.inserted}
+        if self._graph is not None:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "graph.bin")
+                self._graph.save_index(path)
+                state["graph"] = np.fromfile(path, dtype=np.uint8)
+            state["dim"] = np.array(self._graph.dim)
+        return state
+
+    @classmethod
+    def from_state(cls, data, params):
+        index = cls(**params)
+        index.present = data["present"].astype(bool)
+        index.inserted = data["inserted"].astype(bool)  # KeyError for a pure-Python graph: rebuilt by the caller
+        if "graph" in data:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "graph.bin")
+                data["graph"].tofile(path)
+                index._graph = hnswlib.Index(space="ip", dim=int(data["dim"]))
+                index._graph.load_index(path)
+        return index
+
+
+# Parameters that only affect queries and can be changed on a built index
+SEARCH_PARAMS = ("nprobe", "ef_search")
+
+INDEX_TYPES = {
+    "flat": FlatIndex,
+    "ivf": IVFIndex,
+    "hnsw": HnswlibIndex if hnswlib is not None else HNSWIndex,
+}
+
+
+def create_index(index_type="flat", **params):
+    """Create an empty index of the given type ("flat", "ivf" or "hnsw")."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported index type: {index_type}")
+    return INDEX_TYPES[index_type](**params)
+
+
+def save_index(index, path, generation=""):
+    """
+    Write an index structure to an .npz file (atomically replaces any previous file).
+    generation: tag of the gallery file the index belongs to, checked by the loader.
+    """
+    params = index.params()
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, index_type=np.array(index.index_type),
+             param_names=np.array(list(params.keys()), dtype=str),
+             param_values=np.array(list(params.values()), dtype=np.float64),
+             generation=np.array(generation),
+             **index.state())
+    os.replace(tmp_path, path)
+
+
+def load_index(path):
+    """Load an index written with save_index(). Returns (index, generation)."""
+    with np.load(path, allow_pickle=False) as data:
+        index_type = str(data["index_type"])
+        generation = str(data["generation"]) if "generation" in data.files else ""
+        params = {}
+        for name, value in zip(data["param_names"].tolist(), data["param_values"].tolist()):
+            params[name] = int(value) if float(value).is_integer() else value
+        state = {key: data[key] for key in data.files}
+    return INDEX_TYPES[index_type].from_state(state, params), generation
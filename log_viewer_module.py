@@ -0,0 +1,215 @@
+# log_viewer_module.py
+
+import queue
+import threading
+import tkinter as tk
+from datetime import datetime, timedelta
+from tkinter import messagebox
+from tkinter import ttk
+
+from database_module import RecognitionLog
+
+PAGE_SIZE = 50
+DEFAULT_DAYS = 7  # the viewer opens on the last week; clear "From" to see everything
+
+
+class LogViewer:
+    """
+    Paginated recognition log window. Only the rows of the visible page are
+    fetched and put in the Treeview, so it stays responsive on huge logs.
+    Has two tabs: raw recognitions and per-day first-in/last-out attendance.
+    Queries run on a worker thread; their results are handed back to the Tk
+    thread through a queue polled with after().
+    """
+
+    def __init__(self, parent, db_file="recognized_faces.db", page_size=PAGE_SIZE, days=DEFAULT_DAYS):
+        self.log = RecognitionLog(db_file)
+        self.page_size = page_size
+        self.rows = []
+        self.attendance_rows = []
+        self._results = queue.Queue()
+        self._latest = {}  # query kind -> sequence number of the request whose result is wanted
+        self._sequence = 0
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Recognition Logs")
+
+        # ---------------- Filters ----------------
+        filters = tk.Frame(self.window)
+        filters.pack(fill=tk.X, padx=10, pady=5)
+
+        tk.Label(filters, text="Name:").pack(side=tk.LEFT)
+        self.name_var = tk.StringVar()
+        self.name_box = ttk.Combobox(filters, textvariable=self.name_var, width=18)
+        self.name_box.pack(side=tk.LEFT, padx=5)
+
+        tk.Label(filters, text="From (YYYY-MM-DD):").pack(side=tk.LEFT)
+        start = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d") if days else ""
+        self.start_var = tk.StringVar(value=start)
+        tk.Entry(filters, textvariable=self.start_var, width=12).pack(side=tk.LEFT, padx=5)
+
+        tk.Label(filters, text="To:").pack(side=tk.LEFT)
+        self.end_var = tk.StringVar()
+        tk.Entry(filters, textvariable=self.end_var, width=12).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(filters, text="Apply", command=self.refresh).pack(side=tk.LEFT, padx=5)
+
+        # ---------------- Tabs ----------------
+        notebook = ttk.Notebook(self.window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        log_tab = tk.Frame(notebook)
+        notebook.add(log_tab, text="Recognitions")
+        self.log_tree = self._make_tree(log_tab, ("Name", "Date", "Time"))
+        self.log_status = self._make_pager(log_tab, self.first_page, self.prev_page,
+                                           self.next_page, self.last_page)
+
+        attendance_tab = tk.Frame(notebook)
+        notebook.add(attendance_tab, text="Attendance")
+        self.attendance_tree = self._make_tree(attendance_tab, ("Date", "Name", "First In", "Last Out", "Sightings"))
+        self.attendance_status = self._make_pager(attendance_tab, self.first_attendance, self.prev_attendance,
+                                                  self.next_attendance, None)
+
+        self._query("names", self.log.names, self._show_names)
+        self.refresh()
+        self._poll()
+
+    # ---------------- Widgets ----------------
+    def _make_tree(self, parent, columns):
+        tree = ttk.Treeview(parent, columns=columns, show="headings", height=self.page_size // 2)
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=120)
+        tree.pack(fill=tk.BOTH, expand=True)
+        return tree
+
+    def _make_pager(self, parent, first, prev, next_, last):
+        pager = tk.Frame(parent)
+        pager.pack(fill=tk.X, pady=5)
+        tk.Button(pager, text="<< Newest", command=first).pack(side=tk.LEFT)
+        tk.Button(pager, text="< Newer", command=prev).pack(side=tk.LEFT, padx=5)
+        tk.Button(pager, text="Older >", command=next_).pack(side=tk.LEFT)
+        if last is not None:
+            tk.Button(pager, text="Oldest >>", command=last).pack(side=tk.LEFT, padx=5)
+        status = tk.StringVar()
+        tk.Label(pager, textvariable=status, fg="gray").pack(side=tk.RIGHT)
+        return status
+
+    def _filters(self):
+        return {
+            "name": self.name_var.get().strip() or None,
+            "start": self.start_var.get().strip() or None,
+            "end": self.end_var.get().strip() or None,
+        }
+
+    # ---------------- Background Queries ----------------
+    def _query(self, kind, fn, callback, **kwargs):
+        """
+        Run fn(**kwargs) on a worker thread; callback(result) runs on the Tk thread.
+        Only the newest request of each kind is shown, so fast paging never shows stale pages.
+        """
+        self._sequence += 1
+        sequence = self._latest[kind] = self._sequence
+
+        def work():
+            try:
+                result, error = fn(**kwargs), None
+            except Exception as e:
+                result, error = None, e
+            self._results.put((kind, sequence, callback, result, error))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def _poll(self):
+        if not self.window.winfo_exists():
+            return
+        try:
+            while True:
+                kind, sequence, callback, result, error = self._results.get_nowait()
+                if sequence != self._latest.get(kind):
+                    continue  # superseded by a newer request of the same kind
+                if isinstance(error, ValueError):
+                    messagebox.showwarning("Filter Error", "Dates must be in YYYY-MM-DD format.", parent=self.window)
+                elif error is not None:
+                    messagebox.showerror("Log Error", str(error), parent=self.window)
+                else:
+                    callback(result)
+        except queue.Empty:
+            pass
+        self.window.after(30, self._poll)
+
+    def _show_names(self, names):
+        self.name_box["values"] = names
+
+    # ---------------- Recognitions ----------------
+    def _show_rows(self, rows):
+        if not rows and self.rows:
+            return  # already at the first/last page
+        self.rows = rows
+        self.log_tree.delete(*self.log_tree.get_children())
+        for row_id, name, date, time, timestamp in rows:
+            self.log_tree.insert("", tk.END, values=(name, date, time))
+        if rows:
+            self.log_status.set(f"{rows[0][2]} {rows[0][3]}  ...  {rows[-1][2]} {rows[-1][3]}")
+        else:
+            self.log_status.set("No logs found")
+
+    def first_page(self):
+        self._query("log", self.log.page, self._show_rows, limit=self.page_size, **self._filters())
+
+    def next_page(self):
+        if self.rows:
+            last = self.rows[-1]
+            self._query("log", self.log.page, self._show_rows, before=(last[4], last[0]),
+                        limit=self.page_size, **self._filters())
+
+    def prev_page(self):
+        if self.rows:
+            first = self.rows[0]
+            self._query("log", self.log.page, self._show_rows, after=(first[4], first[0]),
+                        limit=self.page_size, **self._filters())
+
+    def last_page(self):
+        self._query("log", self.log.oldest_page, self._show_rows, limit=self.page_size, **self._filters())
+
+    # ---------------- Attendance ----------------
+    def _show_attendance(self, rows):
+        if not rows and self.attendance_rows:
+            return  # already at the first/last page
+        self.attendance_rows = rows
+        self.attendance_tree.delete(*self.attendance_tree.get_children())
+        for row in rows:
+            self.attendance_tree.insert("", tk.END, values=row)
+        if rows:
+            self.attendance_status.set(f"{rows[0][0]} {rows[0][1]}  ...  {rows[-1][0]} {rows[-1][1]}")
+        else:
+            self.attendance_status.set("No attendance found")
+
+    def _attendance_filters(self):
+        filters = self._filters()
+        return {"name": filters["name"], "start_date": filters["start"], "end_date": filters["end"],
+                "limit": self.page_size}
+
+    def first_attendance(self):
+        self._query("attendance", self.log.attendance, self._show_attendance, **self._attendance_filters())
+
+    def prev_attendance(self):
+        if self.attendance_rows:
+            self._query("attendance", self.log.attendance, self._show_attendance,
+                        after=self.attendance_rows[0][:2], **self._attendance_filters())
+
+    def next_attendance(self):
+        if self.attendance_rows:
+            self._query("attendance", self.log.attendance, self._show_attendance,
+                        before=self.attendance_rows[-1][:2], **self._attendance_filters())
+
+    def refresh(self):
+        self.rows = []
+        self.attendance_rows = []
+        self.first_page()
+        self.first_attendance()
+
+
+def open_log_viewer(parent, db_file="recognized_faces.db"):
+    """Open the paginated log viewer as a child window of `parent`."""
+    return LogViewer(parent, db_file)
@@ -0,0 +1,296 @@
+# metrics_module.py
+#
+# Lightweight in-process metrics: counters, gauges and latency histograms for
+# every stage of the recognition path (capture, detect, embed, match, log,
+# render), exposed as an on-screen overlay and a Prometheus text endpoint.
+#
+# Disabled by default. Every call then returns after a single attribute check
+# (timer() hands back a shared no-op context manager), so the instrumentation
+# can stay in the hot loops.
+#
+#   FACE_METRICS=1               collect metrics (and draw the overlay in the GUIs)
+#   FACE_METRICS_PORT=9108       also serve http://127.0.0.1:9108/metrics
+#                                (the next free port is used if it is taken, so
+#                                the service and a GUI can both serve)
+#   FACE_METRICS_SLOW_MS=500     print a line for every stage slower than this
+#
+#   from metrics_module import metrics
+#   with metrics.timer("detect"):
+#       ...
+#   metrics.inc("frames_captured_total")
+
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+# Seconds; covers sub-millisecond matching up to multi-second model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRIC_PREFIX = "face_"
+DEFAULT_PORT = 9108
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Histogram:
+    """Cumulative bucket counts (for Prometheus) plus a window of recent values (for percentiles)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=512):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def percentile(self, q):
+        """q-th percentile (0-100) of the recent values, or 0.0."""
+        values = sorted(self.recent)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))]
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for k, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=False, slow_ms=None, buckets=DEFAULT_BUCKETS):
+        """
+        enabled: Collect metrics; when False every call is a no-op
+        slow_ms: Print a trace line for every observation slower than this
+        """
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.buckets = buckets
+        self.started = time.time()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    # ---------------- Recording ----------------
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        if self.slow_ms is not None and seconds * 1000.0 > self.slow_ms:
+            print(f"Slow {name}{_format_labels(key[1])}: {seconds * 1000.0:.0f} ms "
+                  f"[{threading.current_thread().name}]")
+
+    def timer(self, stage, **labels):
+        """Context manager timing one stage into the stage_seconds histogram."""
+        if not self.enabled:
+            return _NULL_TIMER
+        labels["stage"] = stage
+        return _Timer(self, "stage_seconds", labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+        self.started = time.time()
+
+    # ---------------- Reading ----------------
+    def snapshot(self):
+        """Plain dict of every metric (JSON-serialisable)."""
+        def name_of(key):
+            name, labels = key
+            return name + _format_labels(labels)
+
+        with self._lock:
+            return {
+                "uptime_s": time.time() - self.started,
+                "counters": {name_of(k): v for k, v in sorted(self._counters.items())},
+                "gauges": {name_of(k): v for k, v in sorted(self._gauges.items())},
+                "histograms": {name_of(k): {"count": h.count, "sum": h.sum,
+                                            "p50": h.percentile(50), "p95": h.percentile(95),
+                                            "p99": h.percentile(99)}
+                               for k, h in sorted(self._histograms.items())},
+            }
+
+    def render_prometheus(self, prefix=METRIC_PREFIX):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({name for name, labels in metrics}):
+                    lines.append(f"# TYPE {prefix}{name} {kind}")
+                    for (metric, labels), value in sorted(metrics.items()):
+                        if metric == name:
+                            lines.append(f"{prefix}{name}{_format_labels(labels)} {value}")
+            for name in sorted({name for name, labels in self._histograms}):
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                for (metric, labels), h in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        cumulative += count
+                        lines.append(f"{prefix}{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{prefix}{name}_sum{_format_labels(labels)} {h.sum}")
+                    lines.append(f"{prefix}{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def overlay_lines(self):
+        """Short text lines for the on-screen debug overlay."""
+        with self._lock:
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                counters[name] = counters.get(name, 0) + value  # summed over labels
+            stages = sorted((dict(labels).get("stage", name), h.percentile(50), h.percentile(95))
+                            for (name, labels), h in self._histograms.items())
+        short = (("captured", "frames_captured_total"), ("dropped", "frames_dropped_total"),
+                 ("recognized", "faces_recognized_total"), ("unknown", "faces_unknown_total"),
+                 ("logged", "log_rows_written_total"), ("model", "model_calls_total"))
+        lines = [" ".join(f"{label} {int(counters.get(name, 0))}" for label, name in short)]
+        for stage, p50, p95 in stages:
+            lines.append(f"{stage:<10} p50 {p50 * 1000.0:6.1f}  p95 {p95 * 1000.0:6.1f} ms")
+        return lines
+
+    def draw_overlay(self, frame, origin=(10, 20)):
+        """Draw overlay_lines() onto a BGR frame in place (does nothing when disabled)."""
+        if not self.enabled:
+            return frame
+        x, y = origin
+        lines = self.overlay_lines()
+        width = max(cv2.getTextSize(line, cv2.FONT_HERSHEY_PLAIN, 1.0, 1)[0][0] for line in lines)
+        cv2.rectangle(frame, (x - 4, y - 14), (x + width + 4, y + 16 * (len(lines) - 1) + 6), (0, 0, 0), -1)
+        for i, line in enumerate(lines):
+            cv2.putText(frame, line, (x, y + 16 * i), cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 255, 255), 1)
+        return frame
+
+    # ---------------- HTTP Endpoint ----------------
+    def serve(self, port=DEFAULT_PORT, host="127.0.0.1", attempts=10):
+        """
+        Serve /metrics (Prometheus text) and /metrics.json from a daemon thread.
+        Tries the next ports if `port` is taken. Returns the server, or None.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, content_type = json.dumps(registry.snapshot(), indent=2), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, content_type = registry.render_prometheus(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # no console line per scrape
+
+        for candidate in range(port, port + attempts):
+            try:
+                server = ThreadingHTTPServer((host, candidate), Handler)
+            except OSError:
+                continue
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"Metrics at http://{host}:{candidate}/metrics")
+            return server
+        print(f"Metrics endpoint error: ports {port}-{port + attempts - 1} are in use")
+        return None
+
+    def serve_from_env(self):
+        """Start the endpoint if FACE_METRICS_PORT is set (enables collection too)."""
+        port = os.environ.get("FACE_METRICS_PORT")
+        if not port:
+            return None
+        self.enabled = True
+        return self.serve(int(port))
+
+
+def _env_flag(name):
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no")
+
+
+# Process-wide registry used by every module
+metrics = MetricsRegistry(
+    enabled=_env_flag("FACE_METRICS") or bool(os.environ.get("FACE_METRICS_PORT")),
+    slow_ms=float(os.environ["FACE_METRICS_SLOW_MS"]) if os.environ.get("FACE_METRICS_SLOW_MS") else None,
+)
+
+
+if __name__ == "__main__":
+    # Overhead check: cost per call with metrics disabled and enabled
+    for enabled in (False, True):
+        registry = MetricsRegistry(enabled=enabled)
+        count = 200000
+        start = time.perf_counter()
+        for _ in range(count):
+            with registry.timer("detect"):
+                pass
+            registry.inc("frames_captured_total")
+        elapsed = time.perf_counter() - start
+        print(f"enabled={enabled}: {elapsed / count * 1e9:.0f} ns per timer + counter")
@@ -0,0 +1,101 @@
+# migrate_gallery.py
+#
+# Build faces_database/gallery.fgal from what an older install left behind:
+#   - DeepFace's representation pickle (ds_model_*.pkl) in the database folder
+#   - a gallery.npz written by earlier versions of this project
+#   - any remaining images in the folder, which are embedded (skip with --no-embed)
+#
+#   python migrate_gallery.py --database faces_database
+#
+# Only embeddings of images that still exist in the folder are imported, since
+# the folder is what the gallery is kept in sync with.
+
+import argparse
+import glob
+import os
+import pickle
+import numpy as np
+
+from face_recognition_module import IMAGE_EXTENSIONS, LEGACY_GALLERY_FILE, FaceGallery, gallery_file_name
+from template_module import person_names
+
+
+def read_deepface_pickle(path):
+    """
+    Yield (image file name, embedding) from a DeepFace representations pickle.
+    Handles both the list-of-dicts format and the older list of [identity, embedding] pairs.
+    """
+    with open(path, "rb") as f:
+        representations = pickle.load(f)  # local file written by DeepFace.find
+    for item in representations:
+        if isinstance(item, dict):
+            identity, embedding = item.get("identity"), item.get("embedding")
+        else:
+            identity, embedding = item[0], item[1]
+        if identity is not None and embedding is not None:
+            yield os.path.basename(identity), embedding
+
+
+def read_legacy_gallery(path):
+    """Yield (image file name, label, embedding) for the active rows of a gallery.npz."""
+    with np.load(path, allow_pickle=False) as data:
+        for embedding, label, source, active in zip(data["embeddings"], data["labels"],
+                                                    data["sources"], data["active"]):
+            if active:
+                yield str(source), str(label), embedding
+
+
+def migrate(database_path, model_name="VGG-Face", detector_backend="opencv", embed=True):
+    images = set(f for f in os.listdir(database_path) if f.lower().endswith(IMAGE_EXTENSIONS))
+    gallery = FaceGallery()
+    imported = set()
+    # Rows labelled per file (and DeepFace's pickle) have no person name: derive it from the file name
+    names = person_names(os.path.splitext(f)[0] for f in images)
+
+    legacy_path = os.path.join(database_path, LEGACY_GALLERY_FILE)
+    if os.path.exists(legacy_path):
+        for source, label, embedding in read_legacy_gallery(legacy_path):
+            if source in images and source not in imported:
+                stem = os.path.splitext(source)[0]
+                gallery.add(names[stem] if label == stem else label, embedding, source=source)
+                imported.add(source)
+        print(f"Imported {len(imported)} faces from {legacy_path}")
+
+    model_tag = model_name.lower().replace("-", "")
+    for pickle_path in sorted(glob.glob(os.path.join(database_path, f"ds_model_{model_tag}_*.pkl"))):
+        count = 0
+        try:
+            for source, embedding in read_deepface_pickle(pickle_path):
+                if source in images and source not in imported:
+                    gallery.add(names[os.path.splitext(source)[0]], embedding, source=source)
+                    imported.add(source)
+                    count += 1
+        except Exception as e:
+            print(f"Error reading {pickle_path}:", e)
+        print(f"Imported {count} faces from {pickle_path}")
+
+    gallery_path = os.path.join(database_path, gallery_file_name(model_name))
+    gallery.save(gallery_path, {"model_name": model_name, "detector_backend": f"deepface:{detector_backend}"})
+    print(f"Wrote {len(gallery)} faces to {gallery_path}")
+
+    missing = images - imported
+    if missing and embed:
+        # Loading the module syncs the folder: only the missing images are embedded
+        print(f"Embedding {len(missing)} images that had no stored embedding...")
+        from face_recognition_module import FaceRecognitionModule
+        face_recog = FaceRecognitionModule(database_path=database_path, model_name=model_name,
+                                           detector_backend=detector_backend)
+        print(f"Gallery now has {len(face_recog.gallery)} faces")
+    elif missing:
+        print(f"{len(missing)} images have no embedding yet; they are embedded on the next start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert DeepFace pickles / gallery.npz to gallery.fgal")
+    parser.add_argument("--database", default="faces_database", help="Face database folder")
+    parser.add_argument("--model", default="VGG-Face", help="Model the stored embeddings were made with")
+    parser.add_argument("--detector", default="opencv", help="Detector the stored embeddings were made with")
+    parser.add_argument("--no-embed", action="store_true", help="Do not embed images missing from the pickle")
+    args = parser.parse_args()
+
+    migrate(args.database, args.model, args.detector, embed=not args.no_embed)
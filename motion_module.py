@@ -0,0 +1,124 @@
+# motion_module.py
+#
+# Cheap scene-change gate that runs before face detection.
+#
+# Frames are shrunk to a small grayscale thumbnail and compared with a
+# background model; detection/recognition only runs when enough pixels inside
+# the region of interest changed. An empty doorway then costs a resize and an
+# absdiff per frame instead of a full detector pass.
+
+import time
+import cv2
+import numpy as np
+
+
+def guide_rect(frame_w, frame_h, rect_w=250, rect_h=300):
+    """The centred guide rectangle drawn by the GUIs, as (x, y, w, h)."""
+    return (frame_w // 2 - rect_w // 2, frame_h // 2 - rect_h // 2, rect_w, rect_h)
+
+
+class MotionGate:
+    def __init__(self, method="diff", sensitivity=25, min_changed=0.01, roi=None,
+                 width=160, hold=1.5, keepalive=10.0, learning_rate=0.05):
+        """
+        method: "diff" (difference to a running-average background) or "mog2" (OpenCV background subtractor)
+        sensitivity: Per-pixel change (0-255) that counts as motion for "diff"; lower is more sensitive
+        min_changed: Fraction of the watched pixels that must change to open the gate
+        roi: List of (x, y, w, h) rectangles in frame pixels, or a function (frame_w, frame_h) -> list.
+             None watches the whole frame.
+        width: Frames are downscaled to this width before comparing
+        hold: Keep the gate open this many seconds after the last change (someone standing still)
+        keepalive: Let a frame through at least this often even without change (0 disables)
+        learning_rate: How fast the background absorbs changes
+        """
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"Unsupported motion method: {method}")
+        self.method = method
+        self.sensitivity = sensitivity
+        self.min_changed = min_changed
+        self.roi = roi
+        self.width = width
+        self.hold = hold
+        self.keepalive = keepalive
+        self.learning_rate = learning_rate
+
+        self.frames = 0
+        self.passed = 0
+        self.last_change = 0.0
+        self._last_passed = 0.0
+        self._background = None
+        self._mask = None
+        self._mask_pixels = 0
+        self._frame_shape = None
+        self._subtractor = None
+
+    def _small(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.width / float(w)
+        small = cv2.resize(frame, (self.width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _build_mask(self, frame_shape, small_shape):
+        """ROI mask at thumbnail resolution (None = whole frame)."""
+        self._frame_shape = frame_shape
+        frame_h, frame_w = frame_shape[:2]
+        rects = self.roi(frame_w, frame_h) if callable(self.roi) else self.roi
+        if not rects:
+            self._mask = None
+            self._mask_pixels = small_shape[0] * small_shape[1]
+            return
+        sx, sy = small_shape[1] / frame_w, small_shape[0] / frame_h
+        mask = np.zeros(small_shape, dtype=bool)
+        for x, y, w, h in rects:
+            x1, y1 = max(0, int(x * sx)), max(0, int(y * sy))
+            x2, y2 = int(np.ceil((x + w) * sx)), int(np.ceil((y + h) * sy))
+            mask[y1:y2, x1:x2] = True
+        self._mask = mask
+        self._mask_pixels = max(1, int(mask.sum()))
+
+    def reset(self):
+        """Forget the background (e.g. after the camera was moved)."""
+        self._background = None
+        self._subtractor = None
+
+    def changed(self, frame, now=None):
+        """Return True if the frame should go to detection."""
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        small = self._small(frame)
+        if self._frame_shape != frame.shape:
+            self._build_mask(frame.shape, small.shape)
+            self.reset()
+
+        if self.method == "mog2":
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False)
+            moving = self._subtractor.apply(small, learningRate=self.learning_rate) > 0
+        elif self._background is None:
+            self._background = small.astype(np.float32)
+            moving = None  # first frame: nothing to compare with, let it through
+        else:
+            moving = cv2.absdiff(small, cv2.convertScaleAbs(self._background)) > self.sensitivity
+            cv2.accumulateWeighted(small, self._background, self.learning_rate)
+
+        if moving is None:
+            self.last_change = now
+        else:
+            if self._mask is not None:
+                moving &= self._mask
+            if np.count_nonzero(moving) >= self.min_changed * self._mask_pixels:
+                self.last_change = now
+
+        open_ = now - self.last_change <= self.hold
+        if not open_ and self.keepalive and now - self._last_passed >= self.keepalive:
+            open_ = True
+        if open_:
+            self.passed += 1
+            self._last_passed = now
+        return open_
+
+    def pass_rate(self):
+        """Fraction of frames that were let through."""
+        return self.passed / self.frames if self.frames else 0.0
@@ -0,0 +1,329 @@
+# multi_camera_module.py
+#
+# Multi-source ingestion with one shared inference scheduler.
+#
+#   python multi_camera_module.py 0 1 rtsp://10.0.0.5/stream recordings/door.mp4 --max-fps 5
+#
+# Each source (device index, RTSP/HTTP URL or video file) is read by its own
+# thread that only keeps the newest frame. A single scheduler thread picks the
+# sources that are due (per-camera FPS cap, round-robin for fairness), batches
+# their frames into one detection + embedding pass, and publishes the results
+# per camera. Frames that are never picked, or that are too old by the time
+# they are picked, are shed instead of queued.
+
+import argparse
+import os
+import queue
+import threading
+import time
+import cv2
+
+from cooldown_module import LogCooldown
+from metrics_module import metrics
+from pipeline_module import RateCounter
+
+
+def parse_source(value):
+    """'0' -> camera index 0, anything else is a URL or file path."""
+    return int(value) if value.isdigit() else value
+
+
+class CameraSource:
+    def __init__(self, source_id, uri, max_fps=5.0, width=None, height=None,
+                 realtime=True, drop_frames=True, loop=False, reconnect_delay=2.0, gate=None):
+        """
+        uri: camera index, RTSP/HTTP URL or video file path
+        max_fps: Maximum recognition rate for this camera
+        realtime: For video files, read at the file's own frame rate
+        drop_frames: If False (useful for offline files), wait for each frame to be
+                     processed before reading the next one instead of dropping it
+        loop: Restart video files when they end
+        gate: Optional motion_module.MotionGate; unchanged frames are not handed to the scheduler
+        """
+        self.source_id = source_id
+        self.uri = uri
+        self.max_fps = max_fps
+        self.width = width
+        self.height = height
+        self.is_file = isinstance(uri, str) and os.path.exists(uri)
+        self.realtime = realtime
+        self.drop_frames = drop_frames
+        self.loop = loop
+        self.reconnect_delay = reconnect_delay
+        self.gate = gate
+
+        self.next_due = 0.0
+        self.finished = False
+        self.captured = RateCounter()
+        self.processed = RateCounter()
+        self.shed = 0
+        self.gated = 0
+
+        self._lock = threading.Lock()
+        self._frame = None
+        self._frame_id = 0
+        self._frame_time = 0.0
+        self._taken_id = 0
+        self._consumed = threading.Event()
+        self._consumed.set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.uri)
+        if self.width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return cap
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"source-{self.source_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._consumed.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+
+    def _run(self):
+        cap = self._open()
+        file_fps = cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+        frame_interval = 1.0 / file_fps if file_fps and file_fps > 0 else 0
+        while not self._stop.is_set():
+            if not self.drop_frames:
+                self._consumed.wait()
+                if self._stop.is_set():
+                    break
+
+            started = time.monotonic()
+            ret, frame = cap.read()
+            if not ret:
+                if self.is_file and self.loop:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                if self.is_file:
+                    break
+                print(f"Camera {self.source_id}: no frame, reconnecting...")
+                cap.release()
+                time.sleep(self.reconnect_delay)
+                cap = self._open()
+                continue
+            self.captured.tick()
+            metrics.inc("frames_captured_total", camera=self.source_id)
+
+            if self.gate is not None and not self.gate.changed(frame):
+                self.gated += 1  # static scene, not worth a detection pass
+                metrics.inc("frames_gated_total", camera=self.source_id)
+            else:
+                with self._lock:
+                    if self._frame_id > self._taken_id:
+                        self.shed += 1  # previous frame was never processed
+                        metrics.inc("frames_dropped_total", camera=self.source_id)
+                    self._frame_id += 1
+                    self._frame = frame
+                    self._frame_time = time.monotonic()
+                    self._consumed.clear()
+
+            if self.is_file and self.realtime and frame_interval:
+                time.sleep(max(0.0, frame_interval - (time.monotonic() - started)))
+        cap.release()
+        self.finished = True
+
+    def has_new_frame(self):
+        with self._lock:
+            return self._frame_id > self._taken_id
+
+    def take(self):
+        """Return (frame_id, frame, captured_at) of the newest unprocessed frame and mark it taken."""
+        with self._lock:
+            self._taken_id = self._frame_id
+            return self._frame_id, self._frame, self._frame_time
+
+    def done(self):
+        """Signal that the taken frame has been processed (releases non-dropping readers)."""
+        self._consumed.set()
+
+
+class InferenceScheduler:
+    """
+    Shared scheduler that batches recognition across all sources.
+    face_recog must provide recognize_faces_in_frames(frames).
+    Results are published as (frame_id, [(box, name, distance)]) on each source's
+    queue (see results()) and passed to on_result(source_id, frame_id, faces).
+    """
+
+    def __init__(self, face_recog, sources, batch_size=8, max_frame_age=1.0,
+                 on_result=None, result_queue_size=30):
+        self.face_recog = face_recog
+        self.sources = list(sources)
+        self.batch_size = batch_size
+        self.max_frame_age = max_frame_age
+        self.on_result = on_result
+        self.batches = RateCounter()
+        self.last_batch_time = 0.0
+        self._queues = {s.source_id: queue.Queue(maxsize=result_queue_size) for s in self.sources}
+        self._next_source = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def results(self, source_id):
+        """Queue of (frame_id, faces) results for one camera."""
+        return self._queues[source_id]
+
+    def start(self):
+        for source in self.sources:
+            source.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+        for source in self.sources:
+            source.stop()
+
+    def running(self):
+        return not self._stop.is_set() and not all(s.finished and not s.has_new_frame() for s in self.sources)
+
+    def _pick(self, now):
+        """Round-robin over due sources, at most one frame per source per batch."""
+        picked = []
+        count = len(self.sources)
+        for offset in range(count):
+            source = self.sources[(self._next_source + offset) % count]
+            if now >= source.next_due and source.has_new_frame():
+                picked.append(source)
+                if len(picked) >= self.batch_size:
+                    break
+        if picked:
+            self._next_source = (self.sources.index(picked[-1]) + 1) % count
+        return picked
+
+    def _publish(self, source, frame_id, faces):
+        results = self._queues[source.source_id]
+        while True:
+            try:
+                results.put_nowait((frame_id, faces))
+                break
+            except queue.Full:
+                try:
+                    results.get_nowait()  # consumer is behind: keep the newest results
+                except queue.Empty:
+                    pass
+        if self.on_result is not None:
+            self.on_result(source.source_id, frame_id, faces)
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            picked = self._pick(now)
+            if not picked:
+                if all(s.finished and not s.has_new_frame() for s in self.sources):
+                    break
+                time.sleep(0.005)
+                continue
+
+            batch = []
+            for source in picked:
+                frame_id, frame, captured_at = source.take()
+                if now - captured_at > self.max_frame_age:
+                    source.shed += 1  # too old to be useful, shed it
+                    metrics.inc("frames_dropped_total", camera=source.source_id)
+                    source.done()
+                    continue
+                source.next_due = now + (1.0 / source.max_fps if source.max_fps else 0.0)
+                batch.append((source, frame_id, frame))
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            try:
+                results = self.face_recog.recognize_faces_in_frames([frame for _, _, frame in batch])
+            except Exception as e:
+                print("Scheduler recognition error:", e)
+                results = [[] for _ in batch]
+            self.last_batch_time = time.monotonic() - started
+            metrics.observe("batch_seconds", self.last_batch_time)
+            metrics.set_gauge("batch_size", len(batch))
+            self.batches.tick()
+
+            for (source, frame_id, frame), faces in zip(batch, results):
+                source.processed.tick()
+                source.done()
+                self._publish(source, frame_id, faces)
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "batches_per_s": self.batches.rate(),
+            "last_batch_ms": 1000.0 * self.last_batch_time,
+            "sources": {
+                s.source_id: {
+                    "capture_fps": s.captured.rate(),
+                    "processed_fps": s.processed.rate(),
+                    "shed": s.shed,
+                    "gated": s.gated,
+                    "results_queued": self._queues[s.source_id].qsize(),
+                } for s in self.sources
+            },
+        }
+
+
+class RecognitionLogSink:
+    """
+    on_result callback that feeds the FaceDatabaseLogger with a per-person cooldown.
+    cooldown: cooldown_module.LogCooldown (default: the one shared with the GUIs)
+    """
+
+    def __init__(self, logger, cooldown=None):
+        self.logger = logger
+        self.cooldown = cooldown or LogCooldown()
+
+    def __call__(self, source_id, frame_id, faces):
+        for box, name, distance in faces:
+            if name != "Unknown" and self.cooldown.allow(name):
+                self.logger.log_recognition(name)
+
+
+# ------------------- Headless Runner -------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-camera face recognition")
+    parser.add_argument("sources", nargs="+", help="Camera indices, RTSP/HTTP URLs or video files")
+    parser.add_argument("--max-fps", type=float, default=5.0, help="Recognition FPS cap per camera")
+    parser.add_argument("--batch-size", type=int, default=8, help="Maximum frames per inference batch")
+    parser.add_argument("--max-frame-age", type=float, default=1.0, help="Shed frames older than this (seconds)")
+    parser.add_argument("--offline", action="store_true", help="Process every frame of video files (no dropping)")
+    parser.add_argument("--no-motion-gate", action="store_true", help="Run detection even when the scene is static")
+    args = parser.parse_args()
+
+    from database_module import FaceDatabaseLogger
+    from motion_module import MotionGate
+    from recognition_service import connect_recognizer
+
+    face_recog = connect_recognizer()
+    logger = FaceDatabaseLogger()
+    metrics.serve_from_env()
+    sources = [CameraSource(f"cam{i}", parse_source(uri), max_fps=0 if args.offline else args.max_fps,
+                            realtime=not args.offline, drop_frames=not args.offline,
+                            gate=None if args.offline or args.no_motion_gate else MotionGate())
+               for i, uri in enumerate(args.sources)]
+    scheduler = InferenceScheduler(face_recog, sources, batch_size=args.batch_size,
+                                   max_frame_age=float("inf") if args.offline else args.max_frame_age,
+                                   on_result=RecognitionLogSink(logger))
+    scheduler.start()
+    print("Running. Press Ctrl+C to stop.")
+    try:
+        while scheduler.running():
+            time.sleep(5)
+            print(scheduler.stats())
+    except KeyboardInterrupt:
+        pass
+    scheduler.stop()
+    logger.close()
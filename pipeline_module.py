@@ -0,0 +1,187 @@
+# pipeline_module.py
+
+import queue
+import threading
+import time
+from collections import deque
+
+from metrics_module import metrics
+
+
+class RateCounter:
+    """Thread-safe event counter that also reports events per second over a sliding window."""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self.total = 0
+        self._started = time.monotonic()
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, count=1):
+        now = time.monotonic()
+        with self._lock:
+            self.total += count
+            for _ in range(count):
+                self._times.append(now)
+            self._trim(now)
+
+    def _trim(self, now):
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+    def rate(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            span = min(self.window, now - self._started)
+            return len(self._times) / span if span > 0 else 0.0
+
+
+class RecognitionPipeline:
+    """
+    Runs capture and recognition off the Tk main thread.
+
+    - A capture thread reads frames from `cap` and always keeps the newest one.
+    - A bounded pool of recognition workers runs `recognize_fn(frame)`. The work
+      queue only holds one frame per worker; when recognition falls behind the
+      oldest waiting frame is dropped instead of building a backlog.
+    - The GUI (render stage) polls latest_frame() / latest_result() on its own
+      schedule and overlays the newest result on the newest frame.
+
+    on_result(frame_id, result) is called from the worker thread after every
+    recognition, e.g. for logging.
+
+    gate (optional, see motion_module.MotionGate) is asked on the capture thread
+    whether a frame changed enough to be worth recognizing; unchanged frames are
+    still shown but never reach the workers.
+    """
+
+    def __init__(self, cap, recognize_fn, num_workers=1, on_result=None, gate=None):
+        self.cap = cap
+        self.recognize_fn = recognize_fn
+        self.num_workers = num_workers
+        self.on_result = on_result
+        self.gate = gate
+
+        self._queue = queue.Queue(maxsize=num_workers)
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._frame = None
+        self._frame_id = 0
+        self._result = None
+        self._result_id = -1
+
+        self.captured = RateCounter()
+        self.recognized = RateCounter()
+        self.rendered = RateCounter()
+        self.dropped = 0
+        self.gated = 0
+
+    # ---------------- Lifecycle ----------------
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        for i in range(self.num_workers):
+            self._threads.append(threading.Thread(target=self._worker_loop, name=f"recognition-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # ---------------- Stages ----------------
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            with metrics.timer("capture"):
+                ret, frame = self.cap.read()
+            if not ret:
+                metrics.inc("capture_failures_total")
+                time.sleep(0.01)
+                continue
+
+            with self._lock:
+                self._frame_id += 1
+                frame_id = self._frame_id
+                self._frame = frame
+            self.captured.tick()
+            metrics.inc("frames_captured_total")
+            if self.gate is not None and not self.gate.changed(frame):
+                self.gated += 1  # nothing changed, skip detection
+                metrics.inc("frames_gated_total")
+                continue
+            self._submit(frame_id, frame)
+
+    def _submit(self, frame_id, frame):
+        while True:
+            try:
+                self._queue.put_nowait((frame_id, frame))
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()  # drop the stale frame, keep the newest
+                    with self._lock:
+                        self.dropped += 1
+                    metrics.inc("frames_dropped_total")
+                except queue.Empty:
+                    pass
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                frame_id, frame = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            try:
+                with metrics.timer("recognize"):
+                    result = self.recognize_fn(frame)
+            except Exception as e:
+                metrics.inc("recognition_errors_total")
+                print("Recognition worker error:", e)
+                continue
+
+            with self._lock:
+                if frame_id > self._result_id:
+                    self._result = result
+                    self._result_id = frame_id
+            self.recognized.tick()
+            if self.on_result is not None:
+                self.on_result(frame_id, result)
+
+    # ---------------- Render side ----------------
+    def latest_frame(self):
+        """Return (frame_id, frame) of the newest captured frame, or (0, None)."""
+        with self._lock:
+            return self._frame_id, self._frame
+
+    def latest_result(self):
+        """Return (frame_id, result) of the newest finished recognition, or (-1, None)."""
+        with self._lock:
+            return self._result_id, self._result
+
+    def stats(self):
+        """Per-stage FPS and queue counters."""
+        with self._lock:
+            dropped = self.dropped
+        return {
+            "capture_fps": self.captured.rate(),
+            "recognition_fps": self.recognized.rate(),
+            "render_fps": self.rendered.rate(),
+            "queue_depth": self._queue.qsize(),
+            "frames_captured": self.captured.total,
+            "frames_recognized": self.recognized.total,
+            "frames_dropped": dropped,
+            "frames_gated": self.gated,
+        }
+
+    def stats_text(self):
+        s = self.stats()
+        return (f"Capture {s['capture_fps']:.1f} fps | Recognition {s['recognition_fps']:.1f} fps | "
+                f"Render {s['render_fps']:.1f} fps | Queue {s['queue_depth']} | Dropped {s['frames_dropped']} | "
+                f"Idle {s['frames_gated']}")
@@ -0,0 +1,115 @@
+# quality_module.py
+#
+# Fast face-quality estimate computed on the crop before it is embedded.
+# Every score is in 0-1 (1 = good):
+#   sharpness  variance of the Laplacian on a fixed-size grayscale crop
+#   size       face size relative to a comfortable resolution for the model
+#   exposure   distance of the mean brightness from mid-grey, minus clipped pixels
+#   frontal    left/right mirror symmetry of the face (turned heads are asymmetric)
+
+import cv2
+import numpy as np
+
+QUALITY_SIZE = 112  # crops are resized to this before measuring, so scores do not depend on distance
+
+
+def _to_gray(face):
+    face = np.asarray(face)
+    if face.dtype != np.uint8:
+        face = (np.clip(face, 0, 1) * 255).astype(np.uint8)
+    if face.ndim == 3:
+        face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+    return face
+
+
+def sharpness_score(gray, reference=150.0):
+    """Laplacian variance relative to `reference` (a typical sharp webcam face)."""
+    return float(min(1.0, cv2.Laplacian(gray, cv2.CV_64F).var() / reference))
+
+
+def exposure_score(gray):
+    mean = gray.mean() / 255.0
+    clipped = np.count_nonzero((gray <= 5) | (gray >= 250)) / gray.size
+    return float(np.clip(1.0 - 2.0 * abs(mean - 0.5) - 2.0 * clipped, 0.0, 1.0))
+
+
+def frontal_score(gray):
+    """Correlation between the left half of the face and the mirrored right half."""
+    half = gray.shape[1] // 2
+    left = gray[:, :half].astype(np.float32)
+    right = cv2.flip(gray[:, gray.shape[1] - half:], 1).astype(np.float32)
+    left -= left.mean()
+    right -= right.mean()
+    norm = np.sqrt((left * left).sum() * (right * right).sum())
+    return float(max(0.0, (left * right).sum() / norm)) if norm > 0 else 0.0
+
+
+class QualityScorer:
+    def __init__(self, min_face_size=60, good_face_size=QUALITY_SIZE, min_sharpness=0.25,
+                 min_exposure=0.25, min_frontal=0.35, min_score=0.45):
+        """
+        min_face_size: Faces smaller than this (pixels, shorter side) are rejected
+        good_face_size: Size at which the size score reaches 1
+        min_sharpness / min_exposure / min_frontal: Per-component minimum scores
+        min_score: Minimum mean of all components
+        """
+        self.min_face_size = min_face_size
+        self.good_face_size = good_face_size
+        self.min_sharpness = min_sharpness
+        self.min_exposure = min_exposure
+        self.min_frontal = min_frontal
+        self.min_score = min_score
+
+    def assess(self, image, box=None):
+        """
+        Score a face. image is a face crop, or a whole frame when box (x, y, w, h) is given.
+        Returns a dict with the component scores, the overall score and ok (passes every minimum).
+        """
+        if box is not None:
+            x, y, w, h = box
+            image = image[max(0, y):y + h, max(0, x):x + w]
+        if image is None or getattr(image, "size", 0) == 0:
+            return {"sharpness": 0.0, "size": 0.0, "exposure": 0.0, "frontal": 0.0, "score": 0.0, "ok": False}
+
+        face_size = min(image.shape[:2])
+        gray = cv2.resize(_to_gray(image), (QUALITY_SIZE, QUALITY_SIZE), interpolation=cv2.INTER_AREA)
+        scores = {
+            "sharpness": sharpness_score(gray),
+            "size": float(min(1.0, face_size / self.good_face_size)),
+            "exposure": exposure_score(gray),
+            "frontal": frontal_score(gray),
+        }
+        scores["score"] = sum(scores.values()) / 4.0
+        scores["ok"] = (face_size >= self.min_face_size
+                        and scores["sharpness"] >= self.min_sharpness
+                        and scores["exposure"] >= self.min_exposure
+                        and scores["frontal"] >= self.min_frontal
+                        and scores["score"] >= self.min_score)
+        return scores
+
+    def is_good(self, image, box=None):
+        return self.assess(image, box)["ok"]
+
+    def pick_best(self, frames, boxes, count, min_gap=3):
+        """
+        Choose up to `count` frames of a burst, best quality first.
+        boxes[i] is the face box in frames[i] (or None). Frames closer than min_gap
+        to an already chosen one are skipped so the picks are not near-identical.
+        Returns [(index, scores)].
+        """
+        ranked = []
+        for i, (frame, box) in enumerate(zip(frames, boxes)):
+            if box is None:
+                continue
+            scores = self.assess(frame, box)
+            if scores["ok"]:
+                ranked.append((scores["score"], i, scores))
+        ranked.sort(key=lambda r: r[0], reverse=True)
+
+        picked = []
+        for score, i, scores in ranked:
+            if all(abs(i - j) >= min_gap for j, _ in picked):
+                picked.append((i, scores))
+                if len(picked) >= count:
+                    break
+        return sorted(picked)
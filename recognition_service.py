@@ -0,0 +1,365 @@
+# recognition_service.py
+#
+# A single long-lived process that loads the recognition model and gallery
+# once and serves every GUI / camera script over a local socket.
+#
+#   python recognition_service.py            # start the service
+#
+# Clients use connect_recognizer(), which returns a RecognitionClient with the
+# same methods as FaceRecognitionModule. This module deliberately does not
+# import DeepFace/TensorFlow at the top, so the GUIs start instantly.
+#
+# Requests are pickled, so the socket is guarded by a per-user secret: a random
+# key created on first start in ~/.face_recognition_service.key (mode 0600) and
+# read by both the service and its clients (FACE_SERVICE_AUTHKEY overrides it).
+
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from metrics_module import metrics
+
+SERVICE_HOST = "localhost"
+SERVICE_PORT = int(os.environ.get("FACE_SERVICE_PORT", 6001))
+SERVICE_KEY_FILE = os.environ.get("FACE_SERVICE_KEY_FILE",
+                                  os.path.join(os.path.expanduser("~"), ".face_recognition_service.key"))
+
+# FaceRecognitionModule methods callable by clients
+SERVICE_METHODS = (
+    "recognize_frame",
+    "recognize_frames",
+    "find_matches",
+    "recognize_faces_in_frame",
+    "recognize_faces_in_frames",
+    "detect_faces",
+    "recognize_crops",
+    "enroll_face",
+    "person_exists",
+    "remove_person",
+    "reenroll_person",
+)
+
+
+# ------------------- Authentication -------------------
+def service_authkey(path=SERVICE_KEY_FILE):
+    """
+    Secret shared by this user's service and clients: FACE_SERVICE_AUTHKEY if set,
+    else the key in `path`, which is created with a random key (mode 0600) on first use.
+    """
+    if os.environ.get("FACE_SERVICE_AUTHKEY"):
+        return os.environ["FACE_SERVICE_AUTHKEY"].encode()
+    for attempt in range(50):
+        try:
+            with open(path, "rb") as f:
+                key = f.read().strip()
+            if key:
+                if os.name == "posix" and os.stat(path).st_mode & 0o077:
+                    os.chmod(path, 0o600)  # readable by others: anyone with the key can run code in the service
+                return key
+        except FileNotFoundError:
+            # Write the key to a private temporary file and link it into place, so two
+            # processes starting together agree on one key and nobody reads a half-written file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_hex(32).encode())
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp_path)
+            continue
+        time.sleep(0.1)  # created by another process but still empty
+    raise RuntimeError(f"Could not read the service key from {path}")
+
+
+# ------------------- Server -------------------
+class RecognitionService:
+    def __init__(self, face_recog, host=SERVICE_HOST, port=SERVICE_PORT, authkey=None):
+        self.face_recog = face_recog
+        self.address = (host, port)
+        self.authkey = authkey or service_authkey()
+        self.clients = 0
+        self._clients_lock = threading.Lock()
+        self._stop_when_idle = False
+        self._stopping = threading.Event()
+
+    def _dispatch(self, method, args, kwargs):
+        if method == "ping":
+            return "pong"
+        if method == "match_threshold":
+            return self.face_recog.match_threshold
+        if method == "stop_when_idle":
+            # The caller's own connection counts until it disconnects
+            self._stop_when_idle = True
+            return self.clients - 1
+        if method not in SERVICE_METHODS:
+            raise ValueError(f"Unknown method: {method}")
+        return getattr(self.face_recog, method)(*args, **kwargs)
+
+    def _handle(self, conn):
+        with self._clients_lock:
+            self.clients += 1
+        try:
+            with conn:
+                while True:
+                    try:
+                        method, args, kwargs = conn.recv()
+                    except (EOFError, OSError):
+                        return
+                    try:
+                        conn.send(("ok", self._dispatch(method, args, kwargs)))
+                    except Exception as e:
+                        conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            with self._clients_lock:
+                self.clients -= 1
+                idle = self.clients == 0
+            if idle and self._stop_when_idle and not self._stopping.is_set():
+                print("Last client disconnected, stopping the recognition service.")
+                self._stopping.set()
+                try:
+                    Client(self.address, authkey=self.authkey).close()  # wake up accept() in serve_forever
+                except OSError:
+                    pass
+
+    def listen(self):
+        """Bind the service socket. Raises OSError if another service already owns the port."""
+        return Listener(self.address, authkey=self.authkey)
+
+    def serve_forever(self, listener=None):
+        listener = listener or self.listen()
+        with listener:
+            print(f"Recognition service listening on {self.address[0]}:{self.address[1]}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    if self._stopping.is_set():
+                        return
+                    print("Rejected connection:", e)
+                    continue
+                if self._stopping.is_set():
+                    conn.close()
+                    return
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+# ------------------- Client -------------------
+def _connect(address, authkey):
+    """Open a connection to the service; a service started with another key raises AuthenticationError."""
+    try:
+        return Client(address, authkey=authkey)
+    except AuthenticationError as e:
+        raise AuthenticationError(
+            f"Recognition service key mismatch on port {address[1]}: the running service uses another key "
+            f"(stop it, or check {SERVICE_KEY_FILE} and FACE_SERVICE_AUTHKEY)") from e
+
+
+def _local_recognizer():
+    print("Recognition service unavailable, loading the model in this process.")
+    from face_recognition_module import FaceRecognitionModule
+    return FaceRecognitionModule()
+
+
+class RecognitionClient:
+    """
+    Drop-in replacement for FaceRecognitionModule that forwards calls to the service.
+    A lost connection is retried with exponential backoff; if the service stays
+    unreachable (and fallback is set) the model is loaded in this process instead.
+    Raises AuthenticationError if the service on the port was started with another key.
+    """
+
+    def __init__(self, host=SERVICE_HOST, port=SERVICE_PORT, authkey=None, retries=5, backoff=0.5, fallback=True):
+        self._address = (host, port)
+        self._authkey = authkey or service_authkey()
+        self.retries = retries
+        self.backoff = backoff
+        self.fallback = fallback
+        self._conn = _connect(self._address, self._authkey)
+        self._local = None  # in-process FaceRecognitionModule once the service is gone
+        self._lock = threading.Lock()
+
+    def _reconnect(self):
+        delay = self.backoff
+        for attempt in range(self.retries):
+            try:
+                self._conn = _connect(self._address, self._authkey)
+                print("Reconnected to the recognition service.")
+                return True
+            except AuthenticationError as e:
+                print(e)
+                return False  # a service restarted with another key will not accept us on retry
+            except OSError:
+                time.sleep(delay)
+                delay = min(2 * delay, 5.0)
+        return False
+
+    def _call(self, method, *args, **kwargs):
+        with self._lock:
+            for attempt in range(2):
+                if self._local is not None:
+                    break
+                try:
+                    with metrics.timer("service_call", method=method):
+                        self._conn.send((method, args, kwargs))
+                        status, result = self._conn.recv()
+                    if status != "ok":
+                        raise RuntimeError(f"Recognition service error: {result}")
+                    return result
+                except (EOFError, OSError) as e:
+                    metrics.inc("service_disconnects_total")
+                    print(f"Lost the recognition service connection ({type(e).__name__}: {e})")
+                    self._conn.close()
+                    if not self._reconnect():
+                        if not self.fallback:
+                            raise ConnectionError("Recognition service is not reachable")
+                        self._local = _local_recognizer()
+            if self._local is None:
+                raise ConnectionError("Recognition service keeps dropping the connection")
+        if method == "match_threshold":
+            return self._local.match_threshold
+        return getattr(self._local, method)(*args, **kwargs)
+
+    def stop_when_idle(self):
+        """Ask the service to exit once every other client has disconnected. Returns their number."""
+        return self._call("stop_when_idle")
+
+    def close(self):
+        self._conn.close()
+
+    @property
+    def match_threshold(self):
+        return self._call("match_threshold")
+
+    def recognize_frame(self, frame):
+        return self._call("recognize_frame", frame)
+
+    def recognize_frames(self, frames):
+        return self._call("recognize_frames", frames)
+
+    def find_matches(self, frame):
+        return self._call("find_matches", frame)
+
+    def recognize_faces_in_frame(self, frame, check_quality=False, scale=1.0, rois=None):
+        return self._call("recognize_faces_in_frame", frame, check_quality, scale, rois)
+
+    def recognize_faces_in_frames(self, frames, use_cache=False, check_quality=False):
+        return self._call("recognize_faces_in_frames", frames, use_cache, check_quality)
+
+    def detect_faces(self, frame, scale=1.0, rois=None, aligned=False):
+        return self._call("detect_faces", frame, scale, rois, aligned)
+
+    def recognize_crops(self, frame, boxes, faces=None, check_quality=False):
+        return self._call("recognize_crops", frame, boxes, faces, check_quality)
+
+    def enroll_face(self, person_name, frame, file_name=None):
+        return self._call("enroll_face", person_name, frame, file_name)
+
+    def person_exists(self, person_name):
+        return self._call("person_exists", person_name)
+
+    def remove_person(self, person_name):
+        return self._call("remove_person", person_name)
+
+    def reenroll_person(self, person_name, frames):
+        return self._call("reenroll_person", person_name, frames)
+
+
+def start_service():
+    """Launch the service in the background (returns immediately)."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recognition_service.py")
+    return subprocess.Popen([sys.executable, script])
+
+
+def connect_recognizer(wait=60.0, start=True, fallback=True):
+    """
+    Connect to the recognition service, starting it if needed and waiting up to
+    `wait` seconds for it to load the model. If it still cannot be reached, or the
+    service on the port uses another key, and `fallback` is set, load an in-process
+    FaceRecognitionModule instead (without fallback the AuthenticationError is raised).
+    """
+    deadline = time.monotonic() + wait
+    started = False
+    while True:
+        try:
+            return RecognitionClient()
+        except AuthenticationError as e:
+            if not fallback:
+                raise
+            print(e)
+            return _local_recognizer()
+        except (ConnectionRefusedError, OSError):
+            pass
+
+        if start and not started:
+            print("Starting recognition service...")
+            start_service()
+            started = True
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(0.5)
+
+    if not fallback:
+        raise ConnectionError("Recognition service is not reachable")
+    return _local_recognizer()
+
+
+def stop_service_when_idle(process=None, wait=120.0):
+    """
+    Let the service exit after its last client disconnects (screens started from
+    the menu keep using it after the menu closes). `process` is the Popen from
+    start_service(); it is terminated if the service never answers within `wait`.
+    """
+    def request():
+        try:
+            client = RecognitionClient(retries=0, fallback=False)
+            client.stop_when_idle()
+            client.close()
+        except (OSError, ConnectionError, RuntimeError, AuthenticationError) as e:
+            print("Could not reach the recognition service to stop it:", e)
+
+    thread = threading.Thread(target=request, daemon=True)
+    thread.start()
+    thread.join(wait)
+    if thread.is_alive() and process is not None:
+        process.terminate()  # still loading the model: nobody can be using it yet
+
+
+# ------------------- Main -------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared face recognition service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--database", default="faces_database", help="Face database folder")
+    parser.add_argument("--backend", help="Detector+embedder spec, e.g. 'yunet:models/yunet.onnx+onnx:models/arcface_int8.onnx'"
+                                          " (default: DeepFace VGG-Face with the OpenCV detector)")
+    args = parser.parse_args()
+
+    # Bind first so a second copy exits before loading the model; clients that
+    # connect meanwhile simply wait until the service starts accepting.
+    try:
+        listener = Listener((args.host, args.port), authkey=service_authkey())
+    except OSError as e:
+        print(f"Could not start service on {args.host}:{args.port} (already running?):", e)
+        sys.exit(1)
+
+    import numpy as np
+    from backends_module import create_backends
+    from face_recognition_module import FaceRecognitionModule
+
+    detector, embedder = create_backends(args.backend) if args.backend else (None, None)
+    face_recog = FaceRecognitionModule(database_path=args.database, detector=detector, embedder=embedder)
+    # Warm up: build the model and run one detection so the first request is fast
+    face_recog.embed_faces([np.zeros((64, 64, 3), dtype=np.uint8)])
+    face_recog.detect_faces(np.zeros((240, 320, 3), dtype=np.uint8))
+
+    metrics.serve_from_env()  # model-side metrics (detect/embed/match) live in this process
+    RecognitionService(face_recog, args.host, args.port).serve_forever(listener)
@@ -0,0 +1,118 @@
+# scaling_module.py
+#
+# Adaptive detection resolution and region-of-interest cropping.
+#
+# Detectors only need a face to be a few dozen pixels tall, so running them on
+# a full 1280x720 frame when the nearest face is 300 px tall wastes most of the
+# work, while a fixed 0.5 resize loses faces that are far away. AdaptiveScaler
+# picks the detection scale per frame from the sizes of recently detected faces
+# (smallest face ends up about min_face px tall) and an optional time budget,
+# and restricts detection to configured ROIs such as the guide rectangle.
+#
+# The scaler only plans; FaceRecognitionModule.detect_and_align(frame, scale,
+# rois) detects on the downscaled regions and re-crops every face from the
+# full-resolution frame for embedding, so accuracy matches full resolution:
+#
+#   scaler = AdaptiveScaler(roi=lambda w, h: [guide_rect(w, h)])
+#   scale, rois = scaler.plan(w, h)
+#   faces = face_recog.recognize_faces_in_frame(frame, scale=scale, rois=rois)
+#   scaler.update([box for box, name, distance in faces], elapsed)
+
+import time
+
+
+def expand_rect(rect, margin, frame_w, frame_h):
+    """Grow an (x, y, w, h) rectangle by `margin` of its size on every side, clipped to the frame."""
+    x, y, w, h = rect
+    dx, dy = int(w * margin), int(h * margin)
+    x1, y1 = max(0, x - dx), max(0, y - dy)
+    x2, y2 = min(frame_w, x + w + dx), min(frame_h, y + h + dy)
+    return (x1, y1, max(0, x2 - x1), max(0, y2 - y1))
+
+
+class AdaptiveScaler:
+    def __init__(self, min_face=48, roi=None, roi_margin=0.25, min_width=320, max_scale=1.0,
+                 budget_ms=None, probe_interval=2.0, smoothing=0.3):
+        """
+        min_face: Height in detection pixels the smallest recent face is scaled to
+                  (the detector's reliable minimum plus some headroom)
+        roi: List of (x, y, w, h) rectangles in frame pixels, or a function (frame_w, frame_h) -> list.
+             None detects on the whole frame. Rectangles should not overlap.
+        roi_margin: ROIs are grown by this fraction so faces on their border are still found
+        min_width: Never detect on regions narrower than this many pixels
+        max_scale: Upper bound on the scale (1.0 = full resolution)
+        budget_ms: Detection time budget per frame; the scale is lowered to stay within it
+        probe_interval: While faces are visible, every this many seconds detect at the largest
+                        scale the budget allows, to find new faces farther away
+        smoothing: Weight of the newest face size in the running estimate
+        """
+        self.min_face = min_face
+        self.roi = roi
+        self.roi_margin = roi_margin
+        self.min_width = min_width
+        self.max_scale = max_scale
+        self.budget_ms = budget_ms
+        self.probe_interval = probe_interval
+        self.smoothing = smoothing
+
+        self.scale = max_scale
+        self.face_size = None       # running estimate of the smallest face height (frame pixels)
+        self.cost_per_pixel = None  # running estimate of detection seconds per detected pixel
+        self.pixels = 0             # pixels the last planned detection covers
+        self.full_pixels = 0        # pixels of the full frame
+        self._last_probe = 0.0
+        self._probing = False
+
+    def _rois(self, frame_w, frame_h):
+        rois = self.roi(frame_w, frame_h) if callable(self.roi) else self.roi
+        if not rois:
+            return None
+        rois = [expand_rect(r, self.roi_margin, frame_w, frame_h) for r in rois]
+        return [r for r in rois if r[2] > 0 and r[3] > 0] or None
+
+    def _budget_scale(self, region_pixels):
+        if not self.budget_ms or not self.cost_per_pixel:
+            return self.max_scale
+        affordable = (self.budget_ms / 1000.0) / self.cost_per_pixel
+        return (affordable / region_pixels) ** 0.5
+
+    def plan(self, frame_w, frame_h, now=None):
+        """Return (scale, rois) for the next detection: rois in frame pixels or None for the whole frame."""
+        now = time.monotonic() if now is None else now
+        rois = self._rois(frame_w, frame_h)
+        regions = rois or [(0, 0, frame_w, frame_h)]
+        region_pixels = sum(w * h for x, y, w, h in regions)
+        floor = min(1.0, self.min_width / float(max(w for x, y, w, h in regions)))
+        ceiling = max(floor, min(self.max_scale, self._budget_scale(region_pixels)))
+
+        self._probing = self.face_size is None or now - self._last_probe >= self.probe_interval
+        if self._probing:
+            scale = ceiling  # look for small/far faces at the best resolution we can afford
+            self._last_probe = now
+        else:
+            scale = self.min_face / self.face_size
+
+        self.scale = round(min(ceiling, max(floor, scale)), 3)
+        self.pixels = int(region_pixels * self.scale * self.scale)
+        self.full_pixels = frame_w * frame_h
+        return self.scale, rois
+
+    def update(self, boxes, detect_seconds=None):
+        """Feed back the boxes (frame pixels) found with the last plan and how long detection took."""
+        if detect_seconds is not None and self.pixels > 0:
+            cost = detect_seconds / self.pixels
+            self.cost_per_pixel = cost if self.cost_per_pixel is None else \
+                (1 - self.smoothing) * self.cost_per_pixel + self.smoothing * cost
+
+        if len(boxes) > 0:
+            smallest = float(min(h for x, y, w, h in boxes))
+            if self.face_size is None or self._probing:
+                # a probe sees every face, including far ones the estimate may have missed
+                self.face_size = smallest if self.face_size is None else min(self.face_size, smallest)
+            self.face_size = (1 - self.smoothing) * self.face_size + self.smoothing * smallest
+        elif self._probing:
+            self.face_size = None  # nobody in view even at the probe scale: keep probing
+
+    def pixel_fraction(self):
+        """Share of the full frame's pixels that the last planned detection processes."""
+        return self.pixels / float(self.full_pixels) if self.full_pixels else 1.0
@@ -0,0 +1,178 @@
+# template_module.py
+#
+# Identity templates: every enrolled person is matched as one identity, not as
+# one entry per image file.
+#
+# The face database keeps several images per person (Harsh.jpg, Harsh_1.jpg,
+# Harsh_2.jpg, ...). IdentityTemplates aggregates their embeddings into
+#   - one template per person: the normalised mean (centroid) of the samples, or
+#   - up to max_templates medoids per person: representative real samples
+#     chosen greedily (most central first, then the most different), so a person
+#     enrolled from many sessions keeps a few modes instead of hundreds of rows.
+# Matching then costs one comparison per template instead of per image, and the
+# result is the person's name.
+
+import re
+from collections import Counter
+import numpy as np
+
+import index_module
+from index_module import create_index
+
+FILE_SUFFIX = re.compile(r"_\d+$")
+
+# Templates from which the ANN index beats one matrix product for a frame's few
+# queries (benchmark_index.py --single, 512-d): the pure-Python HNSW overtakes
+# flat between 10k and 20k vectors; hnswlib queries cost a small fraction of that.
+INDEX_MIN_SIZE = 5000 if index_module.hnswlib is not None else 20000
+
+
+def person_names(stems, known=()):
+    """
+    Person name of image file stems that have no stored label. Returns {stem: name}.
+    Enrollment names extra images Name_1, Name_2, ..., so the "_<digits>" suffix is
+    dropped only when the rest is a known person, an image stem of its own, or shared
+    by several stems: Harsh_2 -> Harsh next to Harsh.jpg, a lone Agent_7 stays Agent_7.
+    """
+    stems = [str(stem) for stem in stems]
+    known = set(known) | set(stems)
+    shared = Counter(FILE_SUFFIX.sub("", stem) for stem in set(stems))
+    names = {}
+    for stem in stems:
+        base = FILE_SUFFIX.sub("", stem)
+        names[stem] = base if base != stem and (base in known or shared[base] > 1) else stem
+    return names
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def select_medoids(vectors, k):
+    """
+    Pick up to k representative rows of L2-normalised vectors.
+    Returns (medoid row indices, group of every row).
+    """
+    centroid = _normalize(vectors.sum(axis=0))
+    chosen = [int(np.argmax(vectors @ centroid))]
+    closest = vectors @ vectors[chosen[0]]
+    while len(chosen) < k:
+        farthest = int(np.argmin(closest))
+        if closest[farthest] >= 1.0 - 1e-6:
+            break  # everything left is a duplicate of a chosen sample
+        chosen.append(farthest)
+        closest = np.maximum(closest, vectors @ vectors[farthest])
+
+    # One refinement pass: replace each seed by the true medoid of the rows closest to it
+    groups = np.argmax(vectors @ vectors[chosen].T, axis=1)
+    medoids = []
+    for g in range(len(chosen)):
+        members = np.flatnonzero(groups == g)
+        medoids.append(int(members[np.argmax((vectors[members] @ vectors[members].T).sum(axis=1))]))
+    return np.array(medoids), groups
+
+
+class IdentityTemplates:
+    def __init__(self, max_templates=1, index_type="flat", index_params=None, index_min_size=INDEX_MIN_SIZE):
+        """
+        max_templates: 1 = centroid per person; >1 = up to that many medoids per person
+        index_type / index_params: ANN index used once there are index_min_size templates
+                                   (below that a single matrix product is faster, so
+                                   smaller galleries match templates exactly)
+        """
+        self.max_templates = max_templates
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.index_min_size = index_min_size
+        self._reset(0)
+
+    def _reset(self, dim):
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.names = np.array([], dtype=str)
+        self.counts = np.zeros(0, dtype=np.int64)  # samples behind each template
+        self._sums = np.zeros((0, dim), dtype=np.float32)
+        self._rows = {}  # name -> template row (centroid mode)
+        self._index = None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    # ---------------- Building ----------------
+    def build(self, embeddings, labels):
+        """(Re)build from L2-normalised embeddings and their person names."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self._reset(embeddings.shape[1] if embeddings.ndim == 2 else 0)
+        if len(embeddings) == 0:
+            return self
+
+        names, inverse = np.unique(np.asarray(labels).astype(str), return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+        counts = np.diff(np.r_[starts, len(order)])
+
+        if self.max_templates <= 1:
+            self._sums = np.add.reduceat(embeddings[order], starts, axis=0).astype(np.float32)
+            self.vectors = _normalize(self._sums)
+            self.names = names
+            self.counts = counts
+            self._rows = {str(name): i for i, name in enumerate(names)}
+            return self
+
+        vectors, template_names, template_counts = [], [], []
+        for name, start, count in zip(names, starts, counts):
+            samples = embeddings[order[start:start + count]]
+            medoids, groups = select_medoids(samples, self.max_templates)
+            for g, medoid in enumerate(medoids):
+                vectors.append(samples[medoid])
+                template_names.append(name)
+                template_counts.append(int(np.sum(groups == g)))
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.names = np.array(template_names)
+        self.counts = np.array(template_counts, dtype=np.int64)
+        return self
+
+    def add(self, name, embeddings):
+        """
+        Fold new L2-normalised samples of a person into its centroid (O(dim)).
+        Returns False if the templates must be rebuilt instead (medoid mode).
+        """
+        if self.max_templates > 1:
+            return False
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        row = self._rows.get(name)
+        if row is None:
+            if self.vectors.shape[1] not in (0, embeddings.shape[1]) and len(self.vectors):
+                return False
+            row = len(self.vectors)
+            self._rows[name] = row
+            dim = embeddings.shape[1]
+            self.vectors = np.vstack([self.vectors.reshape(-1, dim), np.zeros((1, dim), np.float32)])
+            self._sums = np.vstack([self._sums.reshape(-1, dim), np.zeros((1, dim), np.float32)])
+            self.names = np.append(self.names, name)
+            self.counts = np.append(self.counts, 0)
+
+        self._sums[row] += embeddings.sum(axis=0)
+        self.counts[row] += len(embeddings)
+        self.vectors[row] = _normalize(self._sums[row])
+        if self._index is not None:
+            # Update the one template in place: rebuilding a large ANN index per enrollment is slow
+            self._index.remove([row])
+            self._index.add(self.vectors, [row])
+        return True
+
+    # ---------------- Matching ----------------
+    def search(self, queries):
+        """Nearest template of every L2-normalised query. Returns (template rows, similarities)."""
+        if len(self.vectors) == 0:
+            return np.full(len(queries), -1), np.full(len(queries), -np.inf, dtype=np.float32)
+        if len(self.vectors) >= self.index_min_size and self.index_type != "flat":
+            if self._index is None:
+                self._index = create_index(self.index_type, **self.index_params)
+                self._index.add(self.vectors, np.arange(len(self.vectors)))
+            ids, similarities = self._index.search(self.vectors, queries, k=1)
+            return ids[:, 0], similarities[:, 0]
+        similarities = queries @ self.vectors.T
+        ids = np.argmax(similarities, axis=1)
+        return ids, similarities[np.arange(len(queries)), ids]
@@ -0,0 +1,36 @@
+# tests/test_batch_recognition.py
+#
+# Run with: python -m pytest tests
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_recognition import CheckpointJournal
+from database_module import FaceDatabaseLogger, RecognitionLog
+
+
+def test_journal_replays_the_last_task_once(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    entries = [("Harsh", datetime(2026, 1, 1, 8, 0, 0))]
+    CheckpointJournal(path).record(["image:a.jpg"], {("images", "Harsh", 1)}, entries)
+    with open(path, "a") as f:
+        f.write('{"keys": ["image:b.jpg"')  # torn line of a task whose rows were never logged
+
+    logger = FaceDatabaseLogger(str(tmp_path / "log.db"), str(tmp_path / "log.csv"))
+    try:
+        for _ in range(2):  # crashed before and after the rows were logged
+            journal = CheckpointJournal(path)
+            assert journal.done == {"image:a.jpg"}
+            assert journal.buckets == {("images", "Harsh", 1)}
+            logger.log_batch(journal.replay_entries, skip_logged=True)
+    finally:
+        logger.close()
+    assert RecognitionLog(str(tmp_path / "log.db")).count() == 1
+
+    journal = CheckpointJournal(path)
+    journal.compact()
+    assert CheckpointJournal(path).done == {"image:a.jpg"}
+    assert CheckpointJournal(path).replay_entries == []
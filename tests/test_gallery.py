@@ -0,0 +1,32 @@
+# tests/test_gallery.py
+#
+# Run with: python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_recognition_module import FaceRecognitionModule
+
+
+def _stub_recognizer(tmp_path):
+    return FaceRecognitionModule(database_path=str(tmp_path), detector="stub", embedder="stub", cache_dir=None)
+
+
+def _active_labels(face_recog):
+    return sorted(face_recog.gallery.labels[face_recog.gallery.active].tolist())
+
+
+def test_unsaved_import_merges_with_concurrent_enrollment(tmp_path):
+    rng = np.random.default_rng(0)
+    importer, live = _stub_recognizer(tmp_path), _stub_recognizer(tmp_path)
+
+    importer.add_embeddings(["Imported"], rng.normal(size=(1, 128)), ["Imported.jpg"], save=False)
+    assert live.enroll_face("Enrolled", rng.integers(0, 255, (480, 640, 3), dtype=np.uint8))
+    importer.save_gallery()
+
+    live.refresh_gallery(force=True)
+    assert _active_labels(importer) == _active_labels(live) == ["Enrolled", "Imported"]
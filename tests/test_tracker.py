@@ -0,0 +1,49 @@
+# tests/test_tracker.py
+#
+# Run with: python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_recognition_module import FaceRecognitionModule
+from scaling_module import AdaptiveScaler
+from tracker_module import TrackingRecognizer
+
+
+def _stub_recognizer(tmp_path):
+    return FaceRecognitionModule(database_path=str(tmp_path), detector="stub", embedder="stub", cache_dir=None)
+
+
+def _frame(seed=0):
+    return np.random.default_rng(seed).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+
+
+def test_tracking_path_matches_frame_recognition(tmp_path):
+    face_recog = _stub_recognizer(tmp_path)
+    frame = _frame()
+    assert face_recog.enroll_face("Harsh", frame)
+
+    [(box, name, distance)] = face_recog.recognize_faces_in_frame(frame)
+    tracking = TrackingRecognizer(face_recog)
+    [(track_id, track_box, track_name)] = tracking.process(frame)
+    track = tracking.tracker.tracks[track_id]
+
+    assert (track_box, track_name) == (box, name) == (box, "Harsh")
+    assert abs(track.distance - distance) < 1e-6
+
+
+def test_tracking_path_matches_with_scaler(tmp_path):
+    face_recog = _stub_recognizer(tmp_path)
+    frame = _frame(1)
+    assert face_recog.enroll_face("Harsh", frame)
+
+    [(box, name, distance)] = face_recog.recognize_faces_in_frame(frame, scale=0.5)
+    tracking = TrackingRecognizer(face_recog, scaler=AdaptiveScaler(max_scale=0.5))
+    [(track_id, track_box, track_name)] = tracking.process(frame)
+
+    assert track_name == name == "Harsh"
+    assert abs(tracking.tracker.tracks[track_id].distance - distance) < 1e-6
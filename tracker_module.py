@@ -0,0 +1,216 @@
+# tracker_module.py
+
+import itertools
+import time
+import cv2
+import numpy as np
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    ih = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def centroid_distance(a, b):
+    """Distance between box centres, relative to the size of box a."""
+    dx = (a[0] + a[2] / 2) - (b[0] + b[2] / 2)
+    dy = (a[1] + a[3] / 2) - (b[1] + b[3] / 2)
+    return np.hypot(dx, dy) / max(1.0, np.hypot(a[2], a[3]))
+
+
+def appearance_signature(frame, box, size=16):
+    """Cheap appearance descriptor: a zero-mean, unit-norm grayscale thumbnail of the box."""
+    x, y, w, h = box
+    crop = frame[max(0, y):y + h, max(0, x):x + w]
+    if crop.size == 0:
+        return None
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    thumb = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    thumb -= thumb.mean()
+    norm = np.linalg.norm(thumb)
+    return thumb / norm if norm > 0 else thumb
+
+
+class Track:
+    def __init__(self, track_id, box, signature):
+        self.track_id = track_id
+        self.box = box
+        self.signature = signature  # appearance at the last recognition
+        self.face = None            # aligned face from the latest detection
+        self.name = None            # None until the first recognition
+        self.distance = float("inf")
+        self.confidence = 0.0
+        self.last_recognized = 0.0
+        self.hits = 1
+        self.misses = 0
+
+
+class FaceTracker:
+    """
+    Multi-object face tracker that gives each face a persistent track id.
+
+    Detections are associated with tracks greedily by IoU, falling back to
+    centroid distance for fast motion. A track's identity is carried between
+    recognitions; needs_recognition() says when it should be re-run:
+    on a new track, when its confidence has decayed (every frame, and sharply
+    when its appearance stops matching), or after refresh_interval seconds.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=0.5, max_missed=10,
+                 refresh_interval=5.0, unknown_retry_interval=1.0, min_confidence=0.3,
+                 confidence_decay=0.995, appearance_threshold=0.6):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_missed = max_missed
+        self.refresh_interval = refresh_interval
+        self.unknown_retry_interval = unknown_retry_interval
+        self.min_confidence = min_confidence
+        self.confidence_decay = confidence_decay
+        self.appearance_threshold = appearance_threshold
+        self.tracks = {}
+        self._ids = itertools.count(1)
+
+    def _associate(self, boxes):
+        """Greedy association. Returns (matches, unmatched box indices)."""
+        pairs = []
+        for track_id, track in self.tracks.items():
+            for i, box in enumerate(boxes):
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    pairs.append((1.0 + iou, track_id, i))
+                else:
+                    dist = centroid_distance(track.box, box)
+                    if dist <= self.max_centroid_distance:
+                        pairs.append((1.0 - dist, track_id, i))
+
+        matches, used_tracks, used_boxes = [], set(), set()
+        for score, track_id, i in sorted(pairs, reverse=True):
+            if track_id in used_tracks or i in used_boxes:
+                continue
+            matches.append((track_id, i))
+            used_tracks.add(track_id)
+            used_boxes.add(i)
+        unmatched = [i for i in range(len(boxes)) if i not in used_boxes]
+        return matches, unmatched
+
+    def update(self, frame, boxes, faces=None):
+        """
+        Feed one frame's detections (and their aligned faces, if any).
+        Returns the tracks visible in this frame.
+        """
+        matches, unmatched = self._associate(boxes)
+        visible = []
+
+        matched_ids = set()
+        for track_id, i in matches:
+            track = self.tracks[track_id]
+            track.box = boxes[i]
+            track.face = faces[i] if faces is not None else None
+            track.hits += 1
+            track.misses = 0
+            track.confidence *= self.confidence_decay
+            if track.signature is not None:
+                signature = appearance_signature(frame, track.box)
+                if signature is not None and float(signature @ track.signature) < self.appearance_threshold:
+                    track.confidence = 0.0  # looks like someone else now
+            matched_ids.add(track_id)
+            visible.append(track)
+
+        for track_id in list(self.tracks):
+            if track_id not in matched_ids:
+                track = self.tracks[track_id]
+                track.misses += 1
+                if track.misses > self.max_missed:
+                    del self.tracks[track_id]
+
+        for i in unmatched:
+            track = Track(next(self._ids), boxes[i], None)
+            track.face = faces[i] if faces is not None else None
+            self.tracks[track.track_id] = track
+            visible.append(track)
+
+        return visible
+
+    def needs_recognition(self, track, now=None):
+        now = time.time() if now is None else now
+        if track.name is None:
+            return True
+        interval = self.refresh_interval if track.name != "Unknown" else self.unknown_retry_interval
+        if now - track.last_recognized >= interval:
+            return True
+        return track.confidence < self.min_confidence
+
+    def set_identity(self, track, frame, name, distance, threshold, now=None):
+        """Store a recognition result on a track."""
+        track.name = name
+        track.distance = distance
+        track.last_recognized = time.time() if now is None else now
+        track.signature = appearance_signature(frame, track.box)
+        if name == "Unknown":
+            track.confidence = 0.0
+        else:
+            # 1.0 for a perfect match, 0.5 right at the threshold
+            track.confidence = float(np.clip(1.0 - 0.5 * distance / threshold, 0.0, 1.0))
+
+
+class TrackingRecognizer:
+    """
+    Detect every frame, track faces, and only run the recognition model on
+    tracks that need it. Returns [(track_id, box, name)] per frame.
+    With a quality scorer (quality_module.QualityScorer), a due track whose face
+    is blurry, small, badly lit or turned away waits for a better frame.
+    With a scaler (scaling_module.AdaptiveScaler), detection runs on a downscaled
+    frame / inside ROIs; recognition always embeds faces aligned at full resolution,
+    the same way recognize_faces_in_frame does, so distances match the gallery.
+    """
+
+    def __init__(self, face_recog, tracker=None, quality=None, scaler=None):
+        self.face_recog = face_recog
+        self.tracker = tracker or FaceTracker()
+        self.quality = quality
+        self.scaler = scaler
+        self.frames = 0
+        self.model_calls = 0
+        self.low_quality_skips = 0
+
+    def process(self, frame):
+        self.frames += 1
+        now = time.time()
+        if self.scaler is not None:
+            scale, rois = self.scaler.plan(frame.shape[1], frame.shape[0])
+            started = time.perf_counter()
+            detections = self.face_recog.detect_faces(frame, scale, rois, aligned=True)
+            self.scaler.update([box for box, face in detections], time.perf_counter() - started)
+        else:
+            detections = self.face_recog.detect_faces(frame, aligned=True)
+        boxes = [box for box, face in detections]
+        tracks = self.tracker.update(frame, boxes, [face for box, face in detections])
+
+        due = [t for t in tracks if self.tracker.needs_recognition(t, now)]
+        if due and self.quality is not None:
+            good = [t for t in due if self.quality.is_good(frame, t.box)]
+            self.low_quality_skips += len(due) - len(good)
+            due = good
+        if due:
+            names, distances = self.face_recog.recognize_crops(frame, [t.box for t in due], [t.face for t in due])
+            self.model_calls += len(due)
+            threshold = self.face_recog.match_threshold
+            for track, name, distance in zip(due, names, distances):
+                self.tracker.set_identity(track, frame, name, distance, threshold, now)
+
+        return [(t.track_id, t.box, t.name or "Unknown") for t in tracks]
+
+    def stats(self):
+        stats = {"frames": self.frames, "model_calls": self.model_calls,
+                 "low_quality_skips": self.low_quality_skips,
+                 "active_tracks": len(self.tracker.tracks)}
+        if self.scaler is not None:
+            stats["detect_scale"] = self.scaler.scale
+            stats["detect_pixel_fraction"] = self.scaler.pixel_fraction()
+        return stats